@@ -0,0 +1,283 @@
+"""
+Measures rendering performance of exerciser: per-frame time, memory allocated per frame and peak memory for a set of reference scenarios.
+
+Scenarios:
+* `lineplot` - `LinePlot.draw` for a cart-pole with 4 lines, with `history` points per line
+* `springs` - a chain of `history / 100` springs drawn using `draw_springs`
+* `figure` - `draw_figure` for a Matplotlib line with `history` points (skipped if Matplotlib is not installed)
+* `figure_retained` - the same figure drawn using `FigureRenderer`
+* `mainloop` - full iterations of the main loop (tick, overlay with `show_value`, flip) for the cart-pole simulation
+
+Each scenario runs for every combination of history length and window size, using SDL's dummy video driver (so no window is shown).
+Frame times are measured in a separate pass from allocations, because tracing allocations slows down Python code considerably.
+Allocations and peak memory only include memory traced by `tracemalloc` (Python objects and NumPy arrays, but not Pygame surfaces).
+
+Usage:
+    python benchmarks/render.py [--scenarios NAME ...] [--history N ...] [--sizes WxH ...] [--frames N] [--output FILE]
+                                [--baseline FILE] [--max-regression RATIO]
+
+Results are printed as JSON (and written to `--output` if given). If `--baseline` is given, median frame times are compared to the matching results
+in a previous output file and the script exits with status 1 if any of them is more than `--max-regression` times slower.
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import exerciser
+from exerciser import _execute_gui
+from exerciser.pygame import LinePlot, draw_springs
+
+_DELTA = 1 / 60
+_WARMUP_FRAMES = 10
+
+# Sets up a scenario for the given history length and window size and returns a function that draws one frame and a function that cleans up
+_Scenario = Callable[[int, tuple[int, int]], tuple[Callable[[], None], Callable[[], None]]]
+
+class _CartPole:
+    """Cart-pole with a constant balancing force, integrated with explicit Euler. Only used to produce plausible data."""
+
+    def __init__(self):
+        self.x, self.v, self.theta, self.omega = 0.0, 0.0, 0.2, 0.0
+        self.t = 0.0
+
+    def step(self, delta: float) -> list[float]:
+        force = 20 * self.theta + 5 * self.omega + self.x + self.v
+        alpha = 9.81 * math.sin(self.theta) - force * math.cos(self.theta)
+        self.v += force * delta
+        self.x += self.v * delta
+        self.omega += alpha * delta
+        self.theta += self.omega * delta
+        self.t += delta
+        return [self.x, self.v, self.theta, self.omega]
+
+def _cart_pole_plot(history: int) -> LinePlot:
+    plot = LinePlot(x_label="Time (s)", x_range=history * _DELTA)
+    for label, color in (("x", 'red'), ("v", 'green'), ("theta", 'blue'), ("omega", 'purple')):
+        plot.add_line(label=label, color=color, range=1.0)
+    return plot
+
+def _lineplot(history: int, size: tuple[int, int]):
+    surface = pygame.Surface(size)
+    cart_pole = _CartPole()
+    plot = _cart_pole_plot(history)
+    for _ in range(history):
+        plot.add_data(cart_pole.t, cart_pole.step(_DELTA))
+    def frame():
+        plot.add_data(cart_pole.t, cart_pole.step(_DELTA))
+        surface.fill('white')
+        plot.draw(surface, 0, 0, size[0], size[1])
+    return frame, lambda: None
+
+def _springs(history: int, size: tuple[int, int]):
+    surface = pygame.Surface(size)
+    count = max(1, history // 100)
+    rest = np.linspace(0, size[0], count + 1)
+    phases = np.linspace(0, 2 * np.pi, count + 1)
+    step = 0
+    def frame():
+        nonlocal step
+        step += 1
+        x = rest + 0.3 * (size[0] / count) * np.sin(phases + step * _DELTA * 4)
+        points = np.column_stack((x, np.full_like(x, size[1] / 2)))
+        surface.fill('white')
+        draw_springs(surface, 'black', points[:-1], points[1:], 6, 10)
+    return frame, lambda: None
+
+def _figure(retained: bool) -> _Scenario:
+    def scenario(history: int, size: tuple[int, int]):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from exerciser.pygame import FigureRenderer, draw_figure
+
+        surface = pygame.Surface(size)
+        figure = Figure()
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        x = np.arange(history) * _DELTA
+        (line,) = axes.plot(x, np.sin(x))
+        axes.set_ylim(-1.5, 1.5)
+        renderer = FigureRenderer(canvas, [line]) if retained else None
+        step = 0
+        def frame():
+            nonlocal step
+            step += 1
+            line.set_ydata(np.sin(x + step * _DELTA))
+            surface.fill('white')
+            if renderer is not None:
+                renderer.draw(surface, 0, 0, size[0], size[1])
+            else:
+                draw_figure(surface, canvas, 0, 0, size[0], size[1])
+        return frame, (renderer.close if renderer is not None else lambda: None)
+    return scenario
+
+class _CartPoleSimulation(exerciser.Simulation):
+    name = "Render benchmark"
+
+    def __init__(self, history: int, size: tuple[int, int]):
+        self.initial_window_size = size
+        self.cart_pole = _CartPole()
+        self.plot = _cart_pole_plot(history)
+        for _ in range(history):
+            self.plot.add_data(self.cart_pole.t, self.cart_pole.step(_DELTA))
+
+    def tick(self, delta: float):
+        state = self.cart_pole.step(delta)
+        for label, value in zip(("x", "v", "theta", "omega"), state):
+            exerciser.show_value(label, value)
+        self.plot.add_data(self.cart_pole.t, state)
+
+    def draw(self, screen: pygame.Surface):
+        exerciser.show_simulation_value("t", self.cart_pole.t)
+        self.plot.draw(screen, 0, 0, screen.get_width(), screen.get_height())
+
+def _mainloop(history: int, size: tuple[int, int]):
+    # Note: This drives the internal main loop generator directly, so that frames can be timed one at a time without a background thread
+    _execute_gui._create_simulation = lambda: _CartPoleSimulation(history, size)
+    _execute_gui._recreate_simulation = True
+    _execute_gui._initialized = True
+    loop = _execute_gui._mainloop(sleep=False)
+    def frame():
+        next(loop)
+    def close():
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+        for _ in loop:
+            pass
+    return frame, close
+
+_SCENARIOS: dict[str, _Scenario] = {
+    'lineplot': _lineplot,
+    'springs': _springs,
+    'figure': _figure(retained=False),
+    'figure_retained': _figure(retained=True),
+    'mainloop': _mainloop,
+}
+
+def _time_frames(scenario: _Scenario, history: int, size: tuple[int, int], frames: int) -> list[float]:
+    frame, close = scenario(history, size)
+    try:
+        for _ in range(_WARMUP_FRAMES):
+            frame()
+        times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            frame()
+            times.append(time.perf_counter() - start)
+        return times
+    finally:
+        close()
+
+def _trace_frames(scenario: _Scenario, history: int, size: tuple[int, int], frames: int) -> tuple[float, float]:
+    """Returns the mean number of bytes allocated per frame (peak minus memory in use before the frame) and the peak memory in use during the run"""
+    tracemalloc.start()
+    try:
+        frame, close = scenario(history, size)
+        try:
+            for _ in range(_WARMUP_FRAMES):
+                frame()
+            allocated = 0
+            peak = 0
+            for _ in range(frames):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                frame()
+                _, frame_peak = tracemalloc.get_traced_memory()
+                allocated += frame_peak - before
+                peak = max(peak, frame_peak)
+            return allocated / frames, peak
+        finally:
+            close()
+    finally:
+        tracemalloc.stop()
+
+def _run_scenario(name: str, history: int, size: tuple[int, int], frames: int) -> dict[str, Any]:
+    scenario = _SCENARIOS[name]
+    result: dict[str, Any] = {'scenario': name, 'history': history, 'width': size[0], 'height': size[1]}
+    try:
+        times = _time_frames(scenario, history, size, frames)
+    except ImportError as e:
+        result['skipped'] = f"{e.name} is not installed"
+        return result
+    times_ms = sorted(t * 1000 for t in times)
+    allocated, peak = _trace_frames(scenario, history, size, frames)
+    result['frame_ms'] = {
+        'median': round(statistics.median(times_ms), 4),
+        'mean': round(statistics.fmean(times_ms), 4),
+        'p95': round(times_ms[min(len(times_ms) - 1, int(len(times_ms) * 0.95))], 4),
+        'max': round(times_ms[-1], 4),
+    }
+    result['alloc_kb_per_frame'] = round(allocated / 1024, 2)
+    result['peak_memory_kb'] = round(peak / 1024, 2)
+    return result
+
+def _key(result: dict[str, Any]) -> tuple:
+    return result['scenario'], result['history'], result['width'], result['height']
+
+def _compare(results: list[dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """Prints a comparison with the baseline to stderr. Returns true if any median frame time regressed by more than `max_regression`."""
+    with open(baseline_path) as file:
+        baseline = {_key(result): result for result in json.load(file)['results']}
+    failed = False
+    for result in results:
+        previous = baseline.get(_key(result))
+        if previous is None or 'frame_ms' not in previous or 'frame_ms' not in result:
+            continue
+        ratio = result['frame_ms']['median'] / max(previous['frame_ms']['median'], 1e-9)
+        result['baseline_ratio'] = round(ratio, 3)
+        if ratio > max_regression:
+            scenario, history, width, height = _key(result)
+            print(f"{scenario} (history {history}, {width}x{height}) is {ratio:.2f}x slower than baseline", file=sys.stderr)
+            failed = True
+    return failed
+
+def _parse_size(text: str) -> tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-frame time and memory use of exerciser drawing")
+    parser.add_argument('--scenarios', nargs='+', choices=list(_SCENARIOS), default=list(_SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument('--history', nargs='+', type=int, default=[1_000, 10_000, 100_000], help="history lengths (plot points, springs) to run (default: 1000 10000 100000)")
+    parser.add_argument('--sizes', nargs='+', type=_parse_size, default=[(800, 600), (1920, 1080)], help="window sizes as WxH (default: 800x600 1920x1080)")
+    parser.add_argument('--frames', type=int, default=100, help="number of frames to measure per run (default: 100)")
+    parser.add_argument('--output', default=None, help="also write the results to this file")
+    parser.add_argument('--baseline', default=None, help="results of a previous run to compare against")
+    parser.add_argument('--max-regression', type=float, default=1.25, help="fail if a median frame time is this many times the baseline (default: 1.25)")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios:
+        for history in args.history:
+            for size in args.sizes:
+                results.append(_run_scenario(name, history, size, args.frames))
+                print(f"{name} (history {history}, {size[0]}x{size[1]}) done", file=sys.stderr)
+
+    failed = _compare(results, args.baseline, args.max_regression) if args.baseline is not None else False
+    output = json.dumps({
+        'frames': args.frames,
+        'python': sys.version.split()[0],
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'results': results,
+    }, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures cold start time of exerciser: time to `import exerciser` and time from calling `exerciser.run` to the first frame being drawn.
+
+Each measurement runs in a fresh Python process (using SDL's dummy video driver, so no window is shown) and the median over all runs is reported as JSON.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--max-import-ms MS] [--max-first-frame-ms MS]
+
+If a limit is given and the median exceeds it, the script exits with status 1, so it can be used to catch startup time regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in the child process. Prints import time and time to first frame in seconds.
+_CHILD_SCRIPT = """
+import os, sys, threading, time
+start = time.perf_counter()
+import exerciser
+imported = time.perf_counter()
+
+first_frame = threading.Event()
+
+class Empty(exerciser.Simulation):
+    name = "Startup benchmark"
+    def tick(self, delta):
+        exerciser.show_value("delta", delta)
+    def draw(self, screen):
+        first_frame.set()
+
+run_start = time.perf_counter()
+exerciser.run(Empty)
+first_frame.wait()
+drawn = time.perf_counter()
+print(imported - start, drawn - run_start, flush=True)
+os._exit(0)
+"""
+
+def _measure_once() -> tuple[float, float]:
+    environment = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+    repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [repository_root, environment.get('PYTHONPATH')]))
+    output = subprocess.run([sys.executable, '-c', _CHILD_SCRIPT], env=environment, capture_output=True, text=True, check=True, timeout=60).stdout
+    import_time, first_frame_time = map(float, output.split())
+    return import_time, first_frame_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first frame of exerciser")
+    parser.add_argument('--runs', type=int, default=5, help="number of fresh processes to measure (default: 5)")
+    parser.add_argument('--max-import-ms', type=float, default=None, help="fail if median import time exceeds this")
+    parser.add_argument('--max-first-frame-ms', type=float, default=None, help="fail if median time to first frame exceeds this")
+    args = parser.parse_args()
+
+    samples = [_measure_once() for _ in range(args.runs)]
+    import_ms = statistics.median(sample[0] for sample in samples) * 1000
+    first_frame_ms = statistics.median(sample[1] for sample in samples) * 1000
+    print(json.dumps({
+        'runs': args.runs,
+        'import_ms': round(import_ms, 2),
+        'first_frame_ms': round(first_frame_ms, 2),
+        'python': sys.version.split()[0],
+    }, indent=2))
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"Import time {import_ms:.1f} ms exceeds limit of {args.max_import_ms} ms", file=sys.stderr)
+        failed = True
+    if args.max_first_frame_ms is not None and first_frame_ms > args.max_first_frame_ms:
+        print(f"Time to first frame {first_frame_ms:.1f} ms exceeds limit of {args.max_first_frame_ms} ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
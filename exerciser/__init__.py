@@ -1,3 +1,29 @@
-from ._execute_gui import run, show_value, show_simulation_value, DELTA, TPS
-from ._shared import Simulation, ValidationError, CodeRunError
-from . import pygame
\ No newline at end of file
+from ._execute_gui import run, show_value, show_simulation_value, timing_stats, telemetry, DELTA, TPS
+from ._execute_headless import run_headless, HeadlessResult
+from ._capture import FrameCapture
+from ._pacer import TimingStats
+from ._telemetry import Telemetry
+from ._shared import Simulation, BatchSimulation, ValidationError, CodeRunError
+
+_LAZY_ATTRIBUTES = {
+    'run_batch': '._execute_batch',
+    'run_sweep': '._execute_batch',
+    'BatchResult': '._execute_batch',
+    'run_process': '._execute_process',
+    'SimulationProcess': '._execute_process',
+    'replay': '._recording',
+    'profile_span': '._profiler',
+}
+
+def __getattr__(name: str):
+    # exerciser.pygame is imported lazily, because it imports NumPy and Matplotlib, which take a long time to import and are not needed by every exercise
+    if name == 'pygame':
+        import importlib
+        return importlib.import_module('.pygame', __name__)
+    # Batch and process runners, replays and profiling are imported lazily too (they import multiprocessing and json, which most exercises never use)
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is not None:
+        import importlib
+        value = globals()[name] = getattr(importlib.import_module(module, __name__), name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
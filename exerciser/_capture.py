@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+from typing import Literal
+import pygame
+
+class FrameCapture:
+    """
+    Captures rendered frames and writes them to disk on a background thread.
+
+    Frames are copied into a bounded queue and encoded by a writer thread, so encoding does not run on the thread that renders the frames.
+    If the queue is full, `policy` decides what happens:
+    * `'block'` waits for the writer to catch up. No frames are lost, so this is the right choice for headless capture.
+    * `'drop_newest'` drops the new frame.
+    * `'drop_oldest'` drops the oldest queued frame to make room for the new frame.
+
+    Formats:
+    * `'png'` writes numbered PNG files (`frame_000000.png`, ...) into the directory `path`.
+    * `'raw'` writes frames as a raw RGB24 stream into the file `path` (e.g. for `ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r FPS -i path`).
+      All frames in a raw stream must have the same size, so frames with a different size than the first frame are dropped.
+
+    Use as a context manager or call `close` to wait until all queued frames have been written.
+    Passing a capture to `run` or `run_headless` closes it automatically when the run finishes.
+    """
+
+    def __init__(self, path: str | os.PathLike, *, format: Literal['png', 'raw'] = 'png', every: int = 1,
+                 queue_size: int = 64, policy: Literal['block', 'drop_newest', 'drop_oldest'] = 'block'):
+        if every < 1:
+            raise ValueError("every must be a positive integer")
+        if format not in ('png', 'raw'):
+            raise ValueError(f"Unknown format: {format}")
+        if policy not in ('block', 'drop_newest', 'drop_oldest'):
+            raise ValueError(f"Unknown policy: {policy}")
+        self.path = path
+        self.format = format
+        self.every = every
+        self.policy = policy
+
+        self.submitted = 0
+        """Number of frames passed to the writer thread"""
+        self.written = 0
+        """Number of frames written to disk"""
+        self.dropped = 0
+        """Number of frames dropped because the queue was full (or because they had the wrong size for a raw stream)"""
+
+        self._frame_count = 0
+        # Frames removed from the queue by the 'drop_oldest' policy (these were submitted, but are never written)
+        self._evicted = 0
+        # Whether the writer error has already been raised by `capture`, so that `close` does not raise it a second time
+        self._error_raised = False
+        self._frame_size: tuple[int, int] | None = None
+        self._queue: queue.Queue[tuple[int, tuple[int, int], bytes] | None] = queue.Queue(queue_size)
+        self._error: Exception | None = None
+        self._closed = False
+
+        if format == 'png':
+            os.makedirs(path, exist_ok=True)
+            self._file = None
+        else:
+            self._file = open(path, 'wb')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def capture(self, surface: pygame.Surface):
+        """Captures the current contents of `surface` (only every `every`-th call captures a frame)"""
+        if self._error is not None:
+            self._error_raised = True
+            raise self._error
+        index = self._frame_count
+        self._frame_count += 1
+        if index % self.every != 0 or self._closed:
+            return
+
+        size = surface.get_size()
+        if self.format == 'raw':
+            if self._frame_size is None:
+                self._frame_size = size
+            elif size != self._frame_size:
+                self.dropped += 1
+                return
+
+        frame = (index // self.every, size, pygame.image.tobytes(surface, 'RGB'))
+        if self.policy == 'block':
+            self._queue.put(frame)
+        else:
+            try:
+                self._queue.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == 'drop_newest':
+                    return
+                try:
+                    self._queue.get_nowait()
+                    self._evicted += 1
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(frame)
+        self.submitted += 1
+
+    @property
+    def queued(self) -> int:
+        """Number of frames waiting to be written"""
+        return self.submitted - self.written - self._evicted
+
+    def close(self):
+        """Waits until all queued frames have been written and closes the output"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+        if self._error is not None and not self._error_raised:
+            self._error_raised = True
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while (frame := self._queue.get()) is not None:
+            if self._error is not None:
+                # Keep draining the queue so that producers using the 'block' policy do not get stuck
+                continue
+            index, size, data = frame
+            try:
+                if self._file is not None:
+                    self._file.write(data)
+                else:
+                    image = pygame.image.frombytes(data, size, 'RGB')
+                    pygame.image.save(image, os.path.join(self.path, f"frame_{index:06}.png"))
+            except Exception as e:
+                self._error = e
+                continue
+            self.written += 1
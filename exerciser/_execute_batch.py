@@ -0,0 +1,191 @@
+from collections import deque
+from dataclasses import dataclass, field
+import functools
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import time
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence
+from ._shared import Simulation
+from ._execute_headless import HeadlessResult, _run_ticks
+
+@dataclass
+class BatchResult:
+    """Outcome of running one simulation with `run_batch` or `run_sweep`."""
+
+    index: int
+    """Position of the job in the list of jobs that was passed in."""
+    params: dict[str, Any] | None = None
+    """Parameters passed to `create_simulation` (only set by `run_sweep`)."""
+    ticks: int = 0
+    """Number of calls to `tick` that completed successfully."""
+    time: float = 0.0
+    """Simulated time in seconds."""
+    values: list[str] = field(default_factory=list)
+    """Values shown with `show_value` during the last call to `tick`."""
+    series: dict[str, list[tuple[float, Any]]] = field(default_factory=dict)
+    """All values shown with `show_value`, as `(time, value)` pairs grouped by label."""
+    state: Any = None
+    """Final state of the simulation, as returned by `extract_state`."""
+    error: str | None = None
+    """Error message, if the simulation was stopped by an exception or timed out."""
+    exception_type: str | None = None
+    """Name of the type of the exception that stopped the simulation (`'TimeoutError'` if the job timed out)."""
+    elapsed: float = 0.0
+    """Wall-clock time in seconds taken to run the job."""
+
+def run_batch(factories: Iterable[Callable[[], Simulation]], *, duration: float, timeout: float | None = None,
+              workers: int | None = None, extract_state: Callable[[Simulation], Any] | None = None) -> Iterator[BatchResult]:
+    """
+    Runs each simulation returned by `factories` headless (see `run_headless`) for `duration` seconds of simulated time,
+    spread over a pool of worker processes. Yields results in the order the jobs finish.
+
+    Unlike `run_headless`, unexpected exceptions do not propagate. They are reported in the result instead.
+
+    Note: Factories and `extract_state` are sent to worker processes, so they must be picklable
+    (e.g. module-level functions or `functools.partial` objects wrapping them, but not lambdas).
+
+    Args:
+        duration: simulated time to run each simulation for, in seconds
+        timeout: wall-clock time limit for each job in seconds (the worker running the job is killed if it is exceeded)
+        workers: number of worker processes (defaults to the number of CPUs)
+        extract_state: called with the simulation after it has finished to get `BatchResult.state`.
+            The return value must be picklable. By default the scalar attributes of the simulation are returned as a dict.
+    """
+    jobs = [(factory, None) for factory in factories]
+    return _run_jobs(jobs, duration, timeout, workers, extract_state)
+
+def run_sweep(create_simulation: Callable[..., Simulation], grid: Mapping[str, Sequence[Any]], *, duration: float, timeout: float | None = None,
+              workers: int | None = None, extract_state: Callable[[Simulation], Any] | None = None) -> Iterator[BatchResult]:
+    """
+    Runs `create_simulation(**params)` for every combination of parameters in `grid`, like `run_batch`.
+
+    Example: `run_sweep(create_simulation, {'kp': [1, 2, 4], 'kd': [0.1, 0.5]}, duration=30)` runs 6 simulations.
+    """
+    names = list(grid)
+    jobs = []
+    for combination in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, combination))
+        jobs.append((functools.partial(create_simulation, **params), params))
+    return _run_jobs(jobs, duration, timeout, workers, extract_state)
+
+def _run_jobs(jobs: list[tuple[Callable[[], Simulation], dict[str, Any] | None]], duration: float, timeout: float | None,
+              workers: int | None, extract_state: Callable[[Simulation], Any] | None) -> Iterator[BatchResult]:
+    context = multiprocessing.get_context()
+    queue = deque(enumerate(jobs))
+    pool = [_Worker(context) for _ in range(min(workers or os.cpu_count() or 1, len(jobs)))]
+    try:
+        while queue or any(worker.job is not None for worker in pool):
+            for worker in pool:
+                if worker.job is None and queue:
+                    index, (factory, params) = queue.popleft()
+                    worker.start_job(index, params, (index, factory, params, duration, extract_state), timeout)
+
+            busy = [worker for worker in pool if worker.job is not None]
+            deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+            wait_timeout = max(min(deadlines) - time.perf_counter(), 0.0) if deadlines else None
+            ready = multiprocessing.connection.wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy], wait_timeout)
+
+            for i, worker in enumerate(pool):
+                if worker.job is None:
+                    continue
+                if worker.connection in ready:
+                    try:
+                        result = worker.connection.recv()
+                    except EOFError:
+                        yield worker.fail("Worker process exited unexpectedly", 'WorkerCrashed')
+                        pool[i] = _Worker(context)
+                    else:
+                        worker.job = worker.deadline = None
+                        yield result
+                elif worker.process.sentinel in ready:
+                    yield worker.fail("Worker process exited unexpectedly", 'WorkerCrashed')
+                    pool[i] = _Worker(context)
+                elif worker.deadline is not None and time.perf_counter() >= worker.deadline:
+                    worker.process.kill()
+                    yield worker.fail(f"Timed out after {timeout} s", 'TimeoutError')
+                    pool[i] = _Worker(context)
+    finally:
+        for worker in pool:
+            worker.stop()
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.job: tuple[int, dict[str, Any] | None] | None = None
+        self.deadline: float | None = None
+        self.start_time = 0.0
+
+    def start_job(self, index: int, params: dict[str, Any] | None, job: tuple, timeout: float | None):
+        self.connection.send(job)
+        self.job = (index, params)
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + timeout if timeout is not None else None
+
+    def fail(self, error: str, exception_type: str) -> BatchResult:
+        assert self.job is not None
+        index, params = self.job
+        self.stop()
+        return BatchResult(index, params, error=error, exception_type=exception_type, elapsed=time.perf_counter() - self.start_time)
+
+    def stop(self):
+        self.job = self.deadline = None
+        if self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.connection.close()
+
+def _worker_main(connection: multiprocessing.connection.Connection):
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        index, factory, params, duration, extract_state = job
+        result = BatchResult(index, params)
+        start_time = time.perf_counter()
+        headless_result = None
+        try:
+            simulation = factory()
+            if simulation.real_time:
+                raise ValueError("Real time simulations cannot be run headless")
+            headless_result = HeadlessResult(simulation, 0, 0.0)
+            _run_ticks(headless_result, duration)
+            result.error = headless_result.error
+            if headless_result.exception is not None:
+                result.exception_type = type(headless_result.exception).__name__
+            result.state = (extract_state or _default_state)(simulation)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            result.exception_type = type(e).__name__
+        if headless_result is not None:
+            result.ticks = headless_result.ticks
+            result.time = headless_result.time
+            result.values = headless_result.values
+            result.series = headless_result.series
+        result.elapsed = time.perf_counter() - start_time
+
+        try:
+            connection.send(result)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Some values are not picklable, so send them as strings
+            result.series = {label: [(t, repr(value)) for t, value in series] for label, series in result.series.items()}
+            result.state = repr(result.state)
+            connection.send(result)
+
+def _default_state(simulation: Simulation) -> dict[str, Any]:
+    return {key: value for key, value in vars(simulation).items() if isinstance(value, (bool, int, float, complex, str))}
@@ -1,16 +1,25 @@
+import functools
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 os.environ['SDL_MOUSE_FOCUS_CLICKTHROUGH'] = '1'
 # os.environ['SDL_HINT_FORCE_RAISEWINDOW'] = '1'
 import sys
 import time
-import asyncio
 from contextvars import ContextVar
 import threading
-from typing import Any, Callable, Final, Sequence
+from typing import TYPE_CHECKING, Any, Callable, Final, Sequence
 import traceback
 import pygame
-from ._shared import CodeRunError, Simulation, ValidationError
+from ._shared import CodeRunError, Simulation, TextCache, ValidationError, _load_font, _prewarm
+from ._capture import FrameCapture
+from ._pacer import _INPUT_EVENT_TYPES, TimingStats, _FramePacer, _InputLatencyTracker, _TimingTelemetry
+from ._telemetry import Telemetry, _format_value, _telemetry_for
+from ._pipeline import _RenderPipeline
+from ._snapshots import _SNAPSHOT_INTERVAL, _Precreator, _SnapshotHistory, _take_snapshot
+
+if TYPE_CHECKING:
+    from ._execute_process import _FramebufferWriter
+    from ._profiler import _FrameProfiler
 
 # Type copied from pygame/_common.pyi
 ColorValue = pygame.Color | int | str | tuple[int, int, int] | tuple[int, int, int, int] | Sequence[int]
@@ -23,10 +32,23 @@ DELTA: Final[float] = 1 / TPS
 _CONTROLS = [
     "R - Restart the simulation",
     "P - Pause the simulation",
-    "S - Step the simulation (execute one tick)",
+    "S - Step the simulation (advance by one frame)",
+    "B - Step back to the previous snapshot",
+    "N - Step forward to the next snapshot",
     "F1 - Toggle help text",
 ]
-_CONTROLS_REAL_TIME = _CONTROLS[:1] + _CONTROLS[3:]
+_CONTROLS_REAL_TIME = _CONTROLS[:1] + _CONTROLS[5:]
+_CONTROL_KEYS = (pygame.K_r, pygame.K_p, pygame.K_s, pygame.K_F1, pygame.K_F2, pygame.K_F3)
+"""Keys handled by the main loop itself"""
+_HISTORY_KEYS = (pygame.K_b, pygame.K_n)
+"""Keys for stepping through snapshots, which are only handled by the main loop if the simulation supports snapshots (otherwise they are left to the simulation)"""
+
+_MAX_CATCH_UP_FRAMES = 4
+"""Default number of frames worth of ticks that can be run in a single frame when catching up with real time"""
+_MAX_FRAME_TIME = 0.25
+"""Maximum real time in seconds that is counted towards ticks for a single frame (e.g. when the window is being dragged and the main loop is blocked)"""
+_MAX_REAL_TIME_DELTA = 1.0
+"""Maximum delta in seconds passed to `tick` in real time mode (longer deltas are clamped)"""
 
 _lock = threading.Lock()
 
@@ -35,16 +57,28 @@ _recreate_simulation = False
 _initialized = False
 _parent_header = None
 _timer = None
+_record_path: str | os.PathLike | None = None
+_trace_path: str | os.PathLike | None = None
+_capture: FrameCapture | None = None
+_framebuffer: '_FramebufferWriter | None' = None
+"""Shared framebuffer that frames are published to. Only set in the simulation process started by `run_process`."""
+_run_count = 0
+_timing: _TimingTelemetry | None = None
+_window_telemetry: Telemetry | None = None
+# Note: Values are stored as raw (label, value) pairs and only formatted when a frame is drawn, so showing values in ticks that are never drawn is cheap
 _values_to_draw: ContextVar = ContextVar('values', default=None)
 _user_values_to_draw: ContextVar = ContextVar('user_values', default=None)
+_current_telemetry: ContextVar = ContextVar('telemetry', default=None)
 
 def show_value(label: str, value: Any):
     """
     Show a user-supplied value on screen for debugging purposes.
+
+    Values shown during a tick are also recorded in the telemetry history (see `telemetry`).
     """
     values = _user_values_to_draw.get()
     if values is not None:
-        values.append(f"{label} = {value:.3f}" if isinstance(value, float) else f"{label} = {value}")
+        values.append((label, value))
 
 def show_simulation_value(label: str, value: Any, *, color: ColorValue = 'black'):
     """
@@ -54,22 +88,58 @@ def show_simulation_value(label: str, value: Any, *, color: ColorValue = 'black'
     """
     values = _values_to_draw.get()
     if values is not None:
-        values.append((f"{label} = {value:.3f}" if isinstance(value, float) else f"{label} = {value}", color))
+        values.append((label, value, color))
+
+def timing_stats() -> TimingStats | None:
+    """
+    Returns pacing statistics (lateness, overruns, real-time deltas and input latency) of the simulation currently running in the window,
+    or None if no window is open. Statistics are reset when the simulation is restarted.
+    """
+    timing = _timing
+    return timing.stats() if timing is not None else None
 
-def run(create_simulation: Callable[[], Simulation]):
+def telemetry() -> Telemetry | None:
+    """
+    Returns the history of values shown with `show_value` by the simulation currently running in the window, or None if no window is open
+    (or the simulation disabled the history using `telemetry_history`). The history is reset when the simulation is restarted.
+
+    When called inside a simulation run headless, returns the history of that run instead.
+    """
+    current = _current_telemetry.get()
+    return current if current is not None else _window_telemetry
+
+def run(create_simulation: Callable[[], Simulation] | Sequence[Callable[[], Simulation]], *, record: str | os.PathLike | None = None, trace: str | os.PathLike | None = None,
+        capture: FrameCapture | None = None):
     """
     Calls `create_simulation` to create a simulation object. Runs the obtained simulation in a Pygame window.
     
     Note: `create_simulation` may be called more than once to restart the simulation. It should return a new simulation object every time.
+
+    If `create_simulation` is a list of functions, the simulations they create are shown side by side in tiles of the same window and ticked in lockstep
+    (they must have the same `real_time` and `tick_rate`). Each tile can be paused by clicking its title bar and stops on its own if it raises an error.
+
+    Args:
+        record: if set, the session (events, restarts and deltas passed to `tick`) is recorded to this file, so it can be reproduced later using `replay`
+        trace: if set, timings of each phase of each frame (and spans measured with `profile_span`) are written to this file in Chrome trace format
+            when the window is closed or `run` is called again. The file can be opened in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+        capture: if set, every frame shown in the window is captured (use a drop policy to avoid slowing down the window if encoding can't keep up).
+            The capture is closed when the window is closed or `run` is called again.
     """
-    global _create_simulation, _recreate_simulation, _initialized, _parent_header, _timer
+    global _create_simulation, _recreate_simulation, _initialized, _parent_header, _timer, _record_path, _trace_path, _capture, _run_count
 
-    # TODO: It might be necessary to add more locking for thread safety.
-    # Simple assignment is atomic on current CPython but that is not guaranteed for other implementations or future versions of CPython.
+    if not callable(create_simulation):
+        from ._tiles import _tiled_factory
+        create_simulation = _tiled_factory(create_simulation)
 
-    _create_simulation = create_simulation
-    _recreate_simulation = True
+    # Note: The main loop reads these globals together while holding _lock, so it never sees a run that is only partially set up.
+    # Relying on assignment being atomic is not enough for that (and is not guaranteed on free-threaded Python).
     with _lock:
+        _create_simulation = create_simulation
+        _record_path = record
+        _trace_path = trace
+        _capture = capture
+        _run_count += 1
+        _recreate_simulation = True
         if _initialized:
             try:
                 # Store parent header of latest run if running in an IPython notebook
@@ -86,12 +156,10 @@ def run(create_simulation: Callable[[], Simulation]):
         mainloop = _mainloop(sleep=False)
 
         # Hook IPython asyncio event loop
+        import asyncio
         async def run_async():
-            next_iteration = time.perf_counter()
-            for _ in mainloop:
-                now = time.perf_counter()
-                next_iteration = max(next_iteration + DELTA, now)
-                await asyncio.sleep(next_iteration - now)
+            for pacer in mainloop:
+                await pacer.sleep_async()
         try:
             asyncio.create_task(run_async())
         except RuntimeError:
@@ -124,16 +192,92 @@ def run(create_simulation: Callable[[], Simulation]):
     else:
         threading.Thread(target=_run).start()
 
+def _tick_delta(simulation: Simulation) -> float:
+    """Fixed delta passed to `tick` for the given simulation (if not in real time mode)"""
+    tick_rate = getattr(simulation, 'tick_rate', None)
+    return 1 / tick_rate if tick_rate else DELTA
+
+def _pacing_period(simulation: Simulation) -> float:
+    """Target time in seconds between iterations of the main loop for the given simulation"""
+    tick_rate = getattr(simulation, 'tick_rate', None)
+    return 1 / tick_rate if simulation.real_time and tick_rate else DELTA
+
+def _take_render_state(simulation: Simulation) -> Any:
+    """Returns the render state of the simulation, or None if it does not support pipelined rendering"""
+    render_state = getattr(simulation, 'render_state', None)
+    return render_state() if render_state is not None else None
+
+def _draw_render_state(simulation: Simulation, state: Any, surface: pygame.Surface) -> list[tuple[str, Any, Any]]:
+    """Draws a render state on the render thread. Returns the values shown using `show_simulation_value` while drawing."""
+    values: list[tuple[str, Any, Any]] = []
+    # Note: The render thread has its own context, so this does not affect the values collected on the main loop thread
+    token = _values_to_draw.set(values)
+    try:
+        surface.fill('white')
+        simulation.draw_state(surface, state)
+    finally:
+        _values_to_draw.reset(token)
+    return values
+
+def _histogram_bars(histogram: list[int]) -> tuple[int, ...]:
+    """Heights in pixels of the bars of the frame time histogram"""
+    scale = 40 / max(max(histogram), 1)
+    return tuple(round(count * scale) for count in histogram)
+
+class _NoTickTimeout(BaseException):
+    """Placeholder for `_TickTimeout` in the main loop before any simulation has set `tick_time_limit`"""
+
+def _set_active_profiler(profiler: '_FrameProfiler | None'):
+    """Sets the profiler that `profile_span` reports to"""
+    # Note: The profiler module is only imported once profiling is used, so there is nothing to reset before that
+    module = sys.modules.get(f'{__package__}._profiler')
+    if module is not None:
+        module._active_profiler = profiler # type: ignore
+
+def _render_histogram(bars: tuple[int, ...]) -> pygame.Surface:
+    """Renders frame time histogram (bins of 2 ms, last bin includes all longer frames) from the bar heights returned by `_histogram_bars`"""
+    surface = pygame.Surface((len(bars) * 6, 40), pygame.SRCALPHA)
+    pygame.draw.rect(surface, 'gray', surface.get_rect(), 1)
+    for i, bar_height in enumerate(bars):
+        pygame.draw.rect(surface, 'blue', (i * 6, 40 - bar_height, 5, bar_height))
+    return surface
+
+def _error_message(e: ValidationError | CodeRunError) -> str:
+    """Formats the message shown to the user when `tick` raises `ValidationError` or `CodeRunError`"""
+    if isinstance(e, ValidationError):
+        return f"{e}"
+    cause = e.__cause__ or e.__context__
+    if cause is None:
+        return f"{e}: <unknown cause>"
+    return f"{e}: {type(cause).__name__}: {cause}"
+
 def _run():
     mainloop = _mainloop(sleep=True)
     for _ in mainloop:
         pass
 
 def _mainloop(sleep: bool):
-    global _recreate_simulation, _initialized, _parent_header
-
+    """
+    Runs the main loop, yielding the frame pacer after each iteration.
+    If `sleep` is false, the caller is responsible for waiting until the next iteration (e.g. using `_FramePacer.sleep_async`).
+    """
+    global _recreate_simulation, _initialized, _parent_header, _timing, _window_telemetry
+
+    recorder = None
+    profiler = None
+    capture = None
+    watchdog = None
+    # Exception raised by the watchdog in ticks that exceed their time limit (a placeholder that is never raised until the watchdog is imported)
+    tick_timeout: type[BaseException] = _NoTickTimeout
+    pipeline: _RenderPipeline | None = None
+    framebuffer = _framebuffer
     try:
-        assert _create_simulation is not None
+        from ._tiles import _TiledSimulation
+
+        with _lock:
+            create_simulation = _create_simulation
+            _recreate_simulation = False
+        assert create_simulation is not None
 
         running = True
 
@@ -153,13 +297,11 @@ def _mainloop(sleep: bool):
             last_message_hide = 0
 
         pygame.display.init()
-        pygame.font.init()
 
         # TODO: Can we somehow move this after pygame.display.set_mode?
         # Some functions (e.g. Surface.convert) need the display mode to be set before they can be called.
         # Currently this is blocked by the fact that we need to get initial window size from the simulation to set mode.
-        _recreate_simulation = False
-        simulation = _create_simulation()
+        simulation = create_simulation()
 
         # TODO: Is there a way to make Pygame ignore Windows display scaling?
         screen = pygame.display.set_mode(simulation.initial_window_size, pygame.RESIZABLE)
@@ -175,26 +317,92 @@ def _mainloop(sleep: bool):
             pass
 
         clock = pygame.time.Clock()
-        variables_font = pygame.font.Font(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Roboto-Regular-Modified.ttf'), 20)
+        variables_font = _load_font(20)
+        text_cache = TextCache()
+
+        timing = _TimingTelemetry(1 / _pacing_period(simulation), getattr(simulation, 'timing_tolerance', 0.001))
+        pacer = _FramePacer(_pacing_period(simulation), timing, spin=simulation.real_time)
+        _timing = timing
+        input_latency = _InputLatencyTracker(timing)
+        next_draw_time = 0.0
 
-        values_to_draw, user_values_to_draw = [], []
+        # Lines shown by the main loop itself, values shown using show_simulation_value and values shown using show_value
+        values_to_draw: list[tuple[str, Any]] = []
+        simulation_values_to_draw: list[tuple[str, Any, Any]] = []
+        user_values_to_draw: list[tuple[str, Any]] = []
+        telemetry: Telemetry | None = None
 
         last_tick_time = 0.0
         last_frame_time = 0.0
+        last_start_time = time.perf_counter()
+
+        # Accumulated real time that has not been simulated yet (used if simulation has custom tick rate)
+        tick_accumulator = 0.0
+        last_tick_count = 0
+        frames_behind = 0
+        dropped_time = 0.0
+
+        slow_tick_count = 0
+        slowest_tick = 0.0
 
         paused = False
         show_fps = False
+        show_profiler = False
         show_help = False
+        # Histogram surface is only re-rendered when its bars change, so that it doesn't invalidate the overlay in dirty rect mode
+        histogram_bars: tuple[int, ...] | None = None
+        histogram_surface: pygame.Surface | None = None
 
         last_parent_header = None
 
         last_simulation = None
         simulation_valid = True
 
+        # Snapshot of the simulation right after it was created (None if the simulation does not support snapshots)
+        initial_snapshot = None
+        history = _SnapshotHistory()
+        # Simulated time since the simulation was (re)started
+        simulated_time = 0.0
+        precreator: _Precreator | None = None
+
+        last_run_count = None
+
+        # State for dirty rect mode
+        layer: pygame.Surface | None = None
+        last_overlay_key = []
+        last_overlay_rects: list[pygame.Rect] = []
+
+        # Control key presses found by late input polls, which are handled at the start of the next frame
+        deferred_events: list[pygame.event.Event] = []
+
+        def history_enabled() -> bool:
+            """Whether B and N step through snapshots (instead of being passed to the simulation like other keys)"""
+            return initial_snapshot is not None and not simulation.real_time
+
+        def poll_input() -> list[pygame.event.Event]:
+            """Gets input events that arrived since the start of the frame (in low latency input mode)"""
+            late_events = []
+            for event in pygame.event.get(_INPUT_EVENT_TYPES):
+                if event.type == pygame.KEYDOWN and (event.key in _CONTROL_KEYS or event.key in _HISTORY_KEYS and history_enabled()):
+                    deferred_events.append(event)
+                else:
+                    late_events.append(event)
+            if late_events:
+                input_latency.handled(late_events, time.perf_counter())
+            return late_events
+
         while running:
             start_time = time.perf_counter()
+            if profiler is not None:
+                profiler.start_frame()
 
-            parent_header = _parent_header
+            with _lock:
+                parent_header = _parent_header
+                run_count = _run_count
+                record_path, trace_path, new_capture = _record_path, _trace_path, _capture
+                recreate_simulation = _recreate_simulation
+                _recreate_simulation = False
+                create_simulation = _create_simulation
             if parent_header is not last_parent_header:
                 last_parent_header = parent_header
                 # Redirect output from this thread to the notebook cell of the latest run if running in an IPython notebook
@@ -207,14 +415,18 @@ def _mainloop(sleep: bool):
                         pass
 
             step = False
+            restart = False
+            history_step = 0
 
-            events = pygame.event.get()
+            events = deferred_events + pygame.event.get()
+            deferred_events.clear()
+            poll_time = time.perf_counter()
             for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
-                        _recreate_simulation = True
+                        restart = True
                     elif event.key == pygame.K_p and not simulation.real_time:
                         paused = not paused
                     elif event.key == pygame.K_s and not simulation.real_time:
@@ -222,105 +434,399 @@ def _mainloop(sleep: bool):
                             step = True
                         else:
                             paused = True
+                    elif event.key == pygame.K_b and history_enabled():
+                        history_step = -1
+                    elif event.key == pygame.K_n and history_enabled():
+                        history_step = 1
                     elif event.key == pygame.K_F1:
                         show_help = not show_help
                     elif event.key == pygame.K_F2:
                         show_fps = not show_fps
-
-            if _recreate_simulation:
-                _recreate_simulation = False
-                simulation = _create_simulation()
+                    elif event.key == pygame.K_F3:
+                        show_profiler = not show_profiler
+                        if show_profiler and profiler is None:
+                            from ._profiler import _FrameProfiler
+                            profiler = _FrameProfiler()
+                        elif not show_profiler and profiler is not None and profiler.trace_path is None:
+                            profiler = None
+                        _set_active_profiler(profiler)
+
+            if run_count != last_run_count:
+                last_run_count = run_count
+                if recorder is not None:
+                    recorder.close()
+                    recorder = None
+                if record_path is not None:
+                    from ._recording import _Recorder
+                    recorder = _Recorder(record_path)
+                if profiler is not None:
+                    profiler.write_trace()
+                    profiler = None
+                if show_profiler or trace_path is not None:
+                    from ._profiler import _FrameProfiler
+                    profiler = _FrameProfiler(trace_path=trace_path)
+                _set_active_profiler(profiler)
+                if capture is not None:
+                    capture.close()
+                capture = new_capture
+
+            if pipeline is not None and (recreate_simulation or restart):
+                # An error while drawing the frame in flight belongs to the current simulation, so it must be raised before the simulation is replaced
+                pipeline.finish()
+
+            restored = False
+            if recreate_simulation:
+                simulation = create_simulation()
+            elif restart:
+                if initial_snapshot is not None:
+                    # Restoring the state from right after creation is much cheaper than creating a new simulation
+                    simulation.restore(initial_snapshot)
+                    restored = True
+                else:
+                    replacement = precreator.take() if precreator is not None and precreator.create_simulation is create_simulation else None
+                    simulation = replacement if replacement is not None else create_simulation()
 
             values_to_draw.clear()
             if show_fps:
                 values_to_draw.append((f"FPS: {clock.get_fps():.2f}, Frame time: {last_frame_time * 1000:.2f} ms", 'black'))
-            _values_to_draw.set(values_to_draw)
-
-            if simulation is not last_simulation:
+                values_to_draw.append((f"Text cache: {text_cache.hits} hits, {text_cache.misses} misses", 'black'))
+                if getattr(simulation, 'tick_rate', None) and not simulation.real_time:
+                    values_to_draw.append((f"Ticks per frame: {last_tick_count}, Frames behind: {frames_behind}, Dropped time: {dropped_time:.2f} s", 'black'))
+                if slow_tick_count > 0:
+                    values_to_draw.append((f"Slow ticks: {slow_tick_count}, Slowest tick: {slowest_tick * 1000:.2f} ms", 'black'))
+                values_to_draw.extend((line, 'black') for line in timing.summary())
+                if initial_snapshot is not None:
+                    values_to_draw.append((f"Snapshots: {len(history)}, {history.memory / 1e6:.1f} MB", 'black'))
+                if capture is not None:
+                    values_to_draw.append((f"Capture: {capture.written} written, {capture.queued} queued, {capture.dropped} dropped", 'black'))
+            if show_profiler and profiler is not None:
+                values_to_draw.extend((line, 'black') for line in profiler.summary())
+            simulation_values_to_draw.clear()
+            _values_to_draw.set(simulation_values_to_draw)
+
+            restarted = simulation is not last_simulation or restored
+            if restarted:
+                if simulation is not last_simulation:
+                    initial_snapshot = _take_snapshot(simulation)
+                    # Simulations that support snapshots are restarted by restoring the initial snapshot, so they don't need a replacement
+                    precreator = _Precreator(create_simulation) if initial_snapshot is None and getattr(simulation, 'precreate', False) else None
                 last_simulation = simulation
                 simulation_valid = True
+                history.clear()
+                input_latency.clear()
+                simulated_time = 0.0
+                telemetry = _window_telemetry = _telemetry_for(simulation)
+                if initial_snapshot is not None:
+                    history.push(0.0, initial_snapshot)
                 
+                # Restart pacing, since the target rate may be different for the new simulation
+                pacer.reset(_pacing_period(simulation), spin=simulation.real_time)
+                timing.reset(1 / pacer.period, getattr(simulation, 'timing_tolerance', 0.001))
+                next_draw_time = 0.0
+
                 # Unpause and reset last tick time if real-time simulation
                 if simulation.real_time:
-                    last_tick_time = time.perf_counter() - DELTA
+                    last_tick_time = time.perf_counter() - pacer.period
                     paused = False
 
                 # Clear previous error and values
                 clear_message()
                 user_values_to_draw.clear()
-
+                tick_accumulator = 0.0
+
+            rewound = False
+            if history_step != 0:
+                paused = True
+                if recorder is not None:
+                    # Recordings can't represent jumps in time, so replaying them would not reproduce the session
+                    show_message("Stepping through snapshots is not available while recording", 'orange', 2000)
+                else:
+                    entry = history.back(simulated_time) if history_step < 0 else history.forward()
+                    if entry is not None:
+                        simulated_time, snapshot = entry
+                        simulation.restore(snapshot)
+                        # Stepping back to before an error makes the simulation valid again
+                        simulation_valid = True
+                        rewound = True
+                        clear_message()
+                        user_values_to_draw.clear()
+                        if telemetry is not None:
+                            telemetry._truncate(simulated_time)
+
+            frame_elapsed = min(start_time - last_start_time, _MAX_FRAME_TIME)
+            last_start_time = start_time
+
+            if profiler is not None:
+                profiler.mark('events')
+
+            handled_input = simulation_valid
+            deltas = []
+            # Events passed to handle_input in this frame, with the index of the first delta ticked after them
+            input_batches = [(events, 0)]
+            low_latency_input = getattr(simulation, 'low_latency_input', False)
             if simulation_valid:
                 simulation.handle_input(events)
+                input_latency.handled(events, poll_time)
+                if profiler is not None:
+                    profiler.mark('handle_input')
                 if not paused or step:
+                    if simulation.real_time:
+                        # Tick with real-time delta
+                        tick_time = time.perf_counter()
+                        real_delta = tick_time - last_tick_time
+                        last_tick_time = tick_time
+                        clamped = real_delta > _MAX_REAL_TIME_DELTA
+                        if clamped:
+                            show_message(f"Main loop was blocked for {real_delta:.2f} s, delta passed to tick was clamped to {_MAX_REAL_TIME_DELTA} s", 'orange', 3000)
+                        deltas = [min(real_delta, _MAX_REAL_TIME_DELTA)]
+                        timing.record_delta(deltas[0], clamped)
+                    else:
+                        # Tick with fixed delta to ensure that simulation is as deterministic as possible
+                        delta = _tick_delta(simulation)
+                        if not getattr(simulation, 'tick_rate', None):
+                            tick_count = 1
+                        elif step:
+                            tick_count = max(round(DELTA / delta), 1)
+                        else:
+                            max_tick_count = getattr(simulation, 'max_ticks_per_frame', None) or max(round(_MAX_CATCH_UP_FRAMES * DELTA / delta), 1)
+                            tick_accumulator += frame_elapsed
+                            tick_count = int(tick_accumulator / delta + 1e-9)
+                            if tick_count > max_tick_count:
+                                # Too far behind real time, so give up on catching up to avoid spending ever more time on ticks
+                                frames_behind += 1
+                                dropped_time += (tick_count - max_tick_count) * delta
+                                tick_count = max_tick_count
+                                tick_accumulator = 0.0
+                            else:
+                                tick_accumulator -= tick_count * delta
+                        deltas = [delta] * tick_count
+                    last_tick_count = len(deltas)
+
                     # Only enable storing values in show_value during tick.
                     # TODO: Enable show_value support for other simulation methods.
                     # (Needs more complex clearing logic in cases where only some methods run.)
-                    user_values_to_draw.clear()
                     _user_values_to_draw.set(user_values_to_draw)
+                    # Running from a restored snapshot starts a new timeline, so snapshots after it are no longer valid
+                    history.discard_future()
+                    tick_time_limit = getattr(simulation, 'tick_time_limit', None)
+                    if tick_time_limit is not None and watchdog is None:
+                        # The watchdog is only imported when it is needed, because it uses ctypes
+                        from ._watchdog import _TickTimeout, _TickWatchdog
+                        watchdog = _TickWatchdog()
+                        tick_timeout = _TickTimeout
                     try:
-                        if simulation.real_time:
-                            # Tick with real-time delta
-                            tick_time = time.perf_counter()
-                            delta = min(tick_time - last_tick_time, 1.0)
-                            last_tick_time = tick_time
-                        else:
-                            # Tick with fixed delta to ensure that simulation is as deterministic as possible
-                            delta = DELTA
-                        simulation.tick(delta)
-                    except ValidationError as e:
-                        show_message(f"{e}", 'red')
-                        simulation_valid = False
-                    except CodeRunError as e:
-                        cause = e.__cause__ or e.__context__
-                        if cause is None:
-                            show_message(f"{e}: <unknown cause>", 'red')
-                        else:
-                            show_message(f"{e}: {type(cause).__name__}: {cause}", 'red')
+                        for i, delta in enumerate(deltas):
+                            if low_latency_input and i > 0 and (late_events := poll_input()):
+                                simulation.handle_input(late_events)
+                                input_batches.append((late_events, i))
+                            user_values_to_draw.clear()
+                            tick_start_time = time.perf_counter()
+                            input_latency.ticked(tick_start_time)
+                            if tick_time_limit is not None:
+                                watchdog_generation = watchdog.start(tick_time_limit) # type: ignore
+                                try:
+                                    simulation.tick(delta)
+                                finally:
+                                    watchdog.stop(watchdog_generation) # type: ignore
+                            else:
+                                simulation.tick(delta)
+                            tick_duration = time.perf_counter() - tick_start_time
+                            if telemetry is not None and user_values_to_draw:
+                                telemetry._record(simulated_time, user_values_to_draw)
+                            simulated_time += delta
+                            if tick_duration > delta:
+                                # Tick took longer than the simulated time it covers, so the simulation can't keep up with real time
+                                slow_tick_count += 1
+                                slowest_tick = max(slowest_tick, tick_duration)
+                    except (ValidationError, CodeRunError) as e:
+                        show_message(_error_message(e), 'red')
+                        if isinstance(e, CodeRunError) and (cause := e.__cause__ or e.__context__) is not None:
                             traceback.print_exception(cause)
                         simulation_valid = False
+                    except tick_timeout as e:
+                        # If the tick returned just after its deadline, the interrupt may have been raised inside `stop` before it disarmed the watchdog
+                        watchdog.stop(watchdog_generation) # type: ignore
+                        location = traceback.extract_tb(e.__traceback__)[-1]
+                        show_message(f"Tick was interrupted after exceeding time limit of {tick_time_limit} s: stuck at {os.path.basename(location.filename)}:{location.lineno} in {location.name}", 'red')
+                        traceback.print_exception(e)
+                        simulation_valid = False
                     _user_values_to_draw.set(None)
 
-            screen.fill('white')
-
-            simulation.draw(screen)
-
-            if paused:
-                paused_indicator_surface = variables_font.render('Paused', True, 'blue')
-                screen.blit(paused_indicator_surface, (screen.get_width() - paused_indicator_surface.get_width() - 5, 0))
-
-            # Output variable values
-            for i, (value, color) in enumerate(values_to_draw):
-                variables_text_surface = variables_font.render(value, True, color)
-                screen.blit(variables_text_surface, (5, i * 25))
-            user_values_start = len(values_to_draw) * 25 + 5
-            for i, value in enumerate(user_values_to_draw):
-                variables_text_surface = variables_font.render(value, True, 'black')
-                screen.blit(variables_text_surface, (5, user_values_start + i * 25))
-
-            if show_help:
-                controls = _CONTROLS if simulation.real_time is None else _CONTROLS_REAL_TIME
-                surfaces = [variables_font.render(text, True, 'black') for text in controls]
-                offset = screen.get_width() - 5 - max(surface.get_width() for surface in surfaces)
-                for i, surface in enumerate(surfaces):
-                    screen.blit(surface, (offset, i * 25))
-
-            if last_message_hide is None or pygame.time.get_ticks() < last_message_hide:
-                message_text_surface = variables_font.render(last_message, True, last_message_color)
-                screen.blit(message_text_surface, (5, screen.get_height() - 25))
-
-            pygame.display.flip()
+                    if simulation_valid and initial_snapshot is not None and not simulation.real_time \
+                            and simulated_time - (history.last_time() or 0.0) >= _SNAPSHOT_INTERVAL - 1e-9:
+                        history.push(simulated_time, _take_snapshot(simulation))
+                else:
+                    tick_accumulator = 0.0
+
+            # In real time mode with a custom tick rate the main loop runs faster than the frame rate, so only some iterations draw
+            draw_frame = pacer.period >= DELTA or start_time >= next_draw_time
+            if draw_frame and low_latency_input and simulation_valid and (late_events := poll_input()):
+                # Input that arrived during tick can still affect what is drawn (e.g. a cursor)
+                simulation.handle_input(late_events)
+                input_batches.append((late_events, len(deltas)))
+
+            if recorder is not None:
+                # Each batch of events is recorded as a separate frame, so that replay passes them to handle_input between the same ticks
+                for i, (batch_events, first_delta) in enumerate(input_batches):
+                    last_delta = input_batches[i + 1][1] if i + 1 < len(input_batches) else len(deltas)
+                    recorder.write_frame(restarted and i == 0, handled_input, batch_events, deltas[first_delta:last_delta])
+
+            if profiler is not None:
+                profiler.mark('tick')
+
+            if draw_frame:
+                next_draw_time = max(next_draw_time + DELTA, start_time + DELTA - pacer.period / 2)
+
+                dirty_rects_mode = getattr(simulation, 'use_dirty_rects', False)
+                if dirty_rects_mode:
+                    # Simulation draws on a persistent layer that is not cleared between frames. Only changed areas are copied to the screen.
+                    full_redraw = restarted or rewound or layer is None or layer.get_size() != screen.get_size()
+                    if full_redraw:
+                        layer = pygame.Surface(screen.get_size())
+                        layer.fill('white')
+                    dirty_rects = simulation.draw(layer) # type: ignore
+                    if full_redraw or dirty_rects is None:
+                        dirty_rects = [screen.get_rect()]
+                    else:
+                        dirty_rects = [pygame.Rect(rect) for rect in dirty_rects]
+                elif (render_state := _take_render_state(simulation)) is not None:
+                    # Pipelined rendering: the previous frame was drawn on the render thread while this frame was ticked
+                    layer = None
+                    if pipeline is None:
+                        pipeline = _RenderPipeline()
+                    # The previous frame is outdated after a restart or a jump in time, so wait for this frame instead
+                    rendered, rendered_values = pipeline.render(functools.partial(_draw_render_state, simulation, render_state), screen.get_size(), wait=restarted or rewound)
+                    screen.blit(rendered, (0, 0))
+                    if isinstance(simulation, _TiledSimulation):
+                        simulation.show_rendered_values(rendered_values, screen.get_size())
+                    else:
+                        simulation_values_to_draw.extend(rendered_values)
+                else:
+                    layer = None
+                    if pipeline is not None:
+                        pipeline.close()
+                        pipeline = None
+                    screen.fill('white')
+                    simulation.draw(screen)
+
+                if profiler is not None:
+                    profiler.mark('draw')
+
+                # Overlay is collected as a list of (surface, position) pairs, so that in dirty rect mode it can be redrawn only where needed
+                overlay = []
+
+                if paused:
+                    paused_text = 'Paused' if initial_snapshot is None else f'Paused at {simulated_time:.2f} s'
+                    paused_indicator_surface = text_cache.render(variables_font, paused_text, 'blue')
+                    overlay.append((paused_indicator_surface, (screen.get_width() - paused_indicator_surface.get_width() - 5, 0)))
+
+                # Output variable values
+                lines = values_to_draw + [(_format_value(label, value), color) for label, value, color in simulation_values_to_draw]
+                for i, (text, color) in enumerate(lines):
+                    overlay.append((text_cache.render(variables_font, text, color), (5, i * 25)))
+                user_values_start = len(lines) * 25 + 5
+                for i, (label, value) in enumerate(user_values_to_draw):
+                    overlay.append((text_cache.render(variables_font, _format_value(label, value), 'black'), (5, user_values_start + i * 25)))
+
+                if show_profiler and profiler is not None:
+                    histogram_top = user_values_start + len(user_values_to_draw) * 25 + 5
+                    bars = _histogram_bars(profiler.histogram())
+                    if bars != histogram_bars or histogram_surface is None:
+                        histogram_bars = bars
+                        histogram_surface = _render_histogram(bars)
+                    overlay.append((histogram_surface, (5, histogram_top)))
+
+                if isinstance(simulation, _TiledSimulation):
+                    # Text of all tiles is rendered here, so that it shares the text cache
+                    for text, color, position in simulation.overlay():
+                        overlay.append((text_cache.render(variables_font, text, color), position))
+
+                if show_help:
+                    controls = _CONTROLS if simulation.real_time is None else _CONTROLS_REAL_TIME
+                    surfaces = [text_cache.render(variables_font, text, 'black') for text in controls]
+                    offset = screen.get_width() - 5 - max(surface.get_width() for surface in surfaces)
+                    for i, surface in enumerate(surfaces):
+                        overlay.append((surface, (offset, i * 25)))
+
+                if last_message_hide is None or pygame.time.get_ticks() < last_message_hide:
+                    message_text_surface = text_cache.render(variables_font, last_message, last_message_color)
+                    overlay.append((message_text_surface, (5, screen.get_height() - 25)))
+
+                if layer is None:
+                    screen.blits(overlay, doreturn=False)
+                    if capture is not None:
+                        capture.capture(screen)
+                    if framebuffer is not None:
+                        framebuffer.publish(screen, user_values_to_draw)
+                    if profiler is not None:
+                        profiler.mark('overlay')
+                    pygame.display.flip()
+                    input_latency.flipped(time.perf_counter())
+                else:
+                    # Rendered text surfaces are cached, so overlay is unchanged if it consists of the same surfaces in the same positions
+                    overlay_key = [(id(surface), position) for surface, position in overlay]
+                    if overlay_key != last_overlay_key:
+                        # Overlay changed, so the previous overlay must be erased
+                        dirty_rects.extend(last_overlay_rects)
+                        last_overlay_key = overlay_key
+                        last_overlay_rects = [surface.get_rect(topleft=position) for surface, position in overlay]
+                        dirty_rects.extend(last_overlay_rects)
+                    for rect in dirty_rects:
+                        screen.blit(layer, rect, rect)
+                    screen.blits([
+                        (surface, rect) for (surface, _), rect in zip(overlay, last_overlay_rects)
+                        if rect.collidelist(dirty_rects) != -1
+                    ], doreturn=False)
+                    if capture is not None:
+                        capture.capture(screen)
+                    if framebuffer is not None:
+                        framebuffer.publish(screen, user_values_to_draw)
+                    if profiler is not None:
+                        profiler.mark('overlay')
+                    pygame.display.update(dirty_rects)
+                    input_latency.flipped(time.perf_counter())
+
+                if profiler is not None:
+                    profiler.mark('flip')
 
             _values_to_draw.set(None)
 
-            last_frame_time = time.perf_counter() - start_time
+            if draw_frame:
+                last_frame_time = time.perf_counter() - start_time
+                # Only used to measure frame rate, pacing is done by the pacer
+                clock.tick()
+
+            if sleep:
+                pacer.sleep()
 
-            clock.tick(TPS if sleep else 0)
+            if profiler is not None:
+                profiler.mark('sleep')
+                profiler.end_frame()
 
-            yield
+            yield pacer
     except Exception as e:
         print("Unexpected error while running visualization:", file=sys.stderr)
         traceback.print_exception(e)
     finally:
+        if profiler is not None:
+            _set_active_profiler(None)
+        # Each step runs even if an earlier one fails (e.g. with an I/O error), so that the window is always closed and `run` can open a new one
+        for close in [
+            recorder.close if recorder is not None else None,
+            profiler.write_trace if profiler is not None else None,
+            capture.close if capture is not None else None,
+            watchdog.close if watchdog is not None else None,
+            pipeline.close if pipeline is not None else None,
+        ]:
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print("Unexpected error while closing visualization:", file=sys.stderr)
+                traceback.print_exception(e)
+        _timing = None
+        _window_telemetry = None
         try:
             # TODO: Apparently pygame.quit() here causes Python to deadlock/freeze on MacOS.
             # Does using pygame.display.quit() fix the issue? If not, try to figure out why this happens and fix it.
@@ -329,3 +835,6 @@ def _mainloop(sleep: bool):
             with _lock:
                 _initialized = False
                 _parent_header = None
+
+# Start loading fonts as soon as the package is imported, so that they are ready by the time the first window opens
+threading.Thread(target=_prewarm, name='exerciser-prewarm', daemon=True).start()
@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+import itertools
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+import pygame
+from ._shared import CodeRunError, Simulation, ValidationError, _is_batch_simulation
+from ._capture import FrameCapture
+from ._execute_gui import _current_telemetry, _error_message, _tick_delta, _user_values_to_draw
+from ._telemetry import Telemetry, _format_value, _telemetry_for
+
+if TYPE_CHECKING:
+    import numpy as np
+
+@dataclass
+class HeadlessResult:
+    """Outcome of running a simulation with `run_headless`."""
+
+    simulation: Simulation
+    """The simulation object in its final state."""
+    ticks: int
+    """Number of calls to `tick` that completed successfully."""
+    time: float
+    """Simulated time in seconds (sum of deltas passed to successful calls to `tick`)."""
+    values: list[str] = field(default_factory=list)
+    """Values shown with `show_value` during the last call to `tick`, formatted the same way as in the window."""
+    error: str | None = None
+    """Error message that would have been shown on screen, if `tick` raised `ValidationError` or `CodeRunError`."""
+    exception: ValidationError | CodeRunError | None = None
+    """The exception that stopped the simulation, if any."""
+    surface: pygame.Surface | None = None
+    """Offscreen surface with the most recently drawn frame, if drawing was enabled."""
+    scores: 'np.ndarray | None' = None
+    """Final score of each instance, if the simulation is a `BatchSimulation`."""
+    telemetry: Telemetry | None = None
+    """History of all values shown with `show_value` (created automatically unless the simulation disabled it using `telemetry_history`)."""
+
+    def __post_init__(self):
+        if self.telemetry is None:
+            self.telemetry = _telemetry_for(self.simulation)
+
+    @property
+    def series(self) -> dict[str, list[tuple[float, Any]]]:
+        """All values shown with `show_value`, as `(time, value)` pairs grouped by label. `time` is the simulated time at the start of the tick."""
+        if self.telemetry is None:
+            return {}
+        return {label: self.telemetry.series(label) for label in self.telemetry.labels}
+
+def run_headless(create_simulation: Callable[[], Simulation], *, duration: float,
+                 draw_every: int | None = None, on_draw: Callable[[pygame.Surface], None] | None = None,
+                 capture: FrameCapture | None = None) -> HeadlessResult:
+    """
+    Calls `create_simulation` to create a simulation object and runs it for `duration` seconds of simulated time without opening a window.
+    Ticks are run back to back with a fixed delta (`1 / simulation.tick_rate` if specified, otherwise `DELTA`), as fast as possible.
+
+    If `tick` raises `ValidationError` or `CodeRunError`, the simulation is stopped and the error is stored in the returned result.
+    Other exceptions are propagated to the caller. `handle_input` is never called.
+
+    For a `BatchSimulation`, the final score of every instance is stored in `scores` (e.g. `result.simulation.best(10)` gives the 10 best instances).
+
+    Args:
+        duration: simulated time to run for, in seconds
+        draw_every: if set, `draw` is called on an offscreen surface after every `draw_every` ticks (and after the last tick)
+        on_draw: called with the offscreen surface after each draw
+        capture: if set, each drawn frame is captured (`draw_every` defaults to 1 if not specified). The capture is closed when the run finishes.
+    """
+    if draw_every is not None and draw_every < 1:
+        raise ValueError("draw_every must be a positive integer")
+
+    if capture is not None:
+        if draw_every is None:
+            draw_every = 1
+        user_on_draw = on_draw
+        def on_draw(surface: pygame.Surface):
+            capture.capture(surface)
+            if user_on_draw is not None:
+                user_on_draw(surface)
+
+    try:
+        simulation = create_simulation()
+        if simulation.real_time:
+            raise ValueError("Real time simulations cannot be run headless")
+
+        result = HeadlessResult(simulation, 0, 0.0)
+        _run_ticks(result, duration, draw_every, on_draw)
+        if _is_batch_simulation(simulation):
+            import numpy as np
+            result.scores = np.asarray(simulation.score(), dtype=float) # type: ignore
+    finally:
+        if capture is not None:
+            capture.close()
+    return result
+
+def _run_ticks(result: HeadlessResult, duration: float,
+               draw_every: int | None = None, on_draw: Callable[[pygame.Surface], None] | None = None):
+    """Runs the simulation in `result`, updating `result` as it goes (so progress is preserved even if `tick` raises an unexpected exception)"""
+    simulation = result.simulation
+    delta = _tick_delta(simulation)
+    tick_count = round(duration / delta)
+
+    if draw_every is None:
+        _run_deltas(result, itertools.repeat(delta, tick_count))
+        return
+
+    pygame.font.init()
+    surface = pygame.Surface(simulation.initial_window_size)
+    result.surface = surface
+    ticks_done = 0
+    while ticks_done < tick_count:
+        chunk_size = min(draw_every, tick_count - ticks_done)
+        running = _run_deltas(result, itertools.repeat(delta, chunk_size))
+        ticks_done += chunk_size
+        # If the simulation was stopped, this draws its final state, like the window would
+        _draw(result, surface, on_draw)
+        if not running:
+            break
+
+def _run_deltas(result: HeadlessResult, deltas: Iterable[float]) -> bool:
+    """Calls `tick` once for each delta, updating `result` as it goes. Returns False if the simulation has been stopped by `ValidationError` or `CodeRunError`."""
+    if result.exception is not None:
+        return False
+    simulation = result.simulation
+    telemetry = result.telemetry
+    # Values are kept as raw (label, value) pairs and only the values of the last tick are formatted
+    user_values: list[tuple[str, Any]] = []
+    user_values_token = _user_values_to_draw.set(user_values)
+    telemetry_token = _current_telemetry.set(telemetry)
+    ticked = False
+    try:
+        for delta in deltas:
+            user_values.clear()
+            ticked = True
+            try:
+                simulation.tick(delta)
+            except (ValidationError, CodeRunError) as e:
+                result.error = _error_message(e)
+                result.exception = e
+                return False
+            if telemetry is not None and user_values:
+                telemetry._record(result.time, user_values)
+            result.ticks += 1
+            result.time += delta
+    finally:
+        _user_values_to_draw.reset(user_values_token)
+        _current_telemetry.reset(telemetry_token)
+        # Recordings can contain frames without ticks (input handled just before drawing), which keep the values of the previous tick
+        if ticked:
+            result.values = [_format_value(label, value) for label, value in user_values]
+    return True
+
+def _draw(result: HeadlessResult, surface: pygame.Surface, on_draw: Callable[[pygame.Surface], None] | None):
+    surface.fill('white')
+    telemetry_token = _current_telemetry.set(result.telemetry)
+    try:
+        result.simulation.draw(surface)
+    finally:
+        _current_telemetry.reset(telemetry_token)
+    if on_draw is not None:
+        on_draw(surface)
@@ -0,0 +1,290 @@
+import marshal
+import multiprocessing
+import multiprocessing.connection
+import os
+import struct
+import sys
+from typing import TYPE_CHECKING, Any, Callable
+import pygame
+from ._shared import Simulation
+from ._recording import _decode_events, _encode_events
+from ._telemetry import _format_value
+from . import _execute_gui
+
+if TYPE_CHECKING:
+    from multiprocessing.shared_memory import SharedMemory
+    import numpy as np
+
+# Shared framebuffer layout:
+# The shared memory starts with a header (_HEADER) containing the number of the frame being written and the number of the last completed frame,
+# followed by two slots. Frame n is written to slot n % 2, so the last completed frame can be read while the next frame is being written.
+# Each slot starts with the length of the encoded values (_VALUES_LENGTH), followed by the values shown using `show_value` (marshaled list of strings)
+# and the pixels of the frame (RGBX, one row after another).
+
+_HEADER = struct.Struct('<QQ')
+_VALUES_LENGTH = struct.Struct('<I')
+_VALUES_OFFSET = 64
+_VALUES_CAPACITY = 64 * 1024
+"""Maximum size in bytes of the encoded values in a slot (values that don't fit are left out)"""
+_PIXELS_OFFSET = _VALUES_OFFSET + _VALUES_CAPACITY
+
+_FORWARDED_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL)
+"""Events forwarded to the simulation process by `SimulationProcess.show`"""
+
+def _slot_size(size: tuple[int, int]) -> int:
+    return _PIXELS_OFFSET + size[0] * size[1] * 4
+
+def _slot_offset(size: tuple[int, int], slot: int) -> int:
+    return _HEADER.size + (-_HEADER.size % 64) + slot * _slot_size(size)
+
+class SimulationProcess:
+    """
+    Simulation running in a separate process, started using `run_process`.
+
+    The simulation runs in the child process exactly like in a window (including the overlay and keyboard controls), but frames are published
+    through shared memory instead of being shown on screen. Use `show` to display the frames in a window in this process, or `frame` to get the latest frame
+    (e.g. to show it in a notebook widget). Input is sent to the simulation using `send_events`.
+
+    Use as a context manager or call `stop` to stop the simulation and release the shared memory.
+    """
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, connection: multiprocessing.connection.Connection,
+                 memory: 'SharedMemory', name: str, size: tuple[int, int]):
+        self._process = process
+        self._connection = connection
+        self._memory = memory
+        self.name = name
+        """Name of the simulation"""
+        self.size = size
+        """Size of the frames in pixels"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """Whether the simulation process is still running"""
+        return self._process.is_alive()
+
+    @property
+    def frame_number(self) -> int:
+        """Number of frames published so far (changes whenever a new frame is available)"""
+        if self._memory is None:
+            return 0
+        return _HEADER.unpack_from(self._memory.buf, 0)[1]
+
+    def frame(self) -> 'np.ndarray | None':
+        """Returns a copy of the latest frame as an RGB array of shape `(height, width, 3)`, or None if no frame has been published yet"""
+        import numpy as np
+        width, height = self.size
+        def read(slot: int) -> np.ndarray:
+            offset = _slot_offset(self.size, slot)
+            pixels = np.frombuffer(self._memory.buf, dtype=np.uint8, count=width * height * 4, offset=offset + _PIXELS_OFFSET) # type: ignore
+            return pixels.reshape(height, width, 4)[:, :, :3].copy()
+        return self._read(read)
+
+    @property
+    def values(self) -> list[str]:
+        """Values shown using `show_value` during the latest frame, formatted the same way as on screen"""
+        def read(slot: int) -> list[str]:
+            offset = _slot_offset(self.size, slot)
+            length, = _VALUES_LENGTH.unpack_from(self._memory.buf, offset) # type: ignore
+            return marshal.loads(self._memory.buf[offset + _VALUES_OFFSET:offset + _VALUES_OFFSET + length]) # type: ignore
+        return self._read(read) or []
+
+    def send_events(self, events: list[pygame.event.Event]):
+        """Sends events to the simulation. They are handled the same way as input in a window (including keyboard controls such as R and P)."""
+        if events and self._connection is not None:
+            try:
+                self._connection.send_bytes(_encode_events(events))
+            except (BrokenPipeError, OSError):
+                # Simulation process has already stopped
+                pass
+
+    def restart(self):
+        """Restarts the simulation (same as pressing R)"""
+        self.send_events([pygame.event.Event(pygame.KEYDOWN, key=pygame.K_r, mod=0, unicode='r', scancode=0)])
+
+    def toggle_pause(self):
+        """Pauses or resumes the simulation (same as pressing P)"""
+        self.send_events([pygame.event.Event(pygame.KEYDOWN, key=pygame.K_p, mod=0, unicode='p', scancode=0)])
+
+    def show(self):
+        """
+        Shows the frames of the simulation in a window in this process and forwards input from the window to the simulation.
+        Blocks until the window is closed (which stops the simulation) or the simulation process stops.
+        """
+        pygame.display.init()
+        screen = pygame.display.set_mode(self.size)
+        pygame.display.set_caption(self.name)
+        # Surfaces that use the slots of the shared memory as pixel data, so frames are shown without copying them into intermediate buffers
+        sources = [pygame.image.frombuffer(self._memory.buf[offset + _PIXELS_OFFSET:offset + _slot_size(self.size)], self.size, 'RGBX') # type: ignore
+                   for offset in (_slot_offset(self.size, 0), _slot_offset(self.size, 1))]
+        clock = pygame.time.Clock()
+        last_frame_number = 0
+        closed = False
+        try:
+            while self.running:
+                events = pygame.event.get()
+                if any(event.type == pygame.QUIT for event in events):
+                    closed = True
+                    break
+                self.send_events([event for event in events if event.type in _FORWARDED_EVENTS])
+                frame_number = self.frame_number
+                if frame_number != last_frame_number:
+                    last_frame_number = frame_number
+                    self._read(lambda slot: screen.blit(sources[slot], (0, 0)))
+                    pygame.display.flip()
+                clock.tick(_execute_gui.TPS)
+        finally:
+            # The shared memory can't be released while surfaces use it
+            del sources
+            pygame.display.quit()
+        if closed:
+            self.stop()
+
+    def stop(self, timeout: float = 5.0):
+        """Stops the simulation process (killing it if it doesn't stop within `timeout` seconds) and releases the shared memory"""
+        self.send_events([pygame.event.Event(pygame.QUIT)])
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None # type: ignore
+
+    def _read(self, read_slot: Callable[[int], Any]) -> Any:
+        """Calls `read_slot` with the index of the slot containing the latest frame. Retries if the slot was overwritten while reading it."""
+        if self._memory is None:
+            return None
+        while True:
+            _, frame_number = _HEADER.unpack_from(self._memory.buf, 0)
+            if frame_number == 0:
+                return None
+            result = read_slot(frame_number % 2)
+            writing, _ = _HEADER.unpack_from(self._memory.buf, 0)
+            # The slot is only reused for frame `frame_number + 2`, so the result is consistent unless that frame has been started
+            if writing <= frame_number + 1:
+                return result
+
+def run_process(create_simulation: Callable[[], Simulation], *, timeout: float | None = None) -> SimulationProcess:
+    """
+    Runs the simulation returned by `create_simulation` in a separate process and returns a handle for viewing and controlling it.
+
+    The simulation and its rendering run on a separate core and don't compete with this process (e.g. a Jupyter kernel) for the GIL.
+    Frames are published through shared memory, so they can be shown without encoding them (see `SimulationProcess`).
+    Output of the simulation process (e.g. error messages) is written to the standard output and error of this process's terminal, not to a notebook.
+
+    Note: `create_simulation` is sent to the new process, so it must be picklable (e.g. a module-level function or class, but not a lambda).
+    Resizing is not supported; frames always have the size given by `initial_window_size`.
+
+    Args:
+        timeout: maximum time in seconds to wait for the simulation to be created and the first frame to be drawn (None waits indefinitely)
+    """
+    # Note: Forking a process that has initialized SDL (or has background threads holding locks) is unsafe, so the child is always spawned
+    context = multiprocessing.get_context('spawn')
+    connection, child_connection = context.Pipe()
+    process = context.Process(target=_process_main, args=(create_simulation, child_connection), name='exerciser-simulation', daemon=True)
+    process.start()
+    child_connection.close()
+
+    ready = multiprocessing.connection.wait([connection, process.sentinel], timeout)
+    message = connection.recv() if connection in ready and connection.poll() else None
+    if message is None or message[0] != 'size':
+        process.kill()
+        process.join()
+        connection.close()
+        if message is None and not ready:
+            raise TimeoutError("Simulation process did not draw the first frame in time")
+        raise RuntimeError("Simulation process stopped before drawing the first frame (see its output for details)")
+    _, name, size = message
+    # Note: Imported here, because importing shared_memory noticeably increases the import time of exerciser
+    from multiprocessing.shared_memory import SharedMemory
+    memory = SharedMemory(create=True, size=_slot_offset(size, 2))
+    _HEADER.pack_into(memory.buf, 0, 0, 0)
+    connection.send(('framebuffer', memory.name))
+    return SimulationProcess(process, connection, memory, name, size)
+
+class _FramebufferWriter:
+    """Publishes frames drawn by the main loop in the simulation process into shared memory created by the parent process"""
+
+    def __init__(self, connection: multiprocessing.connection.Connection):
+        self._connection = connection
+        self._memory: 'SharedMemory | None' = None
+        self._size = (0, 0)
+        self._targets: list[pygame.Surface] = []
+        self._frame_number = 0
+
+    def publish(self, screen: pygame.Surface, values: list[tuple[str, Any]]):
+        if self._memory is None:
+            self._open(screen.get_size())
+        memory = self._memory
+        assert memory is not None
+        frame_number = self._frame_number + 1
+        offset = _slot_offset(self._size, frame_number % 2)
+        _HEADER.pack_into(memory.buf, 0, frame_number, self._frame_number)
+
+        self._targets[frame_number % 2].blit(screen, (0, 0))
+        lines = [_format_value(label, value) for label, value in values]
+        data = marshal.dumps(lines)
+        while len(data) > _VALUES_CAPACITY:
+            lines.pop()
+            data = marshal.dumps(lines)
+        _VALUES_LENGTH.pack_into(memory.buf, offset, len(data))
+        memory.buf[offset + _VALUES_OFFSET:offset + _VALUES_OFFSET + len(data)] = data
+
+        _HEADER.pack_into(memory.buf, 0, frame_number, frame_number)
+        self._frame_number = frame_number
+
+    def close(self):
+        self._targets.clear()
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def _open(self, size: tuple[int, int]):
+        self._connection.send(('size', pygame.display.get_caption()[0], size))
+        _, name = self._connection.recv()
+        from multiprocessing.shared_memory import SharedMemory
+        self._memory = SharedMemory(name)
+        self._size = size
+        # Surfaces that use the slots as pixel data, so publishing a frame is a single blit
+        self._targets = [
+            pygame.image.frombuffer(self._memory.buf[offset + _PIXELS_OFFSET:offset + _slot_size(size)], size, 'RGBX')
+            for offset in (_slot_offset(size, 0), _slot_offset(size, 1))
+        ]
+
+def _process_main(create_simulation: Callable[[], Simulation], connection: multiprocessing.connection.Connection):
+    # The window is never shown, frames are published to the parent process instead
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    framebuffer = _FramebufferWriter(connection)
+    _execute_gui._create_simulation = create_simulation
+    _execute_gui._recreate_simulation = True
+    _execute_gui._initialized = True
+    _execute_gui._framebuffer = framebuffer
+    try:
+        for _ in _execute_gui._mainloop(sleep=True):
+            try:
+                while connection.poll():
+                    for event in _decode_events(connection.recv_bytes()):
+                        pygame.event.post(event)
+            except (EOFError, OSError):
+                # Parent process has exited or stopped the simulation
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+    finally:
+        framebuffer.close()
+        try:
+            connection.send(('stopped',))
+        except (BrokenPipeError, OSError):
+            pass
+        sys.stdout.flush()
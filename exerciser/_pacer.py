@@ -0,0 +1,285 @@
+from collections import deque
+from dataclasses import dataclass
+import math
+import threading
+import time
+from typing import Literal
+import pygame
+
+_INITIAL_SPIN_TIME = 0.001
+"""Time in seconds before a deadline at which the pacer stops sleeping and starts spin-waiting (grows automatically if sleeping overshoots and decays back after on-time wakeups)"""
+
+_TIMING_HISTORY = 4096
+"""Number of most recent samples kept for percentiles"""
+
+_INPUT_EVENT_TYPES = (
+    pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL,
+    pygame.JOYAXISMOTION, pygame.JOYHATMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP,
+    pygame.CONTROLLERAXISMOTION, pygame.CONTROLLERBUTTONDOWN, pygame.CONTROLLERBUTTONUP,
+    pygame.FINGERDOWN, pygame.FINGERUP, pygame.FINGERMOTION,
+)
+"""Events that count as user input (for input latency and for polling input late in low latency mode)"""
+
+@dataclass
+class TimingStats:
+    """
+    Pacing statistics of the simulation running in the window, as returned by `timing_stats`.
+
+    Lateness is how long after its scheduled time an iteration of the main loop started (in real time mode each iteration calls `tick` once).
+    A simulation ran at a stable rate if `deadline_misses`, `overruns` and `clamped_deltas` are all 0.
+    """
+
+    target_rate: float
+    """Target number of main loop iterations per second (`tick_rate` in real time mode if specified, otherwise `TPS`)."""
+    tolerance: float
+    """Lateness in seconds above which an iteration counts as a deadline miss (`Simulation.timing_tolerance`)."""
+    iterations: int
+    """Number of paced iterations since the simulation was (re)started."""
+    deadline_misses: int
+    """Number of iterations that started later than `tolerance` after their scheduled time."""
+    overruns: int
+    """Number of iterations whose work took longer than the target period, so the next iteration could not start on time."""
+    clamped_deltas: int
+    """Number of real-time deltas that were clamped to 1 second before being passed to `tick`."""
+    lateness_p50: float
+    lateness_p99: float
+    lateness_max: float
+    """Maximum lateness since the simulation was (re)started. Percentiles only cover the most recent iterations."""
+    delta_mean: float | None
+    """Mean of the deltas passed to `tick` in real time mode (None if not in real time mode)."""
+    delta_jitter: float | None
+    """Standard deviation of the deltas passed to `tick` in real time mode (None if not in real time mode)."""
+    lateness: list[float]
+    """Lateness of the most recent iterations, oldest first."""
+    deltas: list[float]
+    """Most recent deltas passed to `tick` in real time mode, oldest first."""
+    input_events: int
+    """Number of input events (keys, mouse, controllers, touch) whose latency was measured since the simulation was (re)started."""
+    input_to_tick_p50: float | None
+    input_to_tick_p99: float | None
+    """Time from input events arriving to the start of the first `tick` after they were passed to `handle_input` (None if no event was followed by a tick)."""
+    input_to_flip_p50: float | None
+    input_to_flip_p99: float | None
+    """Time from input events arriving to the first frame after they were passed to `handle_input` being shown on screen (None if there were no input events)."""
+    input_timestamps: Literal['sdl', 'poll']
+    """
+    Source of the arrival times of input events. `'sdl'` uses the timestamps SDL assigns to events.
+    `'poll'` uses the time events were polled by the main loop (if SDL timestamps are not available), so the time events waited in the queue is not included.
+    """
+    input_to_tick: list[float]
+    """Most recent input to tick latencies, oldest first."""
+    input_to_flip: list[float]
+    """Most recent input to flip latencies, oldest first."""
+
+class _TimingTelemetry:
+    """Collects lateness of paced iterations and real-time deltas. Safe to read from other threads."""
+
+    def __init__(self, target_rate: float, tolerance: float):
+        self._lock = threading.Lock()
+        self._lateness: deque[float] = deque(maxlen=_TIMING_HISTORY)
+        self._deltas: deque[float] = deque(maxlen=_TIMING_HISTORY)
+        self._input_to_tick: deque[float] = deque(maxlen=_TIMING_HISTORY)
+        self._input_to_flip: deque[float] = deque(maxlen=_TIMING_HISTORY)
+        self.reset(target_rate, tolerance)
+
+    def reset(self, target_rate: float, tolerance: float):
+        with self._lock:
+            self.target_rate = target_rate
+            self.tolerance = tolerance
+            self._lateness.clear()
+            self._deltas.clear()
+            self._input_to_tick.clear()
+            self._input_to_flip.clear()
+            self._input_events = 0
+            self._input_timestamps: Literal['sdl', 'poll'] = 'poll'
+            self._iterations = 0
+            self._deadline_misses = 0
+            self._overruns = 0
+            self._clamped_deltas = 0
+            self._lateness_max = 0.0
+            self._delta_count = 0
+            self._delta_sum = 0.0
+            self._delta_square_sum = 0.0
+
+    def record_iteration(self, lateness: float, overrun: bool):
+        with self._lock:
+            self._lateness.append(lateness)
+            self._iterations += 1
+            if lateness > self.tolerance:
+                self._deadline_misses += 1
+            if overrun:
+                self._overruns += 1
+            self._lateness_max = max(self._lateness_max, lateness)
+
+    def record_delta(self, delta: float, clamped: bool):
+        with self._lock:
+            self._deltas.append(delta)
+            self._delta_count += 1
+            self._delta_sum += delta
+            self._delta_square_sum += delta * delta
+            if clamped:
+                self._clamped_deltas += 1
+
+    def record_input(self, to_tick: float | None, to_flip: float, from_sdl: bool):
+        with self._lock:
+            if to_tick is not None:
+                self._input_to_tick.append(to_tick)
+            self._input_to_flip.append(to_flip)
+            self._input_events += 1
+            if from_sdl:
+                self._input_timestamps = 'sdl'
+
+    def stats(self) -> TimingStats:
+        with self._lock:
+            lateness = list(self._lateness)
+            deltas = list(self._deltas)
+            input_to_tick = list(self._input_to_tick)
+            input_to_flip = list(self._input_to_flip)
+            delta_mean = delta_jitter = None
+            if self._delta_count > 0:
+                delta_mean = self._delta_sum / self._delta_count
+                delta_jitter = math.sqrt(max(self._delta_square_sum / self._delta_count - delta_mean * delta_mean, 0.0))
+            sorted_lateness = sorted(lateness) or [0.0]
+            sorted_input_to_tick = sorted(input_to_tick)
+            sorted_input_to_flip = sorted(input_to_flip)
+            return TimingStats(
+                target_rate=self.target_rate, tolerance=self.tolerance, iterations=self._iterations,
+                deadline_misses=self._deadline_misses, overruns=self._overruns, clamped_deltas=self._clamped_deltas,
+                lateness_p50=_percentile(sorted_lateness, 0.5),
+                lateness_p99=_percentile(sorted_lateness, 0.99),
+                lateness_max=self._lateness_max,
+                delta_mean=delta_mean, delta_jitter=delta_jitter,
+                lateness=lateness, deltas=deltas,
+                input_events=self._input_events,
+                input_to_tick_p50=_percentile(sorted_input_to_tick, 0.5) if sorted_input_to_tick else None,
+                input_to_tick_p99=_percentile(sorted_input_to_tick, 0.99) if sorted_input_to_tick else None,
+                input_to_flip_p50=_percentile(sorted_input_to_flip, 0.5) if sorted_input_to_flip else None,
+                input_to_flip_p99=_percentile(sorted_input_to_flip, 0.99) if sorted_input_to_flip else None,
+                input_timestamps=self._input_timestamps,
+                input_to_tick=input_to_tick, input_to_flip=input_to_flip,
+            )
+
+    def summary(self) -> list[str]:
+        """Pacing statistics formatted for the overlay"""
+        stats = self.stats()
+        lines = [
+            f"Pacing: {stats.target_rate:g} Hz, Late p50 / p99 / max: {stats.lateness_p50 * 1000:.2f} / {stats.lateness_p99 * 1000:.2f} / {stats.lateness_max * 1000:.2f} ms",
+            f"Deadline misses: {stats.deadline_misses}, Overruns: {stats.overruns}, Clamped deltas: {stats.clamped_deltas}",
+        ]
+        if stats.delta_mean is not None and stats.delta_jitter is not None:
+            lines.append(f"Delta: {stats.delta_mean * 1000:.3f} ms, Jitter: {stats.delta_jitter * 1000:.3f} ms")
+        if stats.input_to_flip_p50 is not None and stats.input_to_flip_p99 is not None:
+            to_tick = f"{stats.input_to_tick_p50 * 1000:.1f} / {stats.input_to_tick_p99 * 1000:.1f}" if stats.input_to_tick_p50 is not None and stats.input_to_tick_p99 is not None else "-"
+            lines.append(f"Input to tick p50 / p99: {to_tick} ms, to flip: {stats.input_to_flip_p50 * 1000:.1f} / {stats.input_to_flip_p99 * 1000:.1f} ms ({stats.input_timestamps} timestamps)")
+        return lines
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+class _InputLatencyTracker:
+    """
+    Follows input events from when they arrived, through the first tick after they were passed to `handle_input`, to the first flip after that.
+
+    SDL event timestamps are used as arrival times if Pygame exposes them (as `event.timestamp`, in milliseconds since SDL was initialized).
+    Otherwise the time the events were polled is used.
+    """
+
+    def __init__(self, telemetry: _TimingTelemetry):
+        self.telemetry = telemetry
+        # Offset between SDL ticks and `time.perf_counter`, for converting SDL timestamps
+        self._sdl_epoch = time.perf_counter() - pygame.time.get_ticks() / 1000
+        self._waiting_for_tick: list[tuple[float, bool]] = []
+        self._waiting_for_flip: list[tuple[float, float | None, bool]] = []
+
+    def handled(self, events: list[pygame.event.Event], poll_time: float):
+        """Call after passing `events` (polled at `poll_time`) to `handle_input`"""
+        for event in events:
+            if event.type in _INPUT_EVENT_TYPES:
+                timestamp = getattr(event, 'timestamp', None)
+                if isinstance(timestamp, (int, float)) and timestamp > 0:
+                    self._waiting_for_tick.append((self._sdl_epoch + timestamp / 1000, True))
+                else:
+                    self._waiting_for_tick.append((poll_time, False))
+
+    def ticked(self, tick_time: float):
+        """Call when `tick` starts"""
+        if self._waiting_for_tick:
+            self._waiting_for_flip.extend((arrival_time, tick_time - arrival_time, from_sdl) for arrival_time, from_sdl in self._waiting_for_tick)
+            self._waiting_for_tick.clear()
+
+    def flipped(self, flip_time: float):
+        """Call when a frame has been shown on screen"""
+        for arrival_time, to_tick, from_sdl in self._waiting_for_flip:
+            self.telemetry.record_input(to_tick, flip_time - arrival_time, from_sdl)
+        # Events that were handled while paused never reach a tick
+        for arrival_time, from_sdl in self._waiting_for_tick:
+            self.telemetry.record_input(None, flip_time - arrival_time, from_sdl)
+        self._waiting_for_flip.clear()
+        self._waiting_for_tick.clear()
+
+    def clear(self):
+        self._waiting_for_tick.clear()
+        self._waiting_for_flip.clear()
+
+class _FramePacer:
+    """
+    Paces iterations of the main loop to a fixed period on an absolute schedule (so errors don't accumulate).
+
+    If `spin` is true (used in real time mode), sleeps coarsely until shortly before the deadline and then spin-waits for the rest,
+    because `time.sleep` (and `pygame.time.Clock.tick`) can overshoot by a millisecond or more. Otherwise only sleeps, to avoid burning CPU.
+    """
+
+    def __init__(self, period: float, telemetry: _TimingTelemetry | None = None, spin: bool = False):
+        self.period = period
+        self.telemetry = telemetry
+        self.spin = spin
+        self.deadline = time.perf_counter()
+        self._spin_time = _INITIAL_SPIN_TIME
+
+    def reset(self, period: float, spin: bool = False):
+        """Changes the period and starts a new schedule from the current time"""
+        self.period = period
+        self.spin = spin
+        self.deadline = time.perf_counter()
+        self._spin_time = _INITIAL_SPIN_TIME
+
+    def sleep(self):
+        """Waits until the next deadline"""
+        overrun, coarse_time = self._start_wait(self.spin)
+        if coarse_time > 0:
+            time.sleep(coarse_time)
+        self._finish_wait(overrun, self.spin)
+
+    async def sleep_async(self):
+        """
+        Same as `sleep`, but waits with `asyncio.sleep`, so other tasks can run in the meantime.
+        Never spin-waits, because that would block the event loop (e.g. the main thread of a Jupyter kernel).
+        """
+        import asyncio
+        overrun, coarse_time = self._start_wait(False)
+        await asyncio.sleep(max(coarse_time, 0))
+        self._finish_wait(overrun, False)
+
+    def _start_wait(self, spin: bool) -> tuple[bool, float]:
+        self.deadline += self.period
+        remaining = self.deadline - time.perf_counter()
+        return remaining < 0, remaining - (self._spin_time if spin else 0.0)
+
+    def _finish_wait(self, overrun: bool, spin: bool):
+        deadline = self.deadline
+        now = time.perf_counter()
+        if spin and not overrun:
+            if now > deadline:
+                # Coarse sleep overshot the deadline, so start spinning earlier next time
+                self._spin_time = min(self._spin_time * 1.5, self.period / 2)
+            else:
+                # Woke up in time, so slowly go back to spinning for less time
+                self._spin_time = max(self._spin_time * 0.95, _INITIAL_SPIN_TIME)
+            while now < deadline:
+                now = time.perf_counter()
+        lateness = now - deadline
+        if lateness > self.period:
+            # Missed at least one whole period, so start a new schedule instead of running several iterations back to back to catch up
+            self.deadline = now
+        if self.telemetry is not None:
+            self.telemetry.record_iteration(lateness, overrun)
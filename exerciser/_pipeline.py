@@ -0,0 +1,76 @@
+import queue
+import threading
+from typing import Any, Callable
+import pygame
+
+# Draws a frame on the given surface and returns the values shown with show_simulation_value while drawing
+_DrawFunction = Callable[[pygame.Surface], list]
+
+class _RenderPipeline:
+    """
+    Draws frames on a dedicated render thread, so that drawing frame N overlaps with ticking frame N + 1 on the main loop thread.
+
+    Frames are drawn into two off-screen surfaces in turn, so the main loop can show one frame while the next one is drawn into the other surface.
+    At most one frame is in flight at a time.
+    Note: Drawing and ticking only run in parallel on free-threaded Python (or if they release the GIL, e.g. in NumPy or Pygame drawing functions).
+    """
+
+    def __init__(self):
+        self._jobs: queue.Queue[tuple[_DrawFunction, pygame.Surface] | None] = queue.Queue(1)
+        self._results: queue.Queue[tuple[pygame.Surface, list, BaseException | None]] = queue.Queue(1)
+        self._surfaces: list[pygame.Surface | None] = [None, None]
+        self._next_surface = 0
+        self._in_flight = False
+        self._last: tuple[pygame.Surface, list[Any]] | None = None
+        self._thread = threading.Thread(target=self._run, name='exerciser-render', daemon=True)
+        self._thread.start()
+
+    def render(self, draw: _DrawFunction, size: tuple[int, int], wait: bool = False) -> tuple[pygame.Surface, list[Any]]:
+        """
+        Starts drawing a frame of the given size on the render thread and returns the previous frame (its surface and values),
+        which was drawn while the main loop ticked this frame. If `wait` is true or there is no previous frame of the same size, waits for the new frame and returns it instead.
+
+        Exceptions raised while drawing are re-raised here.
+        """
+        previous = self._take() if self._in_flight else self._last
+        surface = self._surfaces[self._next_surface]
+        if surface is None or surface.get_size() != size:
+            surface = self._surfaces[self._next_surface] = pygame.Surface(size)
+        self._next_surface = 1 - self._next_surface
+        self._in_flight = True
+        self._jobs.put((draw, surface))
+        if wait or previous is None or previous[0].get_size() != size:
+            previous = self._take()
+        # Note: The next frame is drawn on the other surface, so this frame stays intact until the frame after it has been returned
+        self._last = previous
+        return previous
+
+    def _take(self) -> tuple[pygame.Surface, list[Any]]:
+        """Waits until the frame in flight has been drawn and returns it"""
+        self._in_flight = False
+        surface, values, exception = self._results.get()
+        if exception is not None:
+            self._last = None
+            raise exception
+        return surface, values
+
+    def finish(self):
+        """Waits until the frame in flight (if any) has been drawn and discards it, so the next call to `render` waits for its own frame. Exceptions raised while drawing are re-raised here."""
+        self._last = None
+        if self._in_flight:
+            self._take()
+
+    def close(self):
+        if self._in_flight:
+            self._results.get()
+            self._in_flight = False
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while (job := self._jobs.get()) is not None:
+            draw, surface = job
+            try:
+                self._results.put((surface, draw(surface), None))
+            except BaseException as e:
+                self._results.put((surface, [], e))
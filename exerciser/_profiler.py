@@ -0,0 +1,161 @@
+from array import array
+from collections import deque
+from contextlib import nullcontext
+from typing import Iterator
+import os
+import threading
+import time
+
+_PHASES = ('events', 'handle_input', 'tick', 'draw', 'overlay', 'flip', 'sleep')
+"""Phases of a frame in the main loop, in the order they run"""
+
+_HISTOGRAM_BIN_WIDTH = 0.002
+_HISTOGRAM_BIN_COUNT = 20
+
+_MAX_TRACE_EVENTS = 1_000_000
+"""Maximum number of events kept for the trace file (oldest events are dropped first). Each event takes about 20 bytes."""
+
+_active_profiler: '_FrameProfiler | None' = None
+_null_span = nullcontext()
+
+def profile_span(name: str):
+    """
+    Context manager that measures the time spent inside it and shows it as a sub-span in the profiler overlay (F3) and in trace files.
+
+    Costs close to nothing when profiling is disabled.
+
+    Example:
+        with exerciser.profile_span("controller"):
+            output = controller(state)
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        return _null_span
+    return _Span(profiler, name)
+
+class _Span:
+    def __init__(self, profiler: '_FrameProfiler', name: str):
+        self._profiler = profiler
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._profiler.add_span(self._name, self._start, time.perf_counter())
+
+class _TraceBuffer:
+    """
+    Ring buffer of the most recent trace events as (name, category, start, end).
+
+    Events are stored in typed arrays (with each distinct name and category stored once), because a long profiled session can collect millions of events.
+    """
+
+    def __init__(self, capacity: int = _MAX_TRACE_EVENTS):
+        self._capacity = capacity
+        self._names: list[tuple[str, str]] = []
+        self._name_indexes: dict[tuple[str, str], int] = {}
+        self._name_keys = array('I')
+        self._starts = array('d')
+        self._ends = array('d')
+        self._next = 0 # Index of the oldest event once the buffer is full
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def append(self, name: str, category: str, start: float, end: float):
+        key = self._name_indexes.get((name, category))
+        if key is None:
+            key = self._name_indexes[(name, category)] = len(self._names)
+            self._names.append((name, category))
+        if len(self._starts) < self._capacity:
+            self._name_keys.append(key)
+            self._starts.append(start)
+            self._ends.append(end)
+        else:
+            self._name_keys[self._next] = key
+            self._starts[self._next] = start
+            self._ends[self._next] = end
+            self._next = (self._next + 1) % self._capacity
+
+    def __iter__(self) -> Iterator[tuple[str, str, float, float]]:
+        order = range(self._next, len(self._starts)), range(self._next)
+        for indexes in order:
+            for i in indexes:
+                name, category = self._names[self._name_keys[i]]
+                yield name, category, self._starts[i], self._ends[i]
+
+class _FrameProfiler:
+    """Measures time spent in each phase of the main loop over the last `history` frames and optionally collects a Chrome trace."""
+
+    def __init__(self, history: int = 240, trace_path: str | os.PathLike | None = None):
+        self.trace_path = trace_path
+        self._durations = {phase: deque(maxlen=history) for phase in _PHASES}
+        self._spans: dict[str, deque[float]] = {}
+        self._frame_times: deque[float] = deque(maxlen=history)
+        self._history = history
+        self._trace_events: _TraceBuffer | None = _TraceBuffer() if trace_path is not None else None
+        self._origin = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        self._frame_start = self._phase_start = self._origin
+
+    def start_frame(self):
+        self._frame_start = self._phase_start = time.perf_counter()
+
+    def mark(self, phase: str):
+        """Marks the end of `phase` (and the start of the next phase)"""
+        now = time.perf_counter()
+        self._durations[phase].append(now - self._phase_start)
+        if self._trace_events is not None:
+            self._trace_events.append(phase, 'frame', self._phase_start, now)
+        self._phase_start = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self._frame_times.append(now - self._frame_start)
+        if self._trace_events is not None:
+            self._trace_events.append('frame', 'frame', self._frame_start, now)
+
+    def add_span(self, name: str, start: float, end: float):
+        durations = self._spans.get(name)
+        if durations is None:
+            durations = self._spans[name] = deque(maxlen=self._history)
+        durations.append(end - start)
+        if self._trace_events is not None:
+            self._trace_events.append(name, 'user', start, end)
+
+    def summary(self) -> list[str]:
+        """Rolling p50/p95/max of each phase and user-defined span, formatted for the overlay"""
+        lines = ["Phase: p50 / p95 / max (ms)"]
+        for name, durations in [('frame', self._frame_times), *self._durations.items(), *self._spans.items()]:
+            if durations:
+                p50, p95, maximum = _percentiles(durations)
+                lines.append(f"{name}: {p50 * 1000:.2f} / {p95 * 1000:.2f} / {maximum * 1000:.2f}")
+        return lines
+
+    def histogram(self) -> list[int]:
+        """Frame time histogram with bins of width _HISTOGRAM_BIN_WIDTH (the last bin includes all longer frames)"""
+        counts = [0] * _HISTOGRAM_BIN_COUNT
+        for frame_time in self._frame_times:
+            counts[min(int(frame_time / _HISTOGRAM_BIN_WIDTH), _HISTOGRAM_BIN_COUNT - 1)] += 1
+        return counts
+
+    def write_trace(self):
+        """Writes collected events to `trace_path` in Chrome trace format (can be opened in Perfetto or chrome://tracing)"""
+        if self.trace_path is None or self._trace_events is None:
+            return
+        import json
+        with open(self.trace_path, 'w') as file:
+            json.dump({'traceEvents': [self._trace_event(*event) for event in self._trace_events], 'displayTimeUnit': 'ms'}, file)
+
+    def _trace_event(self, name: str, category: str, start: float, end: float) -> dict:
+        return {
+            'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': self._thread_id,
+            'ts': (start - self._origin) * 1e6, 'dur': (end - start) * 1e6,
+        }
+
+def _percentiles(durations: deque[float]) -> tuple[float, float, float]:
+    values = sorted(durations)
+    return values[len(values) // 2], values[min(int(len(values) * 0.95), len(values) - 1)], values[-1]
@@ -0,0 +1,161 @@
+import marshal
+import os
+import struct
+from typing import BinaryIO, Callable, Iterator, Sequence
+import pygame
+from ._shared import Simulation, TextCache, _load_font
+from ._execute_headless import HeadlessResult, _run_deltas
+from . import _execute_gui
+from ._execute_gui import _current_telemetry
+
+# Recording format:
+# The file starts with _MAGIC, followed by one record per frame.
+# Each record starts with a header (_FRAME_HEADER) containing flags, tick count and length of the encoded events.
+# The header is followed by the deltas passed to `tick` (only one delta if _FLAG_FIXED_DELTA is set) and the encoded events.
+
+_MAGIC = b'EXREC\x02'
+_FRAME_HEADER = struct.Struct('<BII')
+# Version 1 stored the tick count as uint16 (recordings in this format can still be replayed)
+_MAGIC_V1 = b'EXREC\x01'
+_FRAME_HEADER_V1 = struct.Struct('<BHI')
+
+_FLAG_RESTART = 1
+"""Simulation was (re)created at the start of this frame"""
+_FLAG_INPUT = 2
+"""`handle_input` was called during this frame"""
+_FLAG_FIXED_DELTA = 4
+"""All deltas in this frame are equal, so only one is stored"""
+
+_MARSHALABLE_TYPES = (type(None), bool, int, float, str, bytes, tuple)
+
+def _encode_events(events: list[pygame.event.Event]) -> bytes:
+    """Encodes events as bytes. Attributes that are not plain values (e.g. window objects) are dropped."""
+    return marshal.dumps([
+        (event.type, {key: value for key, value in event.dict.items() if isinstance(value, _MARSHALABLE_TYPES)})
+        for event in events
+    ])
+
+def _decode_events(data: bytes) -> list[pygame.event.Event]:
+    return [pygame.event.Event(type, attributes) for type, attributes in marshal.loads(data)]
+
+class _Recorder:
+    """Writes a compact binary log of the inputs to a simulation (events, restarts and deltas) that can be replayed with `replay`."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(_MAGIC)
+        self._first_frame = True
+
+    def write_frame(self, restart: bool, handle_input: bool, events: list[pygame.event.Event], deltas: list[float]):
+        flags = 0
+        if restart or self._first_frame:
+            flags |= _FLAG_RESTART
+        if handle_input:
+            flags |= _FLAG_INPUT
+        if deltas and all(delta == deltas[0] for delta in deltas):
+            flags |= _FLAG_FIXED_DELTA
+            stored_deltas = deltas[:1]
+        else:
+            stored_deltas = deltas
+        encoded_events = _encode_events(events) if handle_input and events else b''
+        self._file.write(_FRAME_HEADER.pack(flags, len(deltas), len(encoded_events)))
+        self._file.write(struct.pack(f'<{len(stored_deltas)}d', *stored_deltas))
+        self._file.write(encoded_events)
+        self._first_frame = False
+
+    def close(self):
+        self._file.close()
+
+def _read_recording(path: str | os.PathLike) -> Iterator[tuple[bool, list[pygame.event.Event] | None, list[float]]]:
+    """Yields `(restart, events, deltas)` for each recorded frame. `events` is None if `handle_input` was not called."""
+    with open(path, 'rb') as file:
+        magic = file.read(len(_MAGIC))
+        if magic == _MAGIC:
+            frame_header = _FRAME_HEADER
+        elif magic == _MAGIC_V1:
+            frame_header = _FRAME_HEADER_V1
+        else:
+            raise ValueError(f"{path} is not an exerciser recording")
+        # Note: If the recording was cut off (e.g. the process crashed while writing), the incomplete last frame is ignored
+        while header := file.read(frame_header.size):
+            if len(header) < frame_header.size:
+                return
+            flags, tick_count, events_length = frame_header.unpack(header)
+            stored_count = min(tick_count, 1) if flags & _FLAG_FIXED_DELTA else tick_count
+            delta_data = file.read(8 * stored_count)
+            event_data = file.read(events_length)
+            if len(delta_data) < 8 * stored_count or len(event_data) < events_length:
+                return
+            deltas = list(struct.unpack(f'<{stored_count}d', delta_data))
+            if flags & _FLAG_FIXED_DELTA:
+                deltas *= tick_count
+            events = None
+            if flags & _FLAG_INPUT:
+                events = _decode_events(event_data) if events_length > 0 else []
+            yield bool(flags & _FLAG_RESTART), events, deltas
+
+def replay(create_simulation: Callable[[], Simulation] | Sequence[Callable[[], Simulation]], path: str | os.PathLike, *, window: bool = False, speed: float = 1.0) -> HeadlessResult:
+    """
+    Replays a session recorded with `run(create_simulation, record=path)`. `create_simulation` should create the same simulation that was recorded
+    (or be the same list of functions, if the recorded simulations were tiled).
+
+    The recorded events are passed to `handle_input` and the recorded deltas are passed to `tick`, so the final state should exactly match the recorded session
+    (as long as the simulation only depends on its inputs, e.g. it uses events instead of `pygame.key.get_pressed()` and seeds its random number generators).
+
+    By default the recording is replayed headless as fast as possible. If `window` is true, the recording is shown in a window at `speed` times the original frame rate.
+    Window replay runs on the calling thread and cannot be used while a simulation window opened by `run` is open.
+
+    Returns the result for the last simulation object (recordings include restarts).
+    """
+    if window and _execute_gui._initialized:
+        raise RuntimeError("Cannot replay in a window while a simulation window is open")
+    if not callable(create_simulation):
+        from ._tiles import _tiled_factory
+        create_simulation = _tiled_factory(create_simulation)
+
+    result: HeadlessResult | None = None
+    screen = None
+    try:
+        for restart, events, deltas in _read_recording(path):
+            if restart or result is None:
+                result = HeadlessResult(create_simulation(), 0, 0.0)
+                if window:
+                    if screen is None:
+                        screen, clock, font, text_cache = _open_replay_window(result.simulation)
+                    pygame.display.set_caption(f"{result.simulation.name} (replay)")
+            if events is not None and result.exception is None:
+                result.simulation.handle_input(events)
+            _run_deltas(result, deltas)
+
+            if screen is not None:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        return result
+                screen.fill('white')
+                telemetry_token = _current_telemetry.set(result.telemetry)
+                try:
+                    result.simulation.draw(screen)
+                finally:
+                    _current_telemetry.reset(telemetry_token)
+                for i, value in enumerate(result.values):
+                    screen.blit(text_cache.render(font, value, 'black'), (5, 5 + i * 25)) # type: ignore
+                indicator = text_cache.render(font, f"Replay ({speed:g}x)", 'blue') # type: ignore
+                screen.blit(indicator, (screen.get_width() - indicator.get_width() - 5, 0))
+                if result.error is not None:
+                    screen.blit(text_cache.render(font, result.error, 'red'), (5, screen.get_height() - 25)) # type: ignore
+                pygame.display.flip()
+                clock.tick(_execute_gui.TPS * speed) # type: ignore
+    finally:
+        if screen is not None:
+            pygame.display.quit()
+
+    if result is None:
+        raise ValueError(f"{path} contains no frames")
+    return result
+
+def _open_replay_window(simulation: Simulation):
+    pygame.display.init()
+    screen = pygame.display.set_mode(simulation.initial_window_size, pygame.RESIZABLE)
+    font = _load_font(20)
+    return screen, pygame.time.Clock(), font, TextCache()
@@ -1,13 +1,89 @@
 from abc import abstractmethod
-from typing import Protocol
+from collections import OrderedDict
+import copy
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Protocol, Sequence
 import pygame
 
+if TYPE_CHECKING:
+    import numpy as np
+
+_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Roboto-Regular-Modified.ttf')
+
+_fonts: dict[int, pygame.font.Font] = {}
+_fonts_lock = threading.Lock()
+
 class ValidationError(RuntimeError):
     pass
 
 class CodeRunError(RuntimeError):
     pass
 
+def _load_font(size: int) -> pygame.font.Font:
+    """Returns the default font (Roboto) in the given size. Initializes `pygame.font` if needed. Fonts are loaded once and shared."""
+    font = _fonts.get(size)
+    if font is None or not pygame.font.get_init():
+        with _fonts_lock:
+            if not pygame.font.get_init():
+                # Fonts become invalid if pygame.font is uninitialized (e.g. by pygame.quit)
+                _fonts.clear()
+                pygame.font.init()
+            font = _fonts.get(size)
+            if font is None:
+                font = _fonts[size] = pygame.font.Font(_FONT_PATH, size)
+    return font
+
+def _prewarm():
+    """Loads the fonts used by the main loop and `LinePlot`, so that the first frame doesn't have to wait for them. Runs on a background thread at import."""
+    # Note: The display is not initialized here, because some platforms (e.g. MacOS) only allow it on the thread that manages windows.
+    try:
+        _load_font(20)
+        _load_font(16)
+    except Exception:
+        # Fonts will be loaded (and errors reported) when they are actually needed
+        pass
+
+def _reset_fonts_lock():
+    global _fonts_lock
+    _fonts_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    # A lock held by the prewarm thread would stay locked forever in a child process forked at the wrong moment
+    os.register_at_fork(after_in_child=_reset_fonts_lock)
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text surfaces, keyed by (text, color, font).
+
+    Rendering text is relatively expensive, so this avoids re-rendering text that is identical to text rendered in recent frames.
+    Surfaces returned by `render` are shared and should not be modified.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, color) -> pygame.Surface:
+        """Equivalent to `font.render(text, True, color)`, but returns a cached surface if possible"""
+        key = (text, color if isinstance(color, (str, int, tuple)) else tuple(pygame.Color(color)), font)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
 # Note: Even though Simulation is structurally typed, it is recommended to explicitly subclass it for better type hints
 # and to get default implementations for optional methods and default values for optional attributes.
 class Simulation(Protocol):
@@ -30,6 +106,78 @@ class Simulation(Protocol):
     * The simulation cannot be paused.
     """
 
+    tick_rate: float | None = None
+    """
+    Number of ticks per second of simulated time. Defaults to `TPS` (one tick per frame) if not specified.
+
+    If specified, the delta passed to `tick` is `1 / tick_rate` and the main loop runs as many ticks per frame as needed to keep up with real time
+    (e.g. about 17 ticks per frame for a tick rate of 1000). The frame rate is not affected.
+
+    In real time mode the main loop instead runs `tick_rate` times per second and calls `tick` once per iteration with the real elapsed time as delta.
+    The window is still redrawn at `TPS` frames per second.
+    """
+
+    max_ticks_per_frame: int | None = None
+    """
+    Maximum number of ticks run in a single frame when `tick_rate` is specified. Defaults to 4 frames worth of ticks if not specified.
+
+    If ticks take too long to keep up with real time, the simulation is slowed down instead of trying to catch up indefinitely.
+    """
+
+    tick_time_limit: float | None = None
+    """
+    Maximum time in seconds that a single call to `tick` may take in the window (e.g. 5). Disabled (None) if not specified.
+
+    If `tick` runs for longer (e.g. because student code is stuck in an infinite loop), it is interrupted and the simulation is stopped with an error message
+    that shows where the code was stuck, the same way as for `CodeRunError`. If the code catches the interrupt (e.g. with a bare `except:`), it is interrupted again every second.
+    Note: Code is only interrupted while executing Python code, so a single long-running call to native code is interrupted only once it returns.
+    """
+
+    timing_tolerance: float = 0.001
+    """
+    Lateness in seconds above which an iteration of the main loop counts as a deadline miss in `timing_stats`. Defaults to 1 ms if not specified.
+
+    Mostly useful in real time mode, to check that `tick` was called at a stable rate.
+    """
+
+    low_latency_input: bool = False
+    """
+    If true, the main loop polls input again right before each `tick` after the first in a frame and right before `draw`, passing new events to `handle_input`.
+    This shortens the time from a key press or mouse movement to the frame that reflects it (see the input latency in `timing_stats`), which helps with manual control.
+
+    Note: `handle_input` may then be called several times per frame. Key presses for the window controls (e.g. R for restart) are handled at the start of the next frame.
+    """
+
+    use_dirty_rects: bool = False
+    """
+    Enables dirty rect mode. This can substantially reduce rendering cost for mostly static scenes, especially with software rendering.
+
+    In dirty rect mode the following changes are made to drawing:
+    * The surface passed to `draw` is not cleared between frames, so `draw` only needs to redraw the parts of the scene that changed.
+      It must draw everything the first time it is called and whenever the size of the surface changes.
+    * `draw` should return a list of rects that it changed. Only these areas (and areas where the overlay changed) are updated on screen.
+      Returning None updates the whole screen.
+    """
+
+    snapshot_attributes: Sequence[str] = ()
+    """
+    Names of the attributes that make up the state of the simulation. Enables snapshots if specified (see `snapshot`).
+
+    Only these attributes are copied, so expensive parts of the simulation that do not change (e.g. loaded assets or figures) can be left out.
+    State stored in NumPy arrays is cheap to copy.
+    """
+
+    telemetry_history: int | None = 100_000
+    """
+    Number of samples kept per label in the history of values shown with `show_value` (see `exerciser.Telemetry`). Set to None to disable the history.
+    """
+
+    precreate: bool = False
+    """
+    If true and the simulation does not support snapshots, a replacement simulation is created on a background thread, so that restarting (R) is instant.
+    Only enable this if `create_simulation` can safely be called on another thread.
+    """
+
     # TODO: We may need lifecycle hooks (e.g. setup and cleanup) eventually.
 
     def handle_input(self, events: list[pygame.event.Event], /) -> None:
@@ -41,6 +189,44 @@ class Simulation(Protocol):
         """
         pass
 
+    def snapshot(self) -> Any:
+        """
+        Returns a snapshot of the current state of the simulation that can later be passed to `restore`, or None if snapshots are not supported.
+
+        If snapshots are supported, restarting (R) restores a snapshot taken right after the simulation was created instead of creating a new simulation,
+        and snapshots taken periodically while the simulation runs allow stepping back in time while paused.
+
+        The default implementation copies the attributes listed in `snapshot_attributes`.
+        """
+        if not self.snapshot_attributes:
+            return None
+        return {name: copy.deepcopy(getattr(self, name)) for name in self.snapshot_attributes}
+
+    def restore(self, snapshot: Any, /) -> None:
+        """
+        Restores the state of the simulation from a snapshot returned by `snapshot`. The same snapshot may be restored more than once.
+        """
+        for name, value in snapshot.items():
+            setattr(self, name, copy.deepcopy(value))
+
+    def render_state(self) -> Any:
+        """
+        Returns an immutable copy of the state that `draw_state` needs to draw the current frame, or None if pipelined rendering is not supported.
+
+        If pipelined rendering is supported, the window draws frames by passing the render state to `draw_state` on a dedicated render thread,
+        while the next frame is ticked on the main loop thread. On free-threaded Python this can nearly double the frame rate if `tick` and drawing take similar time.
+        Frames are shown one frame later than with `draw`. Not used in dirty rect mode or when running headless.
+        """
+        return None
+
+    def draw_state(self, screen: pygame.Surface, state: Any, /) -> None:
+        """
+        Draw a render state returned by `render_state` on screen (see `render_state`).
+
+        Runs on the render thread at the same time as `tick`, so it must only use `state` and objects that `tick` does not modify.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def tick(self, delta: float, /) -> None:
         """
@@ -54,11 +240,54 @@ class Simulation(Protocol):
         raise NotImplementedError
 
     @abstractmethod
-    def draw(self, screen: pygame.Surface, /) -> None:
+    def draw(self, screen: pygame.Surface, /) -> Sequence[pygame.Rect] | None:
         """
         Draw simulation on screen. Should not change simulation state.
 
         Args:
             screen: Pygame surface to draw on
+
+        Returns:
+            In dirty rect mode (see `use_dirty_rects`), a list of the areas that were changed, or None if the whole screen changed.
+            Otherwise the return value is ignored.
         """
         raise NotImplementedError
+
+class BatchSimulation(Simulation, Protocol):
+    """
+    Simulation that advances many independent instances of the same system at once (e.g. one instance per combination of controller gains).
+
+    The state of the instances should be stored as NumPy arrays with one element per instance, so that `tick` updates all instances in a single vectorized step
+    and costs about as much as a single instance. Batch simulations run like any other simulation, both in the window and headless.
+    `draw` can show all instances or only the best few (see `best`) using a `LinePlot` line with `instances` set.
+
+    Batch simulations must subclass `BatchSimulation` explicitly (unlike `Simulation`), otherwise they are run as ordinary simulations and no scores are reported.
+    """
+
+    size: int
+    """
+    Number of instances.
+    """
+
+    @abstractmethod
+    def score(self) -> 'np.ndarray':
+        """
+        Score of each instance in the current state, as an array of shape `(size,)`. Higher is better. NaN values are ranked last.
+
+        Used by `best` and reported in the result of `run_headless`.
+        """
+        raise NotImplementedError
+
+    def best(self, k: int) -> 'np.ndarray':
+        """
+        Indices of the `k` instances with the highest score, best first.
+        """
+        import numpy as np
+        scores = np.asarray(self.score(), dtype=float)
+        # NaN is sorted last, so negating puts the best finite scores first
+        return np.argsort(-scores, kind='stable')[:k]
+
+def _is_batch_simulation(simulation: Simulation) -> bool:
+    """Whether a simulation explicitly subclasses `BatchSimulation` (other simulations may have unrelated `size` or `score` attributes)"""
+    # Note: isinstance does not work with protocols that are not runtime checkable
+    return BatchSimulation in type(simulation).__mro__
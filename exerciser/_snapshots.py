@@ -0,0 +1,113 @@
+from collections import deque
+import sys
+import threading
+from typing import Any, Callable
+from ._shared import Simulation
+
+_SNAPSHOT_INTERVAL = 0.25
+"""Simulated time in seconds between snapshots kept for stepping back"""
+_SNAPSHOT_MEMORY_LIMIT = 64 * 1024 * 1024
+"""Maximum total estimated size in bytes of snapshots kept for stepping back (oldest snapshots are dropped first)"""
+
+def _take_snapshot(simulation: Simulation) -> Any:
+    """Returns a snapshot of the simulation, or None if it does not support snapshots"""
+    snapshot = getattr(simulation, 'snapshot', None)
+    return snapshot() if snapshot is not None else None
+
+def _snapshot_size(snapshot: Any) -> int:
+    """Estimated size of a snapshot in bytes (exact for NumPy arrays, approximate for other objects)"""
+    nbytes = getattr(snapshot, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(snapshot, dict):
+        return sys.getsizeof(snapshot) + sum(_snapshot_size(key) + _snapshot_size(value) for key, value in snapshot.items())
+    if isinstance(snapshot, (list, tuple, set, frozenset)):
+        return sys.getsizeof(snapshot) + sum(_snapshot_size(value) for value in snapshot)
+    size = sys.getsizeof(snapshot)
+    attributes = getattr(snapshot, '__dict__', None)
+    if attributes is not None:
+        size += _snapshot_size(attributes)
+    return size
+
+class _SnapshotHistory:
+    """
+    Bounded history of `(time, snapshot)` pairs for stepping back and forward through simulated time.
+
+    After stepping back, the history keeps the newer snapshots (so they can be stepped forward to) until the simulation is run again from the restored state.
+    """
+
+    def __init__(self, memory_limit: int = _SNAPSHOT_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        self.memory = 0
+        """Estimated total size of stored snapshots in bytes"""
+        self._entries: deque[tuple[float, Any, int]] = deque()
+        self._position: int | None = None # Index of currently restored entry, or None if the simulation is past the last entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def push(self, time: float, snapshot: Any):
+        self.discard_future()
+        size = _snapshot_size(snapshot)
+        self._entries.append((time, snapshot, size))
+        self.memory += size
+        while self.memory > self.memory_limit and len(self._entries) > 1:
+            self.memory -= self._entries.popleft()[2]
+
+    def last_time(self) -> float | None:
+        return self._entries[-1][0] if self._entries else None
+
+    def back(self, current_time: float) -> tuple[float, Any] | None:
+        """Returns the newest snapshot that is older than the current state, or None if there is no such snapshot"""
+        if self._position is None:
+            position = len(self._entries) - 1
+            while position >= 0 and self._entries[position][0] >= current_time - 1e-9:
+                position -= 1
+        else:
+            position = self._position - 1
+        if position < 0:
+            return None
+        self._position = position
+        time, snapshot, _ = self._entries[position]
+        return time, snapshot
+
+    def forward(self) -> tuple[float, Any] | None:
+        """Returns the snapshot after the currently restored snapshot, or None if there is no such snapshot"""
+        if self._position is None or self._position + 1 >= len(self._entries):
+            return None
+        self._position += 1
+        time, snapshot, _ = self._entries[self._position]
+        return time, snapshot
+
+    def discard_future(self):
+        """Drops snapshots newer than the currently restored snapshot (called when the simulation runs again from the restored state)"""
+        if self._position is None:
+            return
+        while len(self._entries) > self._position + 1:
+            self.memory -= self._entries.pop()[2]
+        self._position = None
+
+    def clear(self):
+        self._entries.clear()
+        self._position = None
+        self.memory = 0
+
+class _Precreator:
+    """Creates a simulation on a background thread, so that it is ready when it is needed"""
+
+    def __init__(self, create_simulation: Callable[[], Simulation]):
+        self.create_simulation = create_simulation
+        self._simulation: Simulation | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def take(self) -> Simulation | None:
+        """Waits until the simulation has been created and returns it. Returns None if creating it failed (create it normally to report the error)."""
+        self._thread.join()
+        return self._simulation
+
+    def _run(self):
+        try:
+            self._simulation = self.create_simulation()
+        except Exception:
+            pass
@@ -0,0 +1,224 @@
+from array import array
+import bisect
+import copy
+import math
+import os
+from typing import TYPE_CHECKING, Any, Iterable, Sequence
+import weakref
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .pygame import LinePlot
+
+_DEFAULT_HISTORY = 100_000
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+def _format_value(label: str, value: Any) -> str:
+    """Formats a value shown with `show_value` or `show_simulation_value` the way it is shown on screen"""
+    return f"{label} = {value:.3f}" if isinstance(value, float) else f"{label} = {value}"
+
+def _typed(value: Any) -> tuple[str, float | int] | None:
+    """
+    Returns the array typecode and value to store `value` in a typed array without changing its type, or None if it has to be stored as an object.
+    Floats are stored as 'd' and ints as 'q'. Bools are stored as objects, because a typed array would turn them into ints.
+    """
+    value_type = type(value)
+    if value_type is float:
+        return 'd', value
+    if value_type is int:
+        return ('q', value) if -2**63 <= value < 2**63 else None
+    # NumPy scalars (e.g. np.float64) are stored as the equivalent Python type, but importing NumPy just to check for them is not worth it
+    if value_type.__module__ == 'numpy' and getattr(value, 'ndim', None) == 0:
+        kind = value.dtype.kind
+        if kind == 'f':
+            return 'd', float(value)
+        if kind in 'iu':
+            return _typed(int(value))
+    return None
+
+def _copy_value(value: Any) -> Any:
+    """Copies mutable values, so that changing them after they were shown does not change the recorded history"""
+    return value if isinstance(value, _IMMUTABLE_TYPES) else copy.deepcopy(value)
+
+class _Column:
+    """History of one label. Values of a single numeric type (float or int) are stored in a typed array, other values in a list."""
+
+    def __init__(self):
+        self.times = array('d')
+        self.values: array | list | None = None
+
+    def append(self, time: float, value: Any):
+        typed = _typed(value)
+        if self.values is None:
+            self.values = array(typed[0]) if typed is not None else []
+        if isinstance(self.values, array):
+            if typed is not None and typed[0] == self.values.typecode:
+                self.times.append(time)
+                self.values.append(typed[1])
+                return
+            # Got a value of a different type, so fall back to storing values as objects (this keeps the type of every value)
+            self.values = list(self.values)
+        self.times.append(time)
+        self.values.append(_copy_value(value))
+
+    def trim(self, max_samples: int):
+        # Drop a tenth of the samples at once, so that dropping samples is amortized O(1)
+        excess = len(self.times) - max_samples
+        if excess > 0:
+            excess = max(excess, max_samples // 10)
+            del self.times[:excess]
+            del self.values[:excess] # type: ignore
+
+    def truncate(self, time: float):
+        index = bisect.bisect_left(self.times, time)
+        del self.times[index:]
+        del self.values[index:] # type: ignore
+
+class Telemetry:
+    """
+    History of values shown with `show_value`, stored per label as `(time, value)` columns. `time` is the simulated time at the start of the tick.
+
+    Labels whose values are all floats or all ints are stored in typed arrays. Other values are stored as objects, keeping their type
+    (mutable objects are copied when they are recorded).
+    At most `max_samples` samples are kept per label; older samples are dropped.
+
+    The telemetry of the simulation running in the window is available through `exerciser.telemetry()`, for headless runs through `HeadlessResult.telemetry`.
+    """
+
+    def __init__(self, max_samples: int = _DEFAULT_HISTORY):
+        if max_samples < 1:
+            raise ValueError("max_samples must be a positive integer")
+        self.max_samples = max_samples
+        self._columns: dict[str, _Column] = {}
+        self._feed_times: weakref.WeakKeyDictionary['LinePlot', float] = weakref.WeakKeyDictionary()
+
+    @property
+    def labels(self) -> list[str]:
+        """Labels in the order they were first shown"""
+        return list(self._columns)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self._columns
+
+    def __len__(self) -> int:
+        """Total number of stored samples"""
+        return sum(len(column.times) for column in self._columns.values())
+
+    def times(self, label: str) -> 'np.ndarray':
+        """Times of the samples of `label` as a float64 array"""
+        import numpy as np
+        return np.array(self._columns[label].times, dtype=np.float64)
+
+    def values(self, label: str) -> 'np.ndarray':
+        """Values of the samples of `label`, as a float64 or int64 array if all values are floats or all are ints, otherwise as an object array"""
+        import numpy as np
+        values = self._columns[label].values
+        if isinstance(values, array):
+            return np.array(values, dtype=np.float64 if values.typecode == 'd' else np.int64)
+        result = np.empty(len(values or ()), dtype=object)
+        result[:] = values
+        return result
+
+    def __getitem__(self, label: str) -> tuple['np.ndarray', 'np.ndarray']:
+        """Returns `(times, values)` for `label`"""
+        return self.times(label), self.values(label)
+
+    def series(self, label: str) -> list[tuple[float, Any]]:
+        """Samples of `label` as a list of `(time, value)` pairs"""
+        column = self._columns[label]
+        return list(zip(column.times, column.values))
+
+    def to_csv(self, path: str | os.PathLike, labels: Sequence[str] | None = None):
+        """
+        Writes the history to a CSV file with a `time` column and one column per label. Each row is one tick.
+        Cells are left empty for labels that were not shown during that tick.
+        """
+        labels = self.labels if labels is None else list(labels)
+        rows: dict[float, list[Any]] = {}
+        for i, label in enumerate(labels):
+            column = self._columns[label]
+            for time, value in zip(column.times, column.values):
+                row = rows.get(time)
+                if row is None:
+                    row = rows[time] = [''] * len(labels)
+                row[i] = value
+        import csv
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['time', *labels])
+            for time in sorted(rows):
+                writer.writerow([time, *rows[time]])
+
+    def to_npz(self, path: str | os.PathLike, labels: Sequence[str] | None = None):
+        """Writes the history to a NumPy `.npz` file with arrays `<label>.time` and `<label>.value` for each label"""
+        import numpy as np
+        arrays = {}
+        for label in (self.labels if labels is None else labels):
+            arrays[f'{label}.time'], arrays[f'{label}.value'] = self[label]
+        np.savez(path, **arrays) # type: ignore
+
+    def feed(self, plot: 'LinePlot', labels: Sequence[str]):
+        """
+        Adds samples recorded since the previous call for the same plot to `plot` (one label per plot line, in order).
+        Points are added at the times of the first label, using the most recent value of each other label at that time (NaN if there is none).
+        Call this in `draw` to plot values shown with `show_value` without storing them separately.
+        """
+        first = self._columns.get(labels[0])
+        if first is None:
+            return
+        last_time = self._feed_times.get(plot, float('-inf'))
+        start = bisect.bisect_right(first.times, last_time)
+        if start == len(first.times):
+            return
+        columns = [self._columns.get(label) for label in labels]
+        # Index of the next sample to check in each column. Times only increase, so each column is scanned once.
+        positions = [bisect.bisect_right(column.times, last_time) if column is not None else 0 for column in columns]
+        latest: list[float] = [float('nan')] * len(labels)
+        for i, column in enumerate(columns):
+            if column is not None and positions[i] > 0:
+                latest[i] = _as_float(column.values[positions[i] - 1])
+        for index in range(start, len(first.times)):
+            time = first.times[index]
+            for i, column in enumerate(columns):
+                if column is None:
+                    continue
+                position = positions[i]
+                while position < len(column.times) and column.times[position] <= time:
+                    latest[i] = _as_float(column.values[position])
+                    position += 1
+                positions[i] = position
+            plot.add_data(time, latest)
+        self._feed_times[plot] = first.times[-1]
+
+    def clear(self):
+        self._columns.clear()
+        self._feed_times.clear()
+
+    def _record(self, time: float, values: Iterable[tuple[str, Any]]):
+        for label, value in values:
+            column = self._columns.get(label)
+            if column is None:
+                column = self._columns[label] = _Column()
+            column.append(time, value)
+            if len(column.times) > self.max_samples:
+                column.trim(self.max_samples)
+
+    def _truncate(self, time: float):
+        """Drops samples from ticks that started at or after `time` (e.g. after stepping back to a snapshot taken at `time`)"""
+        for column in self._columns.values():
+            column.truncate(time)
+        for plot, feed_time in list(self._feed_times.items()):
+            # Samples before `time` have already been added to the plot
+            self._feed_times[plot] = min(feed_time, math.nextafter(time, -math.inf))
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def _telemetry_for(simulation: Any) -> Telemetry | None:
+    """Creates telemetry with the history size requested by the simulation, or returns None if the simulation disabled it"""
+    max_samples = getattr(simulation, 'telemetry_history', _DEFAULT_HISTORY)
+    return Telemetry(max_samples) if max_samples is not None else None
@@ -0,0 +1,257 @@
+import functools
+import math
+import sys
+import traceback
+from typing import Any, Callable, Sequence
+import pygame
+from ._shared import CodeRunError, Simulation, ValidationError
+from ._execute_gui import _current_telemetry, _error_message, _take_render_state, _user_values_to_draw, _values_to_draw
+from ._snapshots import _take_snapshot
+from ._telemetry import Telemetry, _format_value, _telemetry_for
+
+_HEADER_HEIGHT = 25
+"""Height of the title bar above each tile in pixels"""
+_MAX_INITIAL_SIZE = (1600, 1000)
+"""Maximum initial size of a window with several tiles (tiles are scaled down to fit)"""
+
+_MOUSE_EVENT_TYPES = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+class _Tile:
+    """State of one simulation in a tiled window"""
+
+    def __init__(self, simulation: Simulation):
+        self.simulation = simulation
+        self.paused = False
+        self.error: str | None = None
+        self.time = 0.0
+        self.values: list[tuple[str, Any]] = []
+        self.simulation_values: list[tuple[str, Any, Any]] = []
+        self.telemetry: Telemetry | None = _telemetry_for(simulation)
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        """Area of the tile in the window (without the title bar)"""
+
+    def fail(self, e: ValidationError | CodeRunError):
+        """Stops this tile with the error, the others keep running"""
+        self.error = _error_message(e)
+        print(f"{self.simulation.name}: {self.error}", file=sys.stderr)
+        if isinstance(e, CodeRunError) and (cause := e.__cause__ or e.__context__) is not None:
+            traceback.print_exception(cause)
+
+class _TiledSimulation(Simulation):
+    """
+    Runs several simulations side by side in one window, so that the main loop polls events, renders overlay text and flips once for all of them.
+
+    All tiles are ticked in lockstep with the same deltas. Each tile has its own pause state (toggled by clicking its title bar), error and shown values.
+    Keyboard and controller events are passed to every tile, mouse events only to the tile under the mouse (with positions relative to the tile).
+
+    Dirty rect mode and pipelined rendering are used if every tile supports them (otherwise all tiles are drawn with `draw` on every frame).
+    """
+
+    telemetry_history = None
+
+    def __init__(self, create_simulations: Sequence[Callable[[], Simulation]]):
+        self.tiles = [_Tile(create_simulation()) for create_simulation in create_simulations]
+        simulations = [tile.simulation for tile in self.tiles]
+        first = simulations[0]
+        self.real_time = first.real_time
+        self.tick_rate = getattr(first, 'tick_rate', None)
+        for simulation in simulations[1:]:
+            if simulation.real_time != self.real_time or getattr(simulation, 'tick_rate', None) != self.tick_rate:
+                raise ValueError("All tiled simulations must have the same real_time and tick_rate, so that they can be ticked in lockstep")
+        self.name = " | ".join(simulation.name for simulation in simulations)
+        limits = [limit for simulation in simulations if (limit := getattr(simulation, 'tick_time_limit', None)) is not None]
+        self.tick_time_limit = sum(limits) if limits else None
+        self.low_latency_input = any(getattr(simulation, 'low_latency_input', False) for simulation in simulations)
+        self.use_dirty_rects = all(getattr(simulation, 'use_dirty_rects', False) for simulation in simulations)
+
+        self.columns = math.ceil(math.sqrt(len(self.tiles)))
+        self.rows = math.ceil(len(self.tiles) / self.columns)
+        tile_width, tile_height = first.initial_window_size
+        tile_height += _HEADER_HEIGHT
+        scale = min(1.0, _MAX_INITIAL_SIZE[0] / (tile_width * self.columns), _MAX_INITIAL_SIZE[1] / (tile_height * self.rows))
+        self.initial_window_size = (int(tile_width * self.columns * scale), int(tile_height * self.rows * scale))
+        self._layout(self.initial_window_size)
+
+    def _tile_rects(self, size: tuple[int, int]) -> list[pygame.Rect]:
+        """Areas of the tiles (without title bars) in a window of the given size"""
+        rects = []
+        for i in range(len(self.tiles)):
+            row, column = divmod(i, self.columns)
+            left = size[0] * column // self.columns
+            top = size[1] * row // self.rows
+            right = size[0] * (column + 1) // self.columns
+            bottom = size[1] * (row + 1) // self.rows
+            rects.append(pygame.Rect(left, top + _HEADER_HEIGHT, right - left, max(bottom - top - _HEADER_HEIGHT, 0)))
+        return rects
+
+    def _layout(self, size: tuple[int, int]):
+        for tile, rect in zip(self.tiles, self._tile_rects(size)):
+            tile.rect = rect
+
+    def _tile_at(self, position: tuple[int, int]) -> tuple[_Tile | None, bool]:
+        """Returns the tile at a position in the window and whether the position is in its title bar"""
+        for tile in self.tiles:
+            if tile.rect.collidepoint(position):
+                return tile, False
+            if tile.rect.left <= position[0] < tile.rect.right and tile.rect.top - _HEADER_HEIGHT <= position[1] < tile.rect.top:
+                return tile, True
+        return None, False
+
+    def handle_input(self, events: list[pygame.event.Event]):
+        tile_events: list[list[pygame.event.Event]] = [[] for _ in self.tiles]
+        for event in events:
+            if event.type in _MOUSE_EVENT_TYPES or event.type == pygame.MOUSEWHEEL:
+                # Mouse wheel events have no position, so they go to the tile under the mouse cursor (there is no cursor when replaying headless)
+                if event.type != pygame.MOUSEWHEEL:
+                    position = event.pos
+                else:
+                    position = pygame.mouse.get_pos() if pygame.display.get_init() else (0, 0)
+                tile, in_header = self._tile_at(position)
+                if tile is None:
+                    continue
+                if in_header:
+                    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not self.real_time:
+                        tile.paused = not tile.paused
+                    continue
+                if event.type != pygame.MOUSEWHEEL:
+                    event = pygame.event.Event(event.type, {**event.dict, 'pos': (position[0] - tile.rect.left, position[1] - tile.rect.top)})
+                tile_events[self.tiles.index(tile)].append(event)
+            else:
+                for events_for_tile in tile_events:
+                    events_for_tile.append(event)
+        for tile, events_for_tile in zip(self.tiles, tile_events):
+            if tile.error is None:
+                try:
+                    tile.simulation.handle_input(events_for_tile)
+                except (ValidationError, CodeRunError) as e:
+                    tile.fail(e)
+
+    def tick(self, delta: float):
+        for tile in self.tiles:
+            if tile.paused or tile.error is not None:
+                continue
+            tile.values.clear()
+            # Note: Values shown by each tile are collected separately, so the main loop's own list stays empty
+            user_values_token = _user_values_to_draw.set(tile.values)
+            telemetry_token = _current_telemetry.set(tile.telemetry)
+            try:
+                tile.simulation.tick(delta)
+            except (ValidationError, CodeRunError) as e:
+                tile.fail(e)
+                continue
+            finally:
+                _user_values_to_draw.reset(user_values_token)
+                _current_telemetry.reset(telemetry_token)
+            if tile.telemetry is not None and tile.values:
+                tile.telemetry._record(tile.time, tile.values)
+            tile.time += delta
+
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect] | None:
+        self._layout(screen.get_size())
+        # In dirty rect mode the areas changed by each tile are collected in window coordinates
+        dirty_rects: list[pygame.Rect] | None = [] if self.use_dirty_rects else None
+        for tile in self.tiles:
+            tile.simulation_values.clear()
+            if tile.rect.width <= 0 or tile.rect.height <= 0:
+                continue
+            values_token = _values_to_draw.set(tile.simulation_values)
+            try:
+                tile_rects = tile.simulation.draw(screen.subsurface(tile.rect))
+            except (ValidationError, CodeRunError) as e:
+                # Only the first error of a tile is shown, draw keeps being called like for a single stopped simulation
+                if tile.error is None:
+                    tile.fail(e)
+                tile_rects = None
+            finally:
+                _values_to_draw.reset(values_token)
+            if dirty_rects is not None:
+                if tile_rects is None:
+                    dirty_rects.append(tile.rect.copy())
+                else:
+                    dirty_rects.extend(pygame.Rect(rect).move(tile.rect.topleft).clip(tile.rect) for rect in tile_rects)
+            _draw_frame(screen, tile.rect)
+        return dirty_rects
+
+    def render_state(self) -> Any:
+        states = []
+        for tile in self.tiles:
+            state = _take_render_state(tile.simulation)
+            if state is None:
+                return None
+            states.append(state)
+        return states
+
+    def draw_state(self, screen: pygame.Surface, state: Any):
+        # Note: Runs on the render thread, so tiles are not modified here. Values and errors of each tile are passed back to the main loop
+        # in the values collected for the frame (see `show_rendered_values`).
+        results = []
+        for tile, tile_state, rect in zip(self.tiles, state, self._tile_rects(screen.get_size())):
+            values: list[tuple[str, Any, Any]] = []
+            error = None
+            if rect.width > 0 and rect.height > 0:
+                values_token = _values_to_draw.set(values)
+                try:
+                    tile.simulation.draw_state(screen.subsurface(rect), tile_state)
+                except (ValidationError, CodeRunError) as e:
+                    error = e
+                finally:
+                    _values_to_draw.reset(values_token)
+                _draw_frame(screen, rect)
+            results.append((values, error))
+        frame_values = _values_to_draw.get()
+        if frame_values is not None:
+            frame_values.append(results)
+
+    def show_rendered_values(self, frame_values: list, size: tuple[int, int]):
+        """Shows the values and errors of each tile from a frame drawn with `draw_state` (called by the main loop when it shows the frame)"""
+        self._layout(size)
+        results = frame_values[0] if frame_values else [([], None)] * len(self.tiles)
+        for tile, (values, error) in zip(self.tiles, results):
+            tile.simulation_values[:] = values
+            if error is not None and tile.error is None:
+                tile.fail(error)
+
+    def snapshot(self) -> Any:
+        snapshots = [_take_snapshot(tile.simulation) for tile in self.tiles]
+        if any(snapshot is None for snapshot in snapshots):
+            return None
+        return [(snapshot, tile.time) for snapshot, tile in zip(snapshots, self.tiles)]
+
+    def restore(self, snapshot: Any):
+        for tile, (tile_snapshot, time) in zip(self.tiles, snapshot):
+            tile.simulation.restore(tile_snapshot)
+            tile.time = time
+            tile.error = None
+            tile.values.clear()
+            if tile.telemetry is not None:
+                tile.telemetry._truncate(time)
+
+    def overlay(self) -> list[tuple[str, Any, tuple[int, int]]]:
+        """Returns the text shown over the tiles as (text, color, position), so that the main loop renders it with its text cache"""
+        lines = []
+        for tile in self.tiles:
+            left, top = tile.rect.left + 5, tile.rect.top - _HEADER_HEIGHT
+            status = " (paused)" if tile.paused else ""
+            lines.append((tile.simulation.name + status, 'blue' if tile.paused else 'black', (left, top)))
+            values = [(_format_value(label, value), color) for label, value, color in tile.simulation_values]
+            values += [(_format_value(label, value), 'black') for label, value in tile.values]
+            for i, (text, color) in enumerate(values):
+                lines.append((text, color, (left, tile.rect.top + i * 25)))
+            if tile.error is not None:
+                lines.append((tile.error, 'red', (left, tile.rect.bottom - 25)))
+        return lines
+
+def _draw_frame(screen: pygame.Surface, rect: pygame.Rect):
+    """Draws the title bar and border of the tile with the given area"""
+    header = pygame.Rect(rect.left, rect.top - _HEADER_HEIGHT, rect.width, _HEADER_HEIGHT)
+    screen.fill((230, 230, 230), header)
+    pygame.draw.rect(screen, 'gray', header.union(rect), 1)
+
+def _tiled_factory(create_simulations: Sequence[Callable[[], Simulation]]) -> Callable[[], Simulation]:
+    """Returns a factory that creates a simulation tiling the simulations created by `create_simulations` (or the only factory if there is just one)"""
+    create_simulations = list(create_simulations)
+    if not create_simulations:
+        raise ValueError("At least one simulation factory is required")
+    if len(create_simulations) == 1:
+        return create_simulations[0]
+    return functools.partial(_TiledSimulation, create_simulations)
@@ -0,0 +1,84 @@
+import ctypes
+import sys
+import threading
+import time
+
+_REFIRE_INTERVAL = 1.0
+"""Time in seconds after which `_TickTimeout` is raised again if the guarded section is still running (e.g. because a bare `except:` swallowed it)"""
+
+class _TickTimeout(BaseException):
+    """
+    Raised asynchronously in the thread running `tick` when it exceeds its time limit.
+
+    Derived from BaseException, so that student code catching Exception does not accidentally swallow it.
+    """
+
+class _TickWatchdog:
+    """
+    Interrupts the thread that created the watchdog if a guarded section runs for longer than its time limit,
+    by raising `_TickTimeout` in that thread asynchronously.
+
+    The exception is raised again every `_REFIRE_INTERVAL` seconds until the guarded section ends, so code that catches it is still interrupted eventually.
+
+    Note: The exception is only delivered when the interrupted thread executes Python bytecode,
+    so code stuck inside a single long-running call to native code (e.g. a huge NumPy operation) is interrupted only once that call returns.
+    """
+
+    def __init__(self):
+        self._target_thread_id = threading.get_ident()
+        self._condition = threading.Condition()
+        self._deadline: float | None = None
+        self._generation = 0
+        """Number of the current guarded section, so that `stop` only ends the section it belongs to"""
+        self._fired = False
+        self._fire_count = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def start(self, time_limit: float) -> int:
+        """Starts guarded section. Returns its generation, which must be passed to `stop`."""
+        with self._condition:
+            self._generation += 1
+            self._deadline = time.perf_counter() + time_limit
+            self._fired = False
+            self._fire_count = 0
+            self._condition.notify()
+            return self._generation
+
+    def stop(self, generation: int):
+        """
+        Ends guarded section. If the exception was scheduled but has not been raised yet, it is cancelled.
+
+        Safe to call more than once (e.g. again after catching `_TickTimeout`, in case it was raised inside `stop` itself). Does nothing if a newer section has started.
+        """
+        with self._condition:
+            if generation != self._generation or self._deadline is None:
+                return
+            self._deadline = None
+            if self._fired:
+                self._fired = False
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._target_thread_id), None)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.perf_counter()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                if self._fire_count > 0:
+                    print("Tick is still running after being interrupted (is the interrupt caught by a bare `except:`?), interrupting again", file=sys.stderr)
+                self._deadline = time.perf_counter() + _REFIRE_INTERVAL
+                self._fired = True
+                self._fire_count += 1
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._target_thread_id), ctypes.py_object(_TickTimeout))
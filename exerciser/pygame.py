@@ -1,121 +1,436 @@
 from collections import deque
-from typing import Sequence
-import os
+import functools
+from typing import TYPE_CHECKING, Callable, Literal, Sequence
 import math
+import threading
+import numpy as np
 import pygame
-from matplotlib.backends.backend_agg import FigureCanvasAgg
+from ._shared import TextCache, _load_font
+
+if TYPE_CHECKING:
+    # Matplotlib is only needed by exercises that draw figures, so it is not imported at runtime (figures are created by the exercise anyway)
+    from matplotlib.artist import Artist
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 # Types copied from pygame/_common.pyi
 Coordinate = tuple[float, float] | Sequence[float] | pygame.Vector2
 ColorValue = pygame.Color | int | str | tuple[int, int, int] | tuple[int, int, int, int] | Sequence[int]
 
-# TODO: Make these functions use anti-aliasing so the lines look nicer.
+# Note: All drawing functions below have batched versions (e.g. `draw_springs` for `draw_spring`), which take arrays of coordinates (shape `(n, 2)`)
+# and compute the vertices of all primitives in one vectorized pass. Prefer them when drawing many primitives of the same kind.
+# The `antialias` option uses anti-aliased lines with floating point vertices (only for `width=1`, wider lines are drawn without anti-aliasing).
 
-def draw_dashed_line(surface: pygame.Surface, color: ColorValue, start: Coordinate, end: Coordinate, pattern: tuple[int, int], width: int = 1):
-    axis = pygame.Vector2(end) - pygame.Vector2(start)
-    if axis.length_squared() == 0.0:
-        return
-    length = axis.length()
-    axis.normalize_ip()
+def draw_dashed_line(surface: pygame.Surface, color: ColorValue, start: Coordinate, end: Coordinate, pattern: tuple[int, int], width: int = 1, *, antialias: bool = False):
+    draw_dashed_lines(surface, color, [start], [end], pattern, width, antialias=antialias)
 
-    # TODO: The individual dashes appear misaligned due to rounding of dash start and end coordinates. Is there some way to improve this? 
+def draw_dashed_lines(surface: pygame.Surface, color: ColorValue, starts: np.ndarray | Sequence[Coordinate], ends: np.ndarray | Sequence[Coordinate],
+                      pattern: tuple[int, int], width: int = 1, *, antialias: bool = False):
+    """
+    Draws dashed lines from each point in `starts` to the corresponding point in `ends`.
+    Like in `draw_dashed_line`, each line starts with a dash and the last dash may extend past the end point.
+    """
+    starts, axes, lengths = _line_axes(starts, ends)
+    if len(lengths) == 0:
+        return
     dash_length, gap_length = pattern
-    pos = 0
-    pos_vec = pygame.Vector2(start)
-    while pos < length:
-        pygame.draw.line(surface, color, pos_vec, pos_vec + dash_length * axis, width)
-        pos += dash_length + gap_length
-        pos_vec += (dash_length + gap_length) * axis
-
-def draw_arrow(surface: pygame.Surface, color: ColorValue, start_pos: Coordinate, offset: Coordinate, width: int):
-    end_pos_vec = pygame.Vector2(start_pos[0] + offset[0], start_pos[1] + offset[1])
-    dir_vec = pygame.Vector2(offset[0], offset[1])
-    length = min(8, dir_vec.length())
-    if dir_vec.length_squared() > 0:
-        dir_vec.normalize_ip()
-    pygame.draw.line(surface, color, start_pos, end_pos_vec, width)
-    pygame.draw.lines(surface, color, False, [end_pos_vec + dir_vec.rotate(140) * length, end_pos_vec, end_pos_vec + dir_vec.rotate(220) * length], width)
-
-def draw_spring(surface: pygame.Surface, color: ColorValue, start: Coordinate, end: Coordinate, coil_count: int, coil_width: int, end_length = 5, width: int = 1):
-    axis = pygame.Vector2(end) - pygame.Vector2(start)
-    if axis.length_squared() == 0.0:
+    # Dashes of all lines in one flat array: line_indexes[i] is the line of dash i, which starts at dash_offsets[i] along it
+    counts = np.ceil(lengths / (dash_length + gap_length)).astype(int)
+    line_indexes = np.repeat(np.arange(len(counts)), counts)
+    dash_offsets = _dash_offsets(dash_length, gap_length, counts.max())[np.arange(len(line_indexes)) - np.repeat(np.cumsum(counts) - counts, counts)]
+    dash_start_points = starts[line_indexes] + dash_offsets[:, None] * axes[line_indexes]
+    dash_end_points = dash_start_points + dash_length * axes[line_indexes]
+    if width == 1 and not antialias and surface.get_bytesize() != 3:
+        _draw_thin_lines(surface, color, dash_start_points, dash_end_points)
+        return
+    # Note: Pygame has no batched call for wide or anti-aliased lines
+    draw_line = pygame.draw.aaline if antialias and width == 1 else pygame.draw.line
+    for dash_start, dash_end in zip(dash_start_points.tolist(), dash_end_points.tolist()):
+        draw_line(surface, color, dash_start, dash_end, width)
+
+def draw_arrow(surface: pygame.Surface, color: ColorValue, start_pos: Coordinate, offset: Coordinate, width: int, *, antialias: bool = False):
+    draw_arrows(surface, color, [start_pos], [offset], width, antialias=antialias)
+
+def draw_arrows(surface: pygame.Surface, color: ColorValue, start_positions: np.ndarray | Sequence[Coordinate], offsets: np.ndarray | Sequence[Coordinate],
+                width: int, *, antialias: bool = False):
+    """Draws arrows from each point in `start_positions` to that point plus the corresponding element of `offsets`. Each arrow is drawn as a single polyline."""
+    starts = np.asarray(start_positions, dtype=float).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=float).reshape(-1, 2)
+    ends = starts + offsets
+    lengths = np.hypot(offsets[:, 0], offsets[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        directions = np.where(lengths[:, None] > 0, offsets / lengths[:, None], 0.0)
+    head_lengths = np.minimum(lengths, 8)[:, None]
+    # Polyline start -> end -> left head -> end -> right head
+    vertices = np.stack([
+        starts,
+        ends,
+        ends + (directions @ _ARROW_HEAD_ROTATIONS[0]) * head_lengths,
+        ends,
+        ends + (directions @ _ARROW_HEAD_ROTATIONS[1]) * head_lengths,
+    ], axis=1)
+    _draw_polylines(surface, color, vertices, width, antialias)
+
+def draw_spring(surface: pygame.Surface, color: ColorValue, start: Coordinate, end: Coordinate, coil_count: int, coil_width: int, end_length = 5, width: int = 1, *, antialias: bool = False):
+    draw_springs(surface, color, [start], [end], coil_count, coil_width, end_length, width, antialias=antialias)
+
+def draw_springs(surface: pygame.Surface, color: ColorValue, starts: np.ndarray | Sequence[Coordinate], ends: np.ndarray | Sequence[Coordinate],
+                 coil_count: int, coil_width: int, end_length: float = 5, width: int = 1, *, antialias: bool = False):
+    """Draws springs from each point in `starts` to the corresponding point in `ends`. Each spring is drawn as a single polyline."""
+    starts, axes, lengths = _line_axes(starts, ends)
+    if len(lengths) == 0:
         return
-    coil_height = (axis.length() - 2 * end_length) / (2 * coil_count)
-    axis.normalize_ip()
-    coil_line = pygame.Vector2(coil_height, coil_width).rotate(pygame.Vector2(1, 0).angle_to(axis))
-    coil_reverse_line = coil_line.reflect(pygame.Vector2(-axis.y, axis.x))
-
-    pos = pygame.Vector2(start)
-    pygame.draw.line(surface, color, pos, pos + end_length * axis, width)
-    pos += end_length * axis
-    pygame.draw.line(surface, color, pos, pos + 0.5 * coil_line, width)
-    pos += 0.5 * coil_line
-    pygame.draw.line(surface, color, pos, pos + coil_reverse_line, width)
-    pos += coil_reverse_line
-    for _ in range(coil_count - 1):
-        pygame.draw.line(surface, color, pos, pos + coil_line, width)
-        pos += coil_line
-        pygame.draw.line(surface, color, pos, pos + coil_reverse_line, width)
-        pos += coil_reverse_line
-    pygame.draw.line(surface, color, pos, pos + 0.5 * coil_line, width)
-    pos += 0.5 * coil_line
-    pygame.draw.line(surface, color, pos, end, width)
-
-def draw_figure(surface: pygame.Surface, canvas: FigureCanvasAgg, left: float, top: float, width: float, height: float):
+    fixed, proportional, perpendicular = _spring_template(coil_count)
+    normals = np.column_stack((-axes[:, 1], axes[:, 0]))
+    # Position of each vertex along the spring is end_length * fixed + length * proportional, so the coils stretch while the ends keep their length
+    along = end_length * fixed + lengths[:, None] * proportional
+    vertices = starts[:, None] + along[:, :, None] * axes[:, None] + (coil_width * perpendicular)[None, :, None] * normals[:, None]
+    _draw_polylines(surface, color, vertices, width, antialias)
+
+_ARROW_HEAD_ROTATIONS = np.array([
+    [[math.cos(math.radians(angle)), math.sin(math.radians(angle))], [-math.sin(math.radians(angle)), math.cos(math.radians(angle))]]
+    for angle in (140, 220)
+])
+"""Matrices that rotate a row vector by 140 and 220 degrees (same direction as `pygame.Vector2.rotate`)"""
+
+def _line_axes(starts: np.ndarray | Sequence[Coordinate], ends: np.ndarray | Sequence[Coordinate]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns start points, unit direction vectors and lengths of the given lines, skipping lines with zero length"""
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    axes = np.asarray(ends, dtype=float).reshape(-1, 2) - starts
+    lengths = np.hypot(axes[:, 0], axes[:, 1])
+    nonzero = lengths > 0
+    if not nonzero.all():
+        starts, axes, lengths = starts[nonzero], axes[nonzero], lengths[nonzero]
+    return starts, axes / lengths[:, None], lengths
+
+@functools.lru_cache(maxsize=32)
+def _spring_template(coil_count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vertices of a spring with the given number of coils in local coordinates, as coefficients of end length and total length (along the spring)
+    and of coil width (perpendicular to the spring).
+    """
+    # Steps along the coiled part of the spring in units of half coils: the first and last steps are quarter coils
+    coil_steps = np.concatenate(([0.0, 0.5], np.arange(1.5, 2 * coil_count, 1.0), [2 * coil_count]))
+    proportional = np.concatenate(([0.0], coil_steps / (2 * coil_count), [1.0]))
+    fixed = np.concatenate(([0.0], 1 - 2 * coil_steps / (2 * coil_count), [0.0]))
+    zigzag = np.where(np.arange(len(coil_steps) - 2) % 2 == 0, 0.5, -0.5)
+    perpendicular = np.concatenate(([0.0, 0.0], zigzag, [0.0, 0.0]))
+    return fixed, proportional, perpendicular
+
+_dash_templates: dict[tuple[float, float], np.ndarray] = {}
+
+def _dash_offsets(dash_length: float, gap_length: float, count: int) -> np.ndarray:
+    """Start positions of (at least) the first `count` dashes along a line with the given pattern. Cached per pattern and grown as needed."""
+    offsets = _dash_templates.get((dash_length, gap_length))
+    if offsets is None or len(offsets) < count:
+        if len(_dash_templates) >= 32:
+            _dash_templates.clear()
+        offsets = _dash_templates[(dash_length, gap_length)] = np.arange(max(count, 64)) * float(dash_length + gap_length)
+    return offsets
+
+def _draw_thin_lines(surface: pygame.Surface, color: ColorValue, starts: np.ndarray, ends: np.ndarray):
+    """
+    Draws lines of width 1 from each point in `starts` to the corresponding point in `ends` by writing all of their pixels at once.
+    Produces the same pixels as `pygame.draw.line` (coordinates are truncated and each line is rasterized with the same Bresenham algorithm).
+    """
+    x1, y1 = starts.astype(int).T
+    x2, y2 = ends.astype(int).T
+    dx, dy = np.abs(x2 - x1), np.abs(y2 - y1)
+    x_major = dx > dy
+    major = np.maximum(np.where(x_major, dx, dy), 1)
+    minor = np.where(x_major, dy, dx)
+    # Pixel i of each line is i steps along the major axis, and the closed form of Bresenham's error term gives the steps along the minor axis
+    counts = np.maximum(dx, dy) + 1
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    minor_steps = (steps * np.repeat(minor, counts) + np.repeat(major - 1 - major // 2, counts)) // np.repeat(major, counts)
+    x_major = np.repeat(x_major, counts)
+    xs = np.repeat(x1, counts) + np.repeat(np.where(x1 < x2, 1, -1), counts) * np.where(x_major, steps, minor_steps)
+    ys = np.repeat(y1, counts) + np.repeat(np.where(y1 < y2, 1, -1), counts) * np.where(x_major, minor_steps, steps)
+    clip = surface.get_clip()
+    visible = (xs >= clip.left) & (xs < clip.right) & (ys >= clip.top) & (ys < clip.bottom)
+    pixels = pygame.surfarray.pixels2d(surface)
+    try:
+        # Like in `pygame.draw`, integer colors are already mapped to the pixel format of the surface
+        pixels[xs[visible], ys[visible]] = color if isinstance(color, int) else surface.map_rgb(pygame.Color(color))
+    finally:
+        del pixels
+
+def _draw_polylines(surface: pygame.Surface, color: ColorValue, vertices: np.ndarray, width: int, antialias: bool):
+    """Draws each element of `vertices` (shape (n, vertex count, 2)) as a polyline"""
+    if antialias and width == 1:
+        for points in vertices.tolist():
+            pygame.draw.aalines(surface, color, False, points)
+    else:
+        for points in vertices.tolist():
+            pygame.draw.lines(surface, color, False, points, width)
+
+def draw_figure(surface: pygame.Surface, canvas: 'FigureCanvasAgg', left: float, top: float, width: float, height: float):
     """Draws the Matplotlib figure attached to the given canvas"""
-    width, height = int(width), int(height)
-    size = canvas.get_width_height(physical=True)
-    if width != size[0] or height != size[1]:
-        # Note: No layout engine (the default) generally does not work well when resizing figures, so we automatically apply tight layout.
-        # Keeping tight layout (or any layout engine) constantly enabled is not desireable, because it hurts drawing performance.
-        dpi = canvas.figure.get_dpi()
-        canvas.figure.set_size_inches((width + 0.25) / dpi, (height + 0.25) / dpi, forward=False)
-        canvas.figure.tight_layout()
-        size = canvas.get_width_height(physical=True)
+    size, _ = _resize_figure(canvas, width, height)
     canvas.draw()
-    image = pygame.image.frombuffer(canvas.buffer_rgba(), size, 'RGBA').convert()
+    image = pygame.image.frombuffer(canvas.buffer_rgba(), size, 'RGBA')
+    if pygame.display.get_surface() is not None:
+        # Converting requires a display mode to be set, which is not the case when drawing headless
+        image = image.convert()
     surface.blit(image, (left, top))
 
+def _resize_figure(canvas: 'FigureCanvasAgg', width: float, height: float) -> tuple[tuple[int, int], bool]:
+    """Resizes figure to match the given size in pixels. Returns the new size and whether the figure was resized."""
+    width, height = int(width), int(height)
+    size = canvas.get_width_height(physical=True)
+    if width == size[0] and height == size[1]:
+        return size, False
+    # Note: No layout engine (the default) generally does not work well when resizing figures, so we automatically apply tight layout.
+    # Keeping tight layout (or any layout engine) constantly enabled is not desireable, because it hurts drawing performance.
+    dpi = canvas.figure.get_dpi()
+    canvas.figure.set_size_inches((width + 0.25) / dpi, (height + 0.25) / dpi, forward=False)
+    canvas.figure.tight_layout()
+    return canvas.get_width_height(physical=True), True
+
+class FigureRenderer:
+    """
+    Retained-mode alternative to `draw_figure` for Matplotlib figures that change every frame.
+
+    The static parts of the figure (axes, ticks, labels, etc.) are rendered once and cached.
+    On each frame only the artists in `animated` are redrawn on top of the cached background.
+    Call `invalidate` after changing anything that is not in `animated` (e.g. axis limits).
+
+    If `threaded` is true, the figure is rendered on a background thread and `draw` shows the most recently finished frame,
+    so a slow figure never stalls the simulation. In threaded mode the figure must only be modified inside callbacks passed to `update`.
+    """
+
+    def __init__(self, canvas: 'FigureCanvasAgg', animated: 'Sequence[Artist]' = (), *, threaded: bool = False):
+        self._canvas = canvas
+        self._animated = list(animated)
+        for artist in self._animated:
+            artist.set_animated(True)
+        self._background = None
+        self._image: pygame.Surface | None = None
+        self._image_source = None
+
+        self._threaded = threaded
+        if threaded:
+            self._condition = threading.Condition()
+            self._size: tuple[int, int] | None = None
+            self._update: Callable[[], None] | None = None
+            self._dirty = False
+            self._invalidated = False
+            self._stopped = False
+            self._frame: tuple[tuple[int, int], bytes] | None = None
+            self._error: Exception | None = None
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def invalidate(self):
+        """Re-renders the static background on the next frame"""
+        if not self._threaded:
+            self._background = None
+            return
+        with self._condition:
+            self._invalidated = True
+            self._dirty = True
+            self._condition.notify()
+
+    def update(self, callback: Callable[[], None]):
+        """
+        Runs `callback` to modify the figure before the next frame is rendered.
+        
+        In threaded mode `callback` runs on the rendering thread. If several callbacks are submitted before the rendering thread gets to them, only the latest one is run.
+        """
+        if not self._threaded:
+            callback()
+            return
+        with self._condition:
+            self._update = callback
+            self._dirty = True
+            self._condition.notify()
+
+    def draw(self, surface: pygame.Surface, left: float, top: float, width: float, height: float):
+        """Draws the figure on `surface`. In threaded mode draws the most recently finished frame (if any)."""
+        if not self._threaded:
+            size = self._render(width, height)
+            buffer = self._canvas.buffer_rgba()
+            if self._image is None or self._image_source is not buffer.obj:
+                # Buffer changes only if the figure is resized, so the same surface can be reused between frames
+                self._image = pygame.image.frombuffer(buffer, size, 'RGBX')
+                self._image_source = buffer.obj
+            surface.blit(self._image, (left, top))
+            return
+
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            if self._size != (int(width), int(height)):
+                self._size = (int(width), int(height))
+                self._dirty = True
+                self._condition.notify()
+            frame = self._frame
+        if frame is not None:
+            if frame[1] is not self._image_source:
+                self._image = pygame.image.frombuffer(frame[1], frame[0], 'RGBX')
+                self._image_source = frame[1]
+            surface.blit(self._image, (left, top)) # type: ignore
+    
+    def close(self):
+        """Stops the rendering thread (if any)"""
+        if self._threaded:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify()
+            self._thread.join()
+    
+    def _render(self, width: float, height: float) -> tuple[int, int]:
+        size, resized = _resize_figure(self._canvas, width, height)
+        if resized or self._background is None:
+            self._canvas.draw()
+            self._background = self._canvas.copy_from_bbox(self._canvas.figure.bbox)
+        else:
+            self._canvas.restore_region(self._background)
+        for artist in self._animated:
+            self._canvas.figure.draw_artist(artist)
+        return size
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not (self._dirty and self._size is not None):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                size = self._size
+                update, self._update = self._update, None
+                if self._invalidated:
+                    self._invalidated = False
+                    self._background = None
+                self._dirty = False
+            try:
+                if update is not None:
+                    update()
+                size = self._render(*size) # type: ignore
+                frame = (size, bytes(self._canvas.buffer_rgba()))
+            except Exception as e:
+                with self._condition:
+                    self._error = e
+                return
+            with self._condition:
+                self._frame = frame
+
+class StaticLayer:
+    """
+    Caches static content (e.g. a background or a plant diagram) on its own surface.
+    
+    `draw_content` is called to redraw the layer only when it is first drawn, after `invalidate` and when the size changes.
+    Otherwise drawing the layer is a single blit. This is especially useful in dirty rect mode (see `Simulation.use_dirty_rects`).
+    """
+
+    def __init__(self, draw_content: Callable[[pygame.Surface], None], *, transparent: bool = False):
+        self._draw_content = draw_content
+        self._transparent = transparent
+        self._surface: pygame.Surface | None = None
+    
+    def invalidate(self):
+        """Redraws the content on next draw"""
+        self._surface = None
+
+    def draw(self, surface: pygame.Surface, left: float, top: float, width: float, height: float, area: pygame.Rect | None = None) -> bool:
+        """
+        Draws the layer on `surface`. Returns True if the content of the layer was redrawn.
+
+        Args:
+            area: if specified, only this part of `surface` is drawn (e.g. to erase an object that has moved)
+        """
+        size = (int(width), int(height))
+        redrawn = self._surface is None or self._surface.get_size() != size
+        if redrawn:
+            self._surface = pygame.Surface(size, pygame.SRCALPHA if self._transparent else 0)
+            if self._transparent:
+                self._surface.fill((0, 0, 0, 0))
+            self._draw_content(self._surface)
+        if area is None:
+            surface.blit(self._surface, (left, top)) # type: ignore
+        else:
+            source_area = pygame.Rect(area).move(-left, -top)
+            surface.blit(self._surface, (source_area.x + left, source_area.y + top), source_area) # type: ignore
+        return redrawn
+
 _setup_done = False
 
+_AXES_LAYER_MARGIN = 32
+"""Margin in pixels around cached axes, for labels that extend past the edges of the plot"""
+
 class LinePlot:
-    """Pygame based line plot. More limited than Matplotlib, but also much more performant."""
+    """
+    Pygame based line plot. More limited than Matplotlib, but also much more performant.
+
+    When there are more points than horizontal pixels, lines are decimated before drawing:
+    * `'minmax'` (default) keeps the first, minimum, maximum and last point in each pixel column. This preserves the envelope of the data exactly.
+    * `'lttb'` uses the Largest-Triangle-Three-Buckets algorithm, which keeps one visually significant point per pixel column.
+    * `None` disables decimation.
+
+    A line can show many instances of the same quantity on shared axes (e.g. one per instance of a `BatchSimulation`) by setting `instances` in `add_line`.
+    For such lines `add_data` takes an array with one value per instance, and `show_instances` selects which instances are drawn (e.g. only the best few).
+    Instances are always decimated using min/max per pixel column (unless decimation is disabled).
 
-    def __init__(self, *, x_label: str, x_range: float, x_formatter: str = "{}"):
+    The bounding boxes and axis labels are rendered into a cached layer, which is only re-rendered when the size of the plot changes.
+    The y-axis of each line is cached separately and only re-rendered when its bounds move by at least a pixel. Tick labels are rendered once and reused.
+    If `scrolling` is true, the x-axis ticks are also rendered once for twice the visible range and shifted by blitting as the plot scrolls
+    (tick labels are then clipped at the edges of the plot).
+    """
+
+    def __init__(self, *, x_label: str, x_range: float, x_formatter: str = "{}", decimation: Literal['minmax', 'lttb'] | None = 'minmax',
+                 scrolling: bool = False):
         self._x_label = x_label
         self._x_range = x_range
         self._x_formatter = x_formatter
+        self._decimation = decimation
+        self._scrolling = scrolling
         self._lines: list[_LinePlotLine] = []
+        self._shown_instances: np.ndarray | None = None
+        self._text_cache = TextCache()
+        self._frame_layer: pygame.Surface | None = None
+        self._frame_layer_key: tuple | None = None
+        self._x_strip: pygame.Surface | None = None
+        self._x_strip_key: tuple | None = None
+        self._x_strip_start = 0.0
     
     def add_line(self, *, label: str, color: ColorValue, 
-                 bounds: tuple[float, float] | None = None, range: float | None = None, formatter: str = "{}"):
-        line = _LinePlotLine(label, color, bounds, range, formatter)
+                 bounds: tuple[float, float] | None = None, range: float | None = None, formatter: str = "{}", instances: int | None = None):
+        if bounds is not None and bounds[0] == bounds[1]:
+            # Explicit bounds are used as is, so equal bounds would make the line's scale infinite
+            raise ValueError(f"Bounds must not be equal, got {bounds}")
+        if instances is None:
+            line = _LinePlotLine(label, color, bounds, range, formatter, self._decimation)
+        else:
+            line = _LinePlotBatchLine(label, color, bounds, range, formatter, self._decimation, instances)
         self._lines.append(line)
     
-    def add_data(self, x: float, y: Sequence[float]):
+    def add_data(self, x: float, y: Sequence[float | Sequence[float] | np.ndarray]):
+        """Adds a point to each line. For lines with `instances` set, the corresponding element of `y` should contain one value per instance."""
         assert len(y) == len(self._lines)
         for y_l, line in zip(y, self._lines):
-            while line._points and x - line._points[0][0] > self._x_range:
-                line._points.popleft()
-            line._points.append((x, y_l))
+            line._add_point(x, y_l, self._x_range) # type: ignore
+    
+    def show_instances(self, indices: Sequence[int] | np.ndarray | None):
+        """Selects which instances are drawn for lines with `instances` set (e.g. `simulation.best(5)`). None shows all instances."""
+        self._shown_instances = None if indices is None else np.asarray(indices, dtype=int)
     
     def clear(self):
         for line in self._lines:
-            line._points.clear()
+            line._clear()
+        self._x_strip_key = None
 
     def draw(self, surface: pygame.Surface, left: float, top: float, width: float, height: float):
         global _setup_done, _axes_font
         if not _setup_done:
             _setup_done = True
-            _axes_font = pygame.font.Font(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Roboto-Regular-Modified.ttf'), 16)
+            _axes_font = _load_font(16)
 
         top += 2
         left += 2
         width -= 5
         height -= 5
 
-        x_min = min((line._points[0][0] for line in self._lines if line._points), default=0.0)
-        x_max = max((line._points[-1][0] for line in self._lines if line._points), default=0.0)
+        x_min = min((line._points.first_x() for line in self._lines if line._points), default=0.0)
+        x_max = max((line._points.last_x() for line in self._lines if line._points), default=0.0)
         x_start = max(x_min, x_max - self._x_range)
         x_bounds = (x_start, x_start + self._x_range)
 
@@ -127,84 +442,433 @@ class LinePlot:
         padded_width = width - axis_width
 
         line_height = (height - axis_height) / len(self._lines)
-        
-        # Draw plot lines and top line of each bounding box
+        axis_top = top + height - axis_height
+
+        # Draw bounding boxes and x-axis label from a cached layer (positioned at whole pixels, so the layer also depends on the fractional part of the position)
+        origin = (math.floor(left) - _AXES_LAYER_MARGIN, math.floor(top) - _AXES_LAYER_MARGIN)
+        layer_key = (width, height, left - origin[0], top - origin[1], _axes_font)
+        if layer_key != self._frame_layer_key or self._frame_layer is None:
+            self._frame_layer_key = layer_key
+            self._frame_layer = self._render_frame_layer(left - origin[0], top - origin[1], width, height, axis_width, axis_height, line_height)
+        surface.blit(self._frame_layer, origin)
+
+        # Draw plot lines and y-axes
         for i, line in enumerate(self._lines):
             # TODO: Calculate correct height that accounts for padding
             line_top = top + i * line_height
-            line._draw(surface, padded_left, line_top, padded_width, line_height, axis_width, pad, x_bounds)
-            pygame.draw.line(surface, 'black', (padded_left, line_top), (padded_left + padded_width, line_top))
-        
+            y_bounds = line._y_bounds(self._shown_instances)
+            line._draw(surface, padded_left, line_top, padded_width, line_height, pad, x_bounds, y_bounds, self._shown_instances)
+            line._draw_axis(surface, padded_left, line_top, line_height, axis_width, pad, y_bounds, self._text_cache)
+
+        # Draw x-axis ticks
+        x_scaler = (padded_width - 2 * pad) / (x_bounds[1] - x_bounds[0])
+        if self._scrolling:
+            self._draw_scrolling_x_ticks(surface, padded_left, padded_width, axis_top, pad, x_bounds, x_scaler)
+        else:
+            step, indexes = _plot_calculate_steps(x_bounds, 10) # TODO: Smarter step calculation
+            self._draw_x_ticks(surface, padded_left + pad, axis_top, x_bounds[0], x_scaler, step, indexes)
+
+    def _render_frame_layer(self, left: float, top: float, width: float, height: float, axis_width: float, axis_height: float,
+                            line_height: float) -> pygame.Surface:
+        """Renders bounding boxes and x-axis label onto a transparent surface, with the plot at (`left`, `top`)"""
+        layer = pygame.Surface((math.ceil(left + width) + _AXES_LAYER_MARGIN, math.ceil(top + height) + _AXES_LAYER_MARGIN), pygame.SRCALPHA)
+
+        padded_left = left + axis_width
+        padded_width = width - axis_width
         axis_top = top + height - axis_height
 
+        # Draw top line of each bounding box
+        for i in range(len(self._lines)):
+            line_top = top + i * line_height
+            pygame.draw.line(layer, 'black', (padded_left, line_top), (padded_left + padded_width, line_top))
+
         # Draw remaining bounding box lines
-        pygame.draw.line(surface, 'black', (padded_left, axis_top), (padded_left + padded_width, axis_top))
-        pygame.draw.line(surface, 'black', (padded_left, top), (padded_left, axis_top))
-        pygame.draw.line(surface, 'black', (padded_left + padded_width, top), (padded_left + padded_width, axis_top))
+        pygame.draw.line(layer, 'black', (padded_left, axis_top), (padded_left + padded_width, axis_top))
+        pygame.draw.line(layer, 'black', (padded_left, top), (padded_left, axis_top))
+        pygame.draw.line(layer, 'black', (padded_left + padded_width, top), (padded_left + padded_width, axis_top))
 
-        # Draw x-axis ticks
-        x_offset, x_scaler = -x_bounds[0], (padded_width - 2 * pad) / (x_bounds[1] - x_bounds[0])
-        step, indexes = _plot_calculate_steps(x_bounds, 10) # TODO: Smarter step calculation
+        # Draw x-axis label
+        label = self._text_cache.render(_axes_font, self._x_label, 'black') # type: ignore
+        layer.blit(label, (padded_left + padded_width / 2, axis_top + 22))
+        # The layer is mostly transparent, so run-length encoding makes blitting it several times faster.
+        # Note: Drawing on a run-length encoded surface decodes it again, so the layer is never modified after this.
+        layer.set_alpha(255, pygame.RLEACCEL)
+        return layer
+
+    def _draw_x_ticks(self, surface: pygame.Surface, origin: float, axis_top: float, x_start: float, x_scaler: float, step: float, indexes: range):
         for i in indexes:
             value = i * step
-            x = padded_left + pad + (value + x_offset) * x_scaler
+            x = origin + (value - x_start) * x_scaler
             pygame.draw.line(surface, 'black', (x, axis_top), (x, axis_top + 5))
-            label = _axes_font.render(self._x_formatter.format(value), True, 'black') # type: ignore
+            label = self._text_cache.render(_axes_font, self._x_formatter.format(value), 'black') # type: ignore
             surface.blit(label, (x - label.get_width() / 2, axis_top + 5))
-        
-        # Draw x-axis label
-        label = _axes_font.render(self._x_label, True, 'black') # type: ignore
-        surface.blit(label, (padded_left + padded_width / 2, axis_top + 22))
+
+    def _draw_scrolling_x_ticks(self, surface: pygame.Surface, padded_left: float, padded_width: float, axis_top: float, pad: float,
+                                x_bounds: tuple[float, float], x_scaler: float):
+        """Draws x-axis ticks by blitting part of a strip of ticks rendered for twice the visible range. The strip is re-rendered once the plot scrolls past it."""
+        strip_key = (padded_width, _axes_font)
+        strip_end = self._x_strip_start + 2 * self._x_range
+        if strip_key != self._x_strip_key or self._x_strip is None or x_bounds[0] < self._x_strip_start or x_bounds[1] > strip_end:
+            self._x_strip_key = strip_key
+            self._x_strip_start = x_bounds[0]
+            strip_end = x_bounds[0] + 2 * self._x_range
+            # Step only depends on the visible range, so it is the same as for non-scrolling ticks
+            step, _ = _plot_calculate_steps(x_bounds, 10) # TODO: Smarter step calculation
+            indexes = range(math.ceil(x_bounds[0] / step - 0.001), math.floor(strip_end / step + 0.001) + 1)
+            width = math.ceil(2 * self._x_range * x_scaler + 2 * pad) + 2 * _AXES_LAYER_MARGIN
+            self._x_strip = pygame.Surface((width, _axes_font.get_linesize() + 5), pygame.SRCALPHA) # type: ignore
+            self._draw_x_ticks(self._x_strip, _AXES_LAYER_MARGIN + pad, 0, x_bounds[0], x_scaler, step, indexes)
+            self._x_strip.set_alpha(255, pygame.RLEACCEL)
+        scroll = round(_AXES_LAYER_MARGIN + (x_bounds[0] - self._x_strip_start) * x_scaler)
+        surface.blit(self._x_strip, (padded_left, axis_top), pygame.Rect(scroll, 0, math.ceil(padded_width), self._x_strip.get_height()))
 
 class _LinePlotLine:
-    def __init__(self, label: str, color: ColorValue, bounds: tuple[float, float] | None, range: float | None, formatter: str):
+    def __init__(self, label: str, color: ColorValue, bounds: tuple[float, float] | None, range: float | None, formatter: str,
+                 decimation: Literal['minmax', 'lttb'] | None):
         self._label = label
         self._color = color
         self._bounds = bounds
         self._range = range
         self._formatter = formatter
-        self._points = deque() # NB: deque is fast to index from start and end, but not middle
+        self._decimation = decimation
+        self._points = _PointBuffer()
+        # Decimation state. Created on first draw, because bucket width depends on the width of the plot.
+        self._bucket_width: float | None = None
+        self._minmax: _MinMaxDecimator | None = None
+        self._lttb_cache: dict[int, tuple[float, float]] = {}
+        self._rotated_label: tuple[pygame.font.Font, pygame.Surface] | None = None
+        self._axis_surface: pygame.Surface | None = None
+        self._axis_key: tuple | None = None
+    
+    def _add_point(self, x: float, y: float, x_range: float):
+        points = self._points
+        while points and x - points.first_x() > x_range:
+            points.popleft()
+        points.append(x, y)
+        if self._minmax is not None:
+            self._minmax.add(x, y, x_range)
+    
+    def _clear(self):
+        self._points.clear()
+        self._bucket_width = None
+        self._minmax = None
+        self._lttb_cache.clear()
+    
+    def _decimated_points(self, x_range: float, columns: int) -> np.ndarray:
+        points = self._points.view()
+        if self._decimation is None or columns <= 0 or len(points) <= columns:
+            return points
 
-    def _draw(self, surface: pygame.Surface, left: float, top: float, width: float, height: float,
-              axis_width: float, pad: float, x_bounds: tuple[float, float]):
+        bucket_width = x_range / columns
+        if bucket_width != self._bucket_width:
+            # Plot has been resized, so recalculate from scratch
+            self._bucket_width = bucket_width
+            self._lttb_cache.clear()
+            self._minmax = None
+            if self._decimation == 'minmax':
+                self._minmax = _MinMaxDecimator(bucket_width)
+                for x, y in points.tolist():
+                    self._minmax.add(x, y, x_range)
+
+        if self._minmax is not None:
+            return self._minmax.points.view()
+        return _lttb(points, bucket_width, self._lttb_cache)
+
+    def _data_y_bounds(self, instances: np.ndarray | None) -> tuple[float, float] | None:
+        return self._points.y_bounds()
+
+    def _y_bounds(self, instances: np.ndarray | None) -> tuple[float, float]:
         if self._bounds is not None:
             y_bounds = self._bounds
         else:
-            y_bounds = (min((y for _, y in self._points), default=0.0), max((y for _, y in self._points), default=0.0))
+            y_bounds = self._data_y_bounds(instances) or (0.0, 0.0)
             if self._range is not None and y_bounds[1] - y_bounds[0] < self._range:
                 y_bounds_center = sum(y_bounds) / 2
                 y_bounds = (y_bounds_center - self._range / 2, y_bounds_center + self._range / 2)
-        
+            if y_bounds[1] <= y_bounds[0]:
+                # Avoid division by zero for constant data
+                y_bounds = (y_bounds[0] - 0.5, y_bounds[1] + 0.5)
+        return y_bounds
+
+    def _draw(self, surface: pygame.Surface, left: float, top: float, width: float, height: float,
+              pad: float, x_bounds: tuple[float, float], y_bounds: tuple[float, float], instances: np.ndarray | None):
         x_offset, x_scaler = -x_bounds[0], (width - 2 * pad) / (x_bounds[1] - x_bounds[0])
         y_offset, y_scaler = -y_bounds[1], (height - 2 * pad) / (y_bounds[0] - y_bounds[1])
         
-        # Split plot line into segments
-        segments = [[]]
-        for x, y in self._points:
-            if math.isnan(y):
-                segments.append([])
-            else:
-                segments[-1].append((left + pad + (x + x_offset) * x_scaler, top + pad + (y + y_offset) * y_scaler))
-        
-        # Draw plot line
-        for points in segments:
-            if len(points) >= 2:
-                pygame.draw.lines(surface, self._color, False, points, 2)
-        
-        # Draw y-axis ticks
+        self._draw_traces(surface, x_bounds[1] - x_bounds[0], int(width - 2 * pad),
+                          (x_offset, y_offset), (x_scaler, y_scaler), (left + pad, top + pad), instances)
+
+    def _draw_axis(self, surface: pygame.Surface, left: float, top: float, height: float, axis_width: float, pad: float,
+                   y_bounds: tuple[float, float], text_cache: TextCache):
+        """Draws y-axis ticks and label from a cached surface, which is only re-rendered if a tick label changed or a tick moved by at least a pixel"""
+        origin = (math.floor(left - axis_width), math.floor(top) - _AXES_LAYER_MARGIN)
+        ticks = self._axis_ticks(top - origin[1], height, pad, y_bounds)
+        key = (height, left - origin[0], top - origin[1], [(round(y), text) for y, text in ticks], _axes_font)
+        if key != self._axis_key or self._axis_surface is None:
+            self._axis_key = key
+            self._axis_surface = pygame.Surface((math.ceil(axis_width) + 2, math.ceil(height) + 2 * _AXES_LAYER_MARGIN), pygame.SRCALPHA)
+            self._render_axis(self._axis_surface, left - origin[0], top - origin[1], height, axis_width, ticks, text_cache)
+        surface.blit(self._axis_surface, origin)
+
+    def _axis_ticks(self, top: float, height: float, pad: float, y_bounds: tuple[float, float]) -> list[tuple[float, str]]:
+        """Returns the position and label of each y-axis tick"""
+        y_offset, y_scaler = -y_bounds[1], (height - 2 * pad) / (y_bounds[0] - y_bounds[1])
         step, indexes = _plot_calculate_steps(y_bounds, 5) # TODO: Smarter step calculation
-        for i in indexes:
-            value = i * step
-            y = top + pad + (value + y_offset) * y_scaler
+        return [(top + pad + (i * step + y_offset) * y_scaler, self._formatter.format(i * step)) for i in indexes]
+
+    def _render_axis(self, surface: pygame.Surface, left: float, top: float, height: float, axis_width: float,
+                     ticks: list[tuple[float, str]], text_cache: TextCache):
+        # Draw y-axis ticks
+        for y, text in ticks:
             pygame.draw.line(surface, 'black', (left, y), (left - 5, y))
-            label = _axes_font.render(self._formatter.format(value), True, 'black')
+            label = text_cache.render(_axes_font, text, 'black') # type: ignore
             surface.blit(label, (left - 5 - label.get_width(), y - label.get_height() / 2))
         
         # Draw y-axis label
-        label = _axes_font.render(self._label, True, 'black')
-        label = pygame.transform.rotate(label, 90)
+        if self._rotated_label is None or self._rotated_label[0] is not _axes_font:
+            self._rotated_label = (_axes_font, pygame.transform.rotate(_axes_font.render(self._label, True, 'black'), 90)) # type: ignore
+        label = self._rotated_label[1]
         surface.blit(label, (left - axis_width, top + height / 2 - label.get_height() / 2))
 
+    def _draw_traces(self, surface: pygame.Surface, x_range: float, columns: int,
+                     offset: tuple[float, float], scaler: tuple[float, float], origin: tuple[float, float], instances: np.ndarray | None):
+        points = self._decimated_points(x_range, columns)
+        _draw_polyline(surface, self._color, (points + offset) * scaler + origin, 2)
+
+class _LinePlotBatchLine(_LinePlotLine):
+    """Line with one trace per instance. Points are stored as rows of `(x, y_0, ..., y_n)` in a single buffer, so adding data is one vectorized operation."""
+
+    def __init__(self, label: str, color: ColorValue, bounds: tuple[float, float] | None, range: float | None, formatter: str,
+                 decimation: Literal['minmax', 'lttb'] | None, instances: int):
+        super().__init__(label, color, bounds, range, formatter, decimation)
+        self._points = _PointBuffer(track_bounds=False, columns=instances + 1)
+
+    def _add_point(self, x: float, y: Sequence[float] | np.ndarray, x_range: float): # type: ignore
+        points = self._points
+        while points and x - points.first_x() > x_range:
+            points.popleft()
+        points.append(x, y)
+
+    def _data_y_bounds(self, instances: np.ndarray | None) -> tuple[float, float] | None:
+        ys = self._points.view()[:, 1:]
+        if instances is not None:
+            ys = ys[:, instances]
+        if ys.size == 0 or np.isnan(ys).all():
+            return None
+        return float(np.nanmin(ys)), float(np.nanmax(ys))
+
+    def _draw_traces(self, surface: pygame.Surface, x_range: float, columns: int,
+                     offset: tuple[float, float], scaler: tuple[float, float], origin: tuple[float, float], instances: np.ndarray | None):
+        points = self._points.view()
+        xs = points[:, 0]
+        ys = points[:, 1:] if instances is None else points[:, 1 + instances]
+        if self._decimation is not None and 0 < columns < len(points):
+            # Keep minimum and maximum of each pixel column for all instances at once.
+            # Unlike single lines this does not preserve the order of points within a column, which is not visible at this scale.
+            buckets = np.floor(xs / (x_range / columns))
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            with np.errstate(invalid='ignore'):
+                minimums = np.fmin.reduceat(ys, starts, axis=0)
+                maximums = np.fmax.reduceat(ys, starts, axis=0)
+            xs = np.repeat(xs[starts], 2)
+            ys = np.empty((2 * len(starts), ys.shape[1]))
+            ys[0::2] = minimums
+            ys[1::2] = maximums
+        screen_xs = (xs + offset[0]) * scaler[0] + origin[0]
+        screen_ys = (ys + offset[1]) * scaler[1] + origin[1]
+        for i in range(ys.shape[1]):
+            _draw_polyline(surface, self._color, np.column_stack((screen_xs, screen_ys[:, i])), 1)
+
+def _draw_polyline(surface: pygame.Surface, color: ColorValue, screen_points: np.ndarray, width: int):
+    """Draws points as a line, split into separate segments at points with NaN y values"""
+    nan_indexes = np.flatnonzero(np.isnan(screen_points[:, 1]))
+    if len(nan_indexes) > 0:
+        segments = np.split(screen_points, nan_indexes)
+        segments = segments[:1] + [segment[1:] for segment in segments[1:]]
+    else:
+        segments = [screen_points]
+    for segment in segments:
+        if len(segment) >= 2:
+            pygame.draw.lines(surface, color, False, segment.tolist(), width)
+
+class _PointBuffer:
+    """
+    Growable circular buffer of (x, y) points with O(1) append and removal from the start.
+
+    Each point is stored twice (at position i and i + capacity), so the contents are always available as one contiguous array.
+    Points have `columns` values: x followed by one or more y values (bounds can only be tracked if there is a single y value).
+    If `track_bounds` is true, minimum and maximum y values are tracked incrementally using monotonic deques. NaN values are ignored for minimum and maximum.
+    """
+
+    def __init__(self, capacity: int = 1024, track_bounds: bool = True, columns: int = 2):
+        assert columns == 2 or not track_bounds
+        self._capacity = capacity
+        self._track_bounds = track_bounds
+        self._columns = columns
+        self._data = np.empty((2 * capacity, columns))
+        self._base = 0 # Absolute index of point stored at position 0
+        self._start = 0 # Absolute index of first point
+        self._end = 0 # Absolute index one past last point
+        self._min: deque[tuple[int, float]] = deque()
+        self._max: deque[tuple[int, float]] = deque()
+    
+    def __len__(self) -> int:
+        return self._end - self._start
+    
+    def append(self, x: float, y: float):
+        if self._end - self._start == self._capacity:
+            self._grow()
+        index = (self._end - self._base) % self._capacity
+        if self._columns == 2:
+            self._data[index] = self._data[index + self._capacity] = (x, y)
+        else:
+            self._data[index, 0] = self._data[index + self._capacity, 0] = x
+            self._data[index, 1:] = self._data[index + self._capacity, 1:] = y
+        if self._track_bounds and not math.isnan(y):
+            while self._min and self._min[-1][1] >= y:
+                self._min.pop()
+            self._min.append((self._end, y))
+            while self._max and self._max[-1][1] <= y:
+                self._max.pop()
+            self._max.append((self._end, y))
+        self._end += 1
+    
+    def popleft(self):
+        assert self._start < self._end
+        if self._min and self._min[0][0] == self._start:
+            self._min.popleft()
+        if self._max and self._max[0][0] == self._start:
+            self._max.popleft()
+        self._start += 1
+    
+    def pop(self):
+        """Removes the last point. Only supported if bounds are not tracked."""
+        assert self._start < self._end and not self._track_bounds
+        self._end -= 1
+    
+    def clear(self):
+        self._base = self._start = self._end = 0
+        self._min.clear()
+        self._max.clear()
+    
+    def first_x(self) -> float:
+        return self._data[(self._start - self._base) % self._capacity, 0]
+    
+    def last_x(self) -> float:
+        return self._data[(self._end - 1 - self._base) % self._capacity, 0]
+
+    def y_bounds(self) -> tuple[float, float] | None:
+        """Minimum and maximum of non-NaN y values, or None if there are no such values (or bounds are not tracked)"""
+        if not self._min:
+            return None
+        return self._min[0][1], self._max[0][1]
+    
+    def view(self) -> np.ndarray:
+        """Returns the points as an array of shape (n, columns). The returned array is a view that is only valid until the buffer is next modified."""
+        offset = (self._start - self._base) % self._capacity
+        return self._data[offset:offset + self._end - self._start]
+    
+    def _grow(self):
+        points = self.view().copy()
+        self._capacity *= 2
+        self._data = np.empty((2 * self._capacity, self._columns))
+        self._data[:len(points)] = points
+        self._data[self._capacity:self._capacity + len(points)] = points
+        self._base = self._start
+
+class _MinMaxDecimator:
+    """
+    Incrementally reduces points to the first, minimum, maximum and last point in each column of width `bucket_width`.
+    Only the last column is recalculated when a point is added. NaN values are kept to preserve gaps in the line.
+    """
+
+    def __init__(self, bucket_width: float):
+        self.bucket_width = bucket_width
+        self.points = _PointBuffer(track_bounds=False)
+        self._column: int | None = None
+        self._first = self._min = self._max = self._last = (0.0, 0.0)
+        self._emitted = 0 # Number of points at the end of `points` that belong to the current column
+    
+    def add(self, x: float, y: float, x_range: float):
+        points = self.points
+        while points and x - points.first_x() > x_range:
+            points.popleft()
+        self._emitted = min(self._emitted, len(points))
+
+        if math.isnan(y):
+            points.append(x, y)
+            self._column = None
+            self._emitted = 0
+            return
+
+        column = math.floor(x / self.bucket_width)
+        if column != self._column:
+            self._column = column
+            self._first = self._min = self._max = self._last = (x, y)
+            points.append(x, y)
+            self._emitted = 1
+            return
+
+        self._last = (x, y)
+        if y < self._min[1]:
+            self._min = (x, y)
+        if y > self._max[1]:
+            self._max = (x, y)
+        for _ in range(self._emitted):
+            points.pop()
+        selected = sorted({self._first, self._min, self._max, self._last})
+        for point in selected:
+            points.append(*point)
+        self._emitted = len(selected)
+
+def _lttb(points: np.ndarray, bucket_width: float, cache: dict[int, tuple[float, float]]) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets decimation with buckets of width `bucket_width`.
+
+    Selected points for buckets that can no longer change are stored in `cache` (keyed by bucket index), so only the last few buckets are recalculated on each call.
+    NaN values are kept to preserve gaps in the line.
+    """
+    xs, ys = points[:, 0], points[:, 1]
+    columns = np.floor(xs / bucket_width)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+    ends = np.append(starts[1:], len(points))
+    bucket_count = len(starts)
+    if bucket_count <= 2:
+        return points
+
+    # Averages of non-NaN points in each bucket (used as the third point of the triangle)
+    valid = ~np.isnan(ys)
+    counts = np.add.reduceat(valid, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_xs = np.add.reduceat(np.where(valid, xs, 0.0), starts) / counts
+        average_ys = np.add.reduceat(np.where(valid, ys, 0.0), starts) / counts
+    has_nan = (counts < ends - starts).tolist()
+    bucket_columns = columns[starts].astype(int).tolist()
+
+    for column in [column for column in cache if column < bucket_columns[0]]:
+        del cache[column]
+
+    previous = (xs[0], ys[0])
+    selected = [previous]
+    for i in range(1, bucket_count - 1):
+        column = bucket_columns[i]
+        point = cache.get(column)
+        if point is None:
+            bucket_xs, bucket_ys = xs[starts[i]:ends[i]], ys[starts[i]:ends[i]]
+            next_x, next_y = average_xs[i + 1], average_ys[i + 1]
+            areas = np.abs((previous[0] - next_x) * (bucket_ys - previous[1]) - (previous[0] - bucket_xs) * (next_y - previous[1]))
+            index = int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+            point = (bucket_xs[index], bucket_ys[index])
+            if i + 2 < bucket_count:
+                # Next bucket is complete, so this selection is final
+                cache[column] = point
+        selected.append(point)
+        if has_nan[i]:
+            selected.append((point[0], math.nan))
+        previous = point
+    selected.append((xs[-1], ys[-1]))
+    return np.array(selected, dtype=float)
+
 def _plot_calculate_steps(bounds: tuple[float, float], steps: int):
     # TODO: Smarter step calculation
     step = (bounds[1] - bounds[0]) / steps
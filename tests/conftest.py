@@ -0,0 +1,20 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+from typing import Callable
+import pygame
+import pytest
+from exerciser import _execute_gui
+
+@pytest.fixture
+def run_window(monkeypatch):
+    """Returns a function that runs the main loop of the window for a number of frames without pacing, pressing the given keys at the given frames"""
+    def run(create_simulation: Callable, frames: int, keys: dict[int, int] | None = None):
+        monkeypatch.setattr(_execute_gui, '_create_simulation', create_simulation)
+        monkeypatch.setattr(_execute_gui, '_recreate_simulation', True)
+        monkeypatch.setattr(_execute_gui, '_initialized', True)
+        for frame, _ in enumerate(_execute_gui._mainloop(sleep=False)):
+            if keys is not None and frame in keys:
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=keys[frame]))
+            if frame == frames:
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+    return run
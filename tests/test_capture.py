@@ -0,0 +1,42 @@
+import threading
+import pygame
+import pytest
+from exerciser import FrameCapture
+
+class _BlockingFile:
+    """Raw output whose first write blocks until released, so that frames pile up in the queue"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.data = b''
+
+    def write(self, data):
+        self.entered.set()
+        self.release.wait(5)
+        self.data += data
+
+    def close(self):
+        pass
+
+@pytest.mark.parametrize('policy, written_frames', [('drop_newest', [0, 1, 2]), ('drop_oldest', [0, 3, 4])])
+def test_capture_drop_policies(tmp_path, policy, written_frames):
+    capture = FrameCapture(tmp_path / 'frames.raw', format='raw', queue_size=2, policy=policy)
+    file = _BlockingFile()
+    capture._file = file # type: ignore
+    surface = pygame.Surface((2, 1))
+    for i in range(5):
+        surface.fill((i, i, i))
+        capture.capture(surface)
+        if i == 0:
+            # The writer thread holds the first frame, so the queue is full after two more
+            assert file.entered.wait(5)
+    assert capture.dropped == 2
+    # Including the frame that is being written
+    assert capture.queued == 3
+    file.release.set()
+    capture.close()
+    assert capture.written == 3
+    assert capture.queued == 0
+    assert capture.submitted == (3 if policy == 'drop_newest' else 5)
+    assert file.data == b''.join(bytes([i] * 6) for i in written_frames)
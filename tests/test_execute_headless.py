@@ -0,0 +1,70 @@
+import numpy as np
+import exerciser
+
+class _Grid(exerciser.Simulation):
+    name = 'grid'
+    size = 10
+
+    def tick(self, delta):
+        pass
+
+    def draw(self, screen):
+        pass
+
+    def score(self):
+        return "not a batch score"
+
+class _Batch(exerciser.BatchSimulation):
+    name = 'batch'
+    size = 3
+
+    def __init__(self):
+        self.x = np.zeros(self.size)
+
+    def tick(self, delta):
+        self.x += np.arange(self.size) * delta
+
+    def draw(self, screen):
+        pass
+
+    def score(self):
+        return self.x
+
+def test_scores_reported_only_for_batch_simulation_subclasses():
+    assert exerciser.run_headless(_Grid, duration=0.1).scores is None
+    result = exerciser.run_headless(_Batch, duration=1.0)
+    assert result.scores is not None
+    assert np.allclose(result.scores, [0.0, 1.0, 2.0])
+    assert list(result.simulation.best(2)) == [2, 1] # type: ignore
+
+class _Counter(exerciser.Simulation):
+    name = 'counter'
+    tick_rate = 100
+
+    def __init__(self, fail_at: int | None = None):
+        self.fail_at = fail_at
+        self.ticks = 0
+
+    def tick(self, delta):
+        if self.ticks == self.fail_at:
+            raise exerciser.ValidationError("too far")
+        self.ticks += 1
+        exerciser.show_value('ticks', self.ticks)
+
+    def draw(self, screen):
+        pass
+
+def test_run_headless_counts_ticks_and_time():
+    result = exerciser.run_headless(_Counter, duration=0.5)
+    assert result.ticks == 50
+    assert abs(result.time - 0.5) < 1e-9
+    assert result.error is None and result.exception is None
+    assert result.values == ['ticks = 50']
+
+def test_run_headless_stops_at_error():
+    result = exerciser.run_headless(lambda: _Counter(fail_at=20), duration=1.0, draw_every=7)
+    assert result.ticks == 20
+    assert abs(result.time - 0.2) < 1e-9
+    assert isinstance(result.exception, exerciser.ValidationError)
+    assert result.error is not None and 'too far' in result.error
+    assert result.surface is not None
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+def test_import_does_not_load_optional_modules():
+    # Runs in a new interpreter, because pytest itself has already imported most of these modules
+    code = "import sys, exerciser; print(' '.join(sorted(sys.modules)))"
+    modules = set(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split())
+    for module in ('multiprocessing', 'ctypes', 'json', 'csv', 'numpy', 'matplotlib', 'exerciser._watchdog', 'exerciser._profiler'):
+        assert module not in modules
+
+def test_lazy_attributes():
+    import exerciser
+    from exerciser._execute_batch import run_batch
+    from exerciser._recording import replay
+    assert exerciser.run_batch is run_batch
+    assert exerciser.replay is replay
@@ -0,0 +1,63 @@
+import exerciser
+from exerciser import _pacer
+from exerciser._execute_gui import _pacing_period
+from exerciser._pacer import _FramePacer, _TimingTelemetry
+
+class _FakeTime:
+    """Replaces the clock of the pacer, so that sleeping and work take exactly the given time"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.0)
+
+class _Sim(exerciser.Simulation):
+    name = 'sim'
+    real_time = True
+    tick_rate = 250
+
+    def tick(self, delta):
+        pass
+
+    def draw(self, screen):
+        pass
+
+class _FixedDeltaSim(_Sim):
+    real_time = False
+
+def test_pacing_period():
+    assert _pacing_period(_Sim()) == 1 / 250
+    assert _pacing_period(_FixedDeltaSim()) == exerciser.DELTA
+
+def test_pacer_keeps_absolute_schedule(monkeypatch):
+    clock = _FakeTime()
+    monkeypatch.setattr(_pacer, 'time', clock)
+    pacer = _FramePacer(0.01)
+    start = clock.now
+    for i in range(10):
+        # Work that takes less than a period does not shift the schedule
+        clock.now += 0.003 + 0.0005 * i
+        pacer.sleep()
+    assert abs(clock.now - (start + 0.1)) < 1e-9
+
+def test_pacer_does_not_catch_up_after_stall(monkeypatch):
+    clock = _FakeTime()
+    monkeypatch.setattr(_pacer, 'time', clock)
+    telemetry = _TimingTelemetry(100, 0.001)
+    pacer = _FramePacer(0.01, telemetry)
+    pacer.sleep()
+    clock.now += 0.1
+    stalled = clock.now
+    pacer.sleep()
+    # The missed periods are skipped, so the next iteration starts a full period after the stall instead of immediately
+    assert clock.now == stalled
+    pacer.sleep()
+    assert abs(clock.now - (stalled + 0.01)) < 1e-9
+    stats = telemetry.stats()
+    assert stats.iterations == 3
+    assert stats.overruns == 1
+    assert stats.deadline_misses == 1
@@ -0,0 +1,69 @@
+import pygame
+import pytest
+import exerciser
+from exerciser._pipeline import _RenderPipeline
+
+def _draw(number: int, fail: bool = False):
+    def draw(surface: pygame.Surface) -> list:
+        if fail:
+            raise exerciser.ValidationError(f"frame {number}")
+        surface.fill((number, 0, 0))
+        return [number]
+    return draw
+
+def test_pipeline_returns_previous_frame():
+    pipeline = _RenderPipeline()
+    try:
+        # There is no previous frame yet, so the first frame is waited for
+        surface, values = pipeline.render(_draw(1), (4, 4))
+        assert values == [1] and surface.get_at((0, 0))[0] == 1
+        assert pipeline.render(_draw(2), (4, 4))[1] == [1]
+        assert pipeline.render(_draw(3), (4, 4))[1] == [2]
+        assert pipeline.render(_draw(4), (4, 4), wait=True)[1] == [4]
+        # A different size can't reuse the previous frame
+        surface, values = pipeline.render(_draw(5), (8, 4))
+        assert values == [5] and surface.get_size() == (8, 4)
+    finally:
+        pipeline.close()
+
+def test_pipeline_raises_drawing_errors():
+    pipeline = _RenderPipeline()
+    try:
+        pipeline.render(_draw(1), (4, 4))
+        pipeline.render(_draw(2, fail=True), (4, 4))
+        with pytest.raises(exerciser.ValidationError, match="frame 2"):
+            pipeline.render(_draw(3), (4, 4))
+        # The failed frame is not reused, so the next frame is waited for
+        assert pipeline.render(_draw(4), (4, 4))[1] == [4]
+        assert pipeline.render(_draw(5, fail=True), (4, 4))[1] == [4]
+        with pytest.raises(exerciser.ValidationError, match="frame 5"):
+            pipeline.finish()
+    finally:
+        pipeline.close()
+
+class _Pipelined(exerciser.Simulation):
+    name = 'pipelined'
+
+    def __init__(self):
+        self.ticks = 0
+
+    def tick(self, delta):
+        self.ticks += 1
+
+    def draw(self, screen):
+        pass
+
+    def render_state(self):
+        return self.ticks
+
+    def draw_state(self, screen, state):
+        # R pressed after frame 10 is handled while the frame of tick 11 is still being drawn
+        if state >= 11:
+            raise exerciser.ValidationError("drawing failed")
+
+def test_drawing_error_is_raised_before_restart(run_window, capsys):
+    sims = []
+    run_window(lambda: sims.append(_Pipelined()) or sims[-1], 30, {10: pygame.K_r})
+    # The frame in flight failed, so the main loop stopped before the restart created a new simulation
+    assert len(sims) == 1
+    assert "drawing failed" in capsys.readouterr().err
@@ -0,0 +1,39 @@
+from multiprocessing.shared_memory import SharedMemory
+import time
+import pytest
+import exerciser
+
+class _Counter(exerciser.Simulation):
+    name = 'counter'
+    initial_window_size = (64, 48)
+
+    def __init__(self):
+        self.ticks = 0
+
+    def tick(self, delta):
+        self.ticks += 1
+        exerciser.show_value('ticks', self.ticks)
+
+    def draw(self, screen):
+        screen.fill('red')
+
+def test_run_process_stops_cleanly():
+    process = exerciser.run_process(_Counter, timeout=60)
+    memory_name = process._memory.name
+    try:
+        assert (process.name, process.size) == ('counter', (64, 48))
+        deadline = time.monotonic() + 10
+        while process.frame_number < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        frame = process.frame()
+        assert frame is not None and frame.shape == (48, 64, 3)
+        assert process.values and process.values[0].startswith('ticks')
+    finally:
+        process.stop()
+    # The process quit by itself instead of being killed, and the shared memory was released
+    assert not process.running
+    assert process._process.exitcode == 0
+    assert process.frame() is None and process.values == []
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(memory_name)
+    process.stop()
@@ -0,0 +1,21 @@
+import json
+from exerciser._profiler import _FrameProfiler, _TraceBuffer
+
+def test_trace_buffer_keeps_newest_events_in_order():
+    buffer = _TraceBuffer(capacity=3)
+    for i in range(5):
+        buffer.append(f"span {i % 2}", 'user', float(i), i + 0.5)
+    assert len(buffer) == 3
+    assert list(buffer) == [("span 0", 'user', 2.0, 2.5), ("span 1", 'user', 3.0, 3.5), ("span 0", 'user', 4.0, 4.5)]
+
+def test_write_trace(tmp_path):
+    path = tmp_path / 'trace.json'
+    profiler = _FrameProfiler(trace_path=path)
+    profiler.start_frame()
+    profiler.mark('events')
+    profiler.add_span("controller", 1.0, 1.25)
+    profiler.end_frame()
+    profiler.write_trace()
+    events = json.loads(path.read_text())['traceEvents']
+    assert [(event['name'], event['cat']) for event in events] == [('events', 'frame'), ('controller', 'user'), ('frame', 'frame')]
+    assert abs(events[1]['dur'] - 250_000) < 1e-3
@@ -0,0 +1,50 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+import pytest
+from exerciser.pygame import LinePlot, draw_dashed_lines
+
+def _draw(plot: LinePlot) -> bytes:
+    surface = pygame.Surface((400, 300))
+    surface.fill('white')
+    plot.draw(surface, 0, 0, 400, 300)
+    return pygame.image.tobytes(surface, 'RGB')
+
+def _plot(points: list[tuple[float, float]]) -> LinePlot:
+    plot = LinePlot(x_label="t", x_range=10)
+    plot.add_line(label="y", color='red')
+    for x, y in points:
+        plot.add_data(x, [y])
+    return plot
+
+def test_lineplot_axis_redrawn_when_bounds_scale_changes():
+    pygame.font.init()
+    points = [(0.0, 0.0), (1.0, 1.0)]
+    plot = _plot(points)
+    _draw(plot)
+    # Lower bound stays at 0, so only the scale of the axis changes
+    points.append((2.0, 100.0))
+    plot.add_data(2.0, [100.0])
+    assert _draw(plot) == _draw(_plot(points))
+
+def test_lineplot_rejects_equal_bounds():
+    plot = LinePlot(x_label="t", x_range=10)
+    with pytest.raises(ValueError):
+        plot.add_line(label="y", color='red', bounds=(1.0, 1.0))
+    # Reversed bounds are allowed (they flip the line vertically)
+    plot.add_line(label="y", color='red', bounds=(1.0, -1.0))
+
+def test_dashed_lines_match_individually_drawn_dashes():
+    starts = [(3.5, 7.2), (390.0, 10.0), (-20.0, 150.0), (200.0, 290.0)]
+    ends = [(300.2, 250.9), (20.0, 280.5), (420.0, 160.0), (200.0, 100.0)]
+    expected = pygame.Surface((400, 300))
+    for start, end in zip(starts, ends):
+        start, end = pygame.Vector2(start), pygame.Vector2(end)
+        axis = (end - start).normalize()
+        position = 0
+        while position < (end - start).length():
+            pygame.draw.line(expected, 'red', start + position * axis, start + (position + 6) * axis)
+            position += 10
+    surface = pygame.Surface((400, 300))
+    draw_dashed_lines(surface, 'red', starts, ends, (6, 4))
+    assert pygame.image.tobytes(surface, 'RGB') == pygame.image.tobytes(expected, 'RGB')
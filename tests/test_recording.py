@@ -0,0 +1,35 @@
+import pygame
+import exerciser
+from exerciser import _execute_gui
+
+class _Integrator(exerciser.Simulation):
+    name = 'integrator'
+
+    def __init__(self):
+        self.keys = []
+        self.ticks = 0
+        self.x = 0.0
+
+    def handle_input(self, events):
+        self.keys += [event.key for event in events if event.type == pygame.KEYDOWN]
+
+    def tick(self, delta):
+        self.ticks += 1
+        self.x += delta * (1 + len(self.keys))
+
+    def draw(self, screen):
+        pass
+
+def test_replay_reproduces_recorded_session(run_window, monkeypatch, tmp_path):
+    path = tmp_path / 'session.rec'
+    monkeypatch.setattr(_execute_gui, '_record_path', path)
+    sims = []
+    run_window(lambda: sims.append(_Integrator()) or sims[-1], 60, {5: pygame.K_a, 20: pygame.K_r, 30: pygame.K_b, 40: pygame.K_c})
+    recorded = sims[-1]
+    assert len(sims) == 2
+    assert recorded.ticks > 0 and pygame.K_c in recorded.keys
+
+    result = exerciser.replay(_Integrator, path)
+    replayed = result.simulation
+    assert (replayed.keys, replayed.ticks, replayed.x) == (recorded.keys, recorded.ticks, recorded.x) # type: ignore
+    assert result.ticks == recorded.ticks
@@ -0,0 +1,60 @@
+import numpy as np
+import pygame
+import exerciser
+from exerciser._snapshots import _SnapshotHistory
+
+def test_history_drops_oldest_snapshots_over_memory_limit():
+    history = _SnapshotHistory(memory_limit=3000)
+    for i in range(5):
+        history.push(i * 0.25, np.zeros(1000, dtype=np.uint8))
+    assert len(history) == 3
+    assert history.memory == 3000
+    assert history.back(10.0)[0] == 1.0 # type: ignore
+
+def test_history_discard_future_after_stepping_back():
+    history = _SnapshotHistory()
+    for i in range(4):
+        history.push(float(i), {'x': i})
+    assert history.back(3.5) == (3.0, {'x': 3})
+    assert history.back(3.0) == (2.0, {'x': 2})
+    assert history.forward() == (3.0, {'x': 3})
+    assert history.back(3.0) == (2.0, {'x': 2})
+    history.discard_future()
+    assert len(history) == 3
+    assert history.forward() is None
+    history.push(2.5, {'x': 5})
+    assert history.last_time() == 2.5
+
+class _KeySimulation(exerciser.Simulation):
+    name = 'keys'
+
+    def __init__(self):
+        self.keys = []
+        self.ticks = 0
+
+    def handle_input(self, events):
+        self.keys += [event.key for event in events if event.type == pygame.KEYDOWN]
+
+    def tick(self, delta):
+        self.ticks += 1
+
+    def draw(self, screen):
+        pass
+
+def test_history_keys_are_passed_to_simulation_without_snapshots(run_window):
+    simulations = []
+    run_window(lambda: simulations.append(_KeySimulation()) or simulations[-1], 10, {2: pygame.K_b, 4: pygame.K_n})
+    simulation, = simulations
+    assert simulation.keys == [pygame.K_b, pygame.K_n]
+    # Not paused
+    assert simulation.ticks >= 10
+
+class _SnapshotKeySimulation(_KeySimulation):
+    snapshot_attributes = ('ticks',)
+
+def test_history_keys_step_back_with_snapshots(run_window):
+    simulations = []
+    run_window(lambda: simulations.append(_SnapshotKeySimulation()) or simulations[-1], 60, {31: pygame.K_b})
+    simulation, = simulations
+    # Stepped back to a snapshot (taken every 15 ticks) and stayed paused for the remaining frames
+    assert simulation.ticks in (15, 30)
@@ -0,0 +1,17 @@
+from exerciser import Telemetry
+
+def test_series_keeps_value_types():
+    telemetry = Telemetry()
+    telemetry._record(0.0, [('flag', True), ('count', 3), ('x', 1.5)])
+    telemetry._record(1.0, [('flag', False), ('count', 4), ('x', 2.0)])
+    assert telemetry.series('flag') == [(0.0, True), (1.0, False)]
+    assert all(type(value) is bool for _, value in telemetry.series('flag'))
+    assert all(type(value) is int for _, value in telemetry.series('count'))
+    assert telemetry.series('x') == [(0.0, 1.5), (1.0, 2.0)]
+
+def test_mutable_values_are_copied():
+    telemetry = Telemetry()
+    state = [1]
+    telemetry._record(0.0, [('state', state)])
+    state.append(2)
+    assert telemetry.series('state') == [(0.0, [1])]
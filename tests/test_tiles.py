@@ -0,0 +1,69 @@
+import pygame
+import exerciser
+from exerciser._shared import ValidationError
+from exerciser._tiles import _TiledSimulation
+
+class _Tile(exerciser.Simulation):
+    name = 'tile'
+    initial_window_size = (200, 100)
+
+    def __init__(self, fail_at: int | None = None, pipelined: bool = False, fail_draw_at: int | None = None):
+        self.fail_at = fail_at
+        self.fail_draw_at = fail_draw_at
+        self.pipelined = pipelined
+        self.ticks = 0
+        self.positions = []
+
+    def handle_input(self, events):
+        self.positions += [event.pos for event in events if event.type == pygame.MOUSEBUTTONDOWN]
+
+    def tick(self, delta):
+        self.ticks += 1
+        if self.ticks == self.fail_at:
+            raise ValidationError("tile failed")
+
+    def draw(self, screen):
+        screen.fill('red', (10, 10, 5, 5))
+        return [pygame.Rect(10, 10, 5, 5)]
+
+    def render_state(self):
+        return self.ticks if self.pipelined else None
+
+    def draw_state(self, screen, state):
+        if state == self.fail_draw_at:
+            raise ValidationError("draw failed")
+        exerciser.show_simulation_value('ticks', state)
+        screen.fill('red', (10, 10, 5, 5))
+
+class _DirtyTile(_Tile):
+    use_dirty_rects = True
+
+def test_failing_tile_stops_only_that_tile():
+    tiled = _TiledSimulation([lambda: _Tile(fail_at=3), _Tile])
+    for _ in range(10):
+        tiled.tick(0.01)
+    assert [tile.simulation.ticks for tile in tiled.tiles] == [3, 10]
+    assert tiled.tiles[0].error is not None and tiled.tiles[1].error is None
+
+def test_mouse_positions_are_relative_to_tile():
+    tiled = _TiledSimulation([_Tile, _Tile])
+    second = tiled.tiles[1].rect
+    tiled.handle_input([pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(second.left + 7, second.top + 3), button=1)])
+    assert tiled.tiles[0].simulation.positions == []
+    assert tiled.tiles[1].simulation.positions == [(7, 3)]
+
+def test_dirty_rects_are_offset_to_tiles():
+    screen = pygame.Surface((400, 125))
+    assert _TiledSimulation([_Tile, _DirtyTile]).use_dirty_rects is False
+    tiled = _TiledSimulation([_DirtyTile, _DirtyTile])
+    rects = tiled.draw(screen)
+    assert rects == [pygame.Rect(tile.rect.left + 10, tile.rect.top + 10, 5, 5) for tile in tiled.tiles]
+    assert screen.get_at((tiled.tiles[1].rect.left + 10, tiled.tiles[1].rect.top + 10)) == pygame.Color('red')
+
+def test_pipelined_rendering_shows_values_of_each_tile(run_window):
+    sims = []
+    run_window(lambda: sims.append(_TiledSimulation([lambda: _Tile(pipelined=True), lambda: _Tile(pipelined=True, fail_draw_at=5)])) or sims[-1], 10)
+    first, second = sims[-1].tiles
+    assert first.simulation_values and first.simulation_values[0][0] == 'ticks'
+    assert second.error is not None and 'draw failed' in second.error and first.error is None
+    assert second.simulation.ticks < first.simulation.ticks
@@ -0,0 +1,51 @@
+import time
+import pytest
+import exerciser
+from exerciser import _watchdog
+
+class _SlowOnceSimulation(exerciser.Simulation):
+    name = 'slow once'
+    tick_time_limit = 0.05
+
+    def __init__(self):
+        self.ticks = 0
+        self.frames = 0
+
+    def tick(self, delta):
+        self.ticks += 1
+        if self.ticks == 1:
+            time.sleep(0.04)
+
+    def draw(self, screen):
+        self.frames += 1
+        time.sleep(0.01)
+
+def test_tick_that_overruns_and_returns_does_not_interrupt_main_loop(run_window, monkeypatch):
+    stop = _watchdog._TickWatchdog.stop
+    calls = []
+    def slow_stop(self, *args):
+        calls.append(args)
+        if len(calls) == 1:
+            # The tick returns just before its deadline and the interrupt is raised in `stop` before it disarms the watchdog
+            time.sleep(0.05)
+        stop(self, *args)
+    monkeypatch.setattr(_watchdog._TickWatchdog, 'stop', slow_stop)
+    simulations = []
+    # Runs for longer than the interval after which the watchdog would interrupt the thread again
+    run_window(lambda: simulations.append(_SlowOnceSimulation()) or simulations[-1], 150)
+    simulation, = simulations
+    assert simulation.frames > 100
+
+def test_stop_of_old_section_does_not_disarm_newer_section():
+    watchdog = _watchdog._TickWatchdog()
+    try:
+        old = watchdog.start(10.0)
+        new = watchdog.start(0.05)
+        watchdog.stop(old)
+        with pytest.raises(_watchdog._TickTimeout):
+            end = time.perf_counter() + 1.0
+            while time.perf_counter() < end:
+                pass
+        watchdog.stop(new)
+    finally:
+        watchdog.close()